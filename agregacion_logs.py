@@ -0,0 +1,226 @@
+# agregacion_logs.py
+import io
+
+import numpy as np
+import pandas as pd
+
+from lectura_datos import TAMANO_BLOQUE, iterar_bloques
+
+# Columnas esperadas en los logs de clickstream
+COLUMNAS_LOG = {
+    "usuario": "user_id",
+    "variante": "variant",
+    "evento": "event",
+    "marca_tiempo": "timestamp",
+}
+
+MODOS = ("exacto", "hll", "auto")
+
+
+def hash_usuarios(valores):
+    """
+    Hash de 64 bits de los identificadores de usuario (vectorizado).
+    """
+    return pd.util.hash_array(np.asarray(valores), categorize=False)
+
+
+class HyperLogLog:
+    """
+    Sketch HyperLogLog para contar visitantes únicos con memoria fija
+    (2**precision registros de un byte). Se alimenta con hashes de 64 bits
+    y dos sketches se combinan con fusionar() tomando el máximo por registro.
+    """
+
+    def __init__(self, precision=14):
+        if not 4 <= precision <= 18:
+            raise ValueError("La precisión debe estar entre 4 y 18")
+        self.precision = precision
+        self.m = 1 << precision
+        self.registros = np.zeros(self.m, dtype=np.uint8)
+
+    def agregar(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if hashes.size == 0:
+            return
+        p = np.uint64(self.precision)
+        indices = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        resto = hashes << p
+
+        # Posición del primer bit a 1 en los 64 - p bits restantes. Se usan
+        # los 53 bits altos para que la conversión a float sea exacta.
+        altos = (resto >> np.uint64(11)).astype(np.float64)
+        _, exponente = np.frexp(altos)
+        longitud = np.where(altos > 0, exponente + 11, 0)
+        rango = np.minimum(64 - longitud + 1, 64 - self.precision + 1).astype(np.uint8)
+
+        np.maximum.at(self.registros, indices, rango)
+
+    def fusionar(self, otro):
+        if otro.precision != self.precision:
+            raise ValueError("Solo se pueden fusionar sketches con la misma precisión")
+        np.maximum(self.registros, otro.registros, out=self.registros)
+        return self
+
+    def contar(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimacion = alpha * m * m / np.sum(np.ldexp(1.0, -self.registros.astype(np.int64)))
+        vacios = int(np.count_nonzero(self.registros == 0))
+        if estimacion <= 2.5 * m and vacios > 0:
+            # Corrección para cardinalidades pequeñas (linear counting)
+            estimacion = m * np.log(m / vacios)
+        return int(round(estimacion))
+
+
+class _ConjuntoExacto:
+    """
+    Conjunto de hashes guardado como arrays de uint64. Los duplicados se
+    eliminan con np.unique al compactar, sin objetos Python por visitante.
+    """
+
+    def __init__(self):
+        self.partes = []
+        self.guardados = 0  # hashes guardados, incluidos duplicados entre partes
+        self.tamano = 0     # tamaño tras la última compactación
+
+    def agregar(self, hashes):
+        parte = np.unique(hashes)
+        self.partes.append(parte)
+        self.guardados += len(parte)
+        if self.guardados > 2 * self.tamano + (1 << 16):
+            self.compactar()
+
+    def compactar(self):
+        if len(self.partes) > 1:
+            self.partes = [np.unique(np.concatenate(self.partes))]
+        self.tamano = len(self.partes[0]) if self.partes else 0
+        self.guardados = self.tamano
+
+    def elementos(self):
+        self.compactar()
+        return self.partes[0] if self.partes else np.empty(0, dtype=np.uint64)
+
+    def contar(self):
+        return len(self.elementos())
+
+
+class AgregadorLogs:
+    """
+    Convierte logs de visitas en bruto (user_id, variant, event, timestamp)
+    en recuentos diarios por brazo con el formato del CSV de app.py:
+    Día, Conversiones A, Visitas A, Conversiones B, Visitas B.
+
+    - Visitas: visitantes únicos del día en esa variante (cualquier evento).
+    - Conversiones: visitantes únicos del día con el evento de conversión.
+
+    Los logs se procesan por bloques con procesar_bloque(). Los visitantes
+    se deduplican por hash, de forma exacta (modo="exacto") o con un sketch
+    HyperLogLog (modo="hll"). Con modo="auto" se empieza en exacto y se pasa
+    a HyperLogLog cuando se superan max_hashes_exactos hashes guardados.
+    """
+
+    def __init__(self, modo="auto", precision=14, evento_conversion="conversion",
+                       variantes=("A", "B"), columnas=None, max_hashes_exactos=50_000_000):
+        if modo not in MODOS:
+            raise ValueError(f"Modo desconocido: {modo!r}. Opciones: {', '.join(MODOS)}")
+
+        self.modo = "exacto" if modo == "auto" else modo
+        self.auto = modo == "auto"
+        self.precision = precision
+        self.evento_conversion = evento_conversion
+        self.variantes = tuple(variantes)
+        self.columnas = {**COLUMNAS_LOG, **(columnas or {})}
+        self.max_hashes_exactos = max_hashes_exactos
+
+        # (fecha, variante, "visitas" | "conversiones") -> conjunto
+        self.conjuntos = {}
+        self.filas_procesadas = 0
+
+    def _nuevo_conjunto(self):
+        return _ConjuntoExacto() if self.modo == "exacto" else HyperLogLog(self.precision)
+
+    def _pasar_a_hll(self):
+        for clave, conjunto in self.conjuntos.items():
+            sketch = HyperLogLog(self.precision)
+            sketch.agregar(conjunto.elementos())
+            self.conjuntos[clave] = sketch
+        self.modo = "hll"
+
+    def procesar_bloque(self, df):
+        c = self.columnas
+        variantes = df[c["variante"]].astype(str).to_numpy()
+        validas = np.isin(variantes, self.variantes)
+        if not validas.all():
+            df = df[validas]
+            variantes = variantes[validas]
+
+        bloque = pd.DataFrame({
+            "fecha": pd.to_datetime(df[c["marca_tiempo"]]).dt.normalize().to_numpy(),
+            "variante": variantes,
+            "hash": hash_usuarios(df[c["usuario"]].to_numpy()),
+            "conversion": (df[c["evento"]] == self.evento_conversion).to_numpy(),
+        })
+        # Deduplicación dentro del bloque antes de tocar los conjuntos
+        bloque = bloque.drop_duplicates(["fecha", "variante", "hash", "conversion"])
+
+        for (fecha, variante), grupo in bloque.groupby(["fecha", "variante"], sort=False):
+            hashes = grupo["hash"].to_numpy()
+            for tipo, valores in (("visitas", hashes), ("conversiones", hashes[grupo["conversion"].to_numpy()])):
+                clave = (fecha, variante, tipo)
+                if clave not in self.conjuntos:
+                    self.conjuntos[clave] = self._nuevo_conjunto()
+                self.conjuntos[clave].agregar(valores)
+
+        self.filas_procesadas += len(df)
+
+        if self.auto and self.modo == "exacto":
+            guardados = sum(s.guardados for s in self.conjuntos.values())
+            if guardados > self.max_hashes_exactos:
+                self._pasar_a_hll()
+
+    def resultado(self):
+        """
+        DataFrame con una fila por fecha, ordenado cronológicamente. La
+        columna Día numera las fechas desde 1 (como espera app.py) y Fecha
+        conserva la fecha real.
+        """
+        a, b = self.variantes
+        fechas = sorted({fecha for fecha, _, _ in self.conjuntos})
+
+        def contar(fecha, variante, tipo):
+            conjunto = self.conjuntos.get((fecha, variante, tipo))
+            return conjunto.contar() if conjunto is not None else 0
+
+        return pd.DataFrame({
+            "Día": np.arange(1, len(fechas) + 1, dtype=np.int64),
+            "Conversiones A": np.array([contar(f, a, "conversiones") for f in fechas], dtype=np.int64),
+            "Visitas A": np.array([contar(f, a, "visitas") for f in fechas], dtype=np.int64),
+            "Conversiones B": np.array([contar(f, b, "conversiones") for f in fechas], dtype=np.int64),
+            "Visitas B": np.array([contar(f, b, "visitas") for f in fechas], dtype=np.int64),
+            "Fecha": pd.to_datetime(fechas).strftime("%Y-%m-%d") if fechas else [],
+        })
+
+
+def agregar_logs(fuente, nombre=None, tamano_bloque=TAMANO_BLOQUE, **opciones):
+    """
+    Agrega un archivo de logs (CSV, CSV.gz o Parquet), un DataFrame o un
+    iterable de DataFrames en recuentos diarios por brazo. Los archivos se
+    leen por bloques, sin cargar todas las filas a la vez. Las opciones se
+    pasan a AgregadorLogs.
+    """
+    agregador = AgregadorLogs(**opciones)
+
+    if isinstance(fuente, pd.DataFrame):
+        bloques = [fuente]
+    elif isinstance(fuente, (list, tuple)) or (hasattr(fuente, "__next__") and not isinstance(fuente, io.IOBase)):
+        # Bloques ya separados. Los objetos tipo archivo (BytesIO, el
+        # UploadedFile de Streamlit) también tienen __next__, pero iteran
+        # líneas en bruto: van a iterar_bloques como las rutas
+        bloques = fuente
+    else:
+        bloques = iterar_bloques(fuente, nombre=nombre, tamano_bloque=tamano_bloque,
+                                 columnas_requeridas=list(agregador.columnas.values()))
+
+    for bloque in bloques:
+        agregador.procesar_bloque(bloque)
+    return agregador.resultado()
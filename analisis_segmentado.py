@@ -0,0 +1,223 @@
+# analisis_segmentado.py
+import numpy as np
+
+from estadistica_conjugada import (
+    CONTINUAR, GANA_A, GANA_B,
+    decidir, momentos_beta, momentos_gamma, prob_b_mejor_normal, uplift_medio_beta,
+)
+
+MODELOS = ("conversiones", "clicks")
+
+# Nombres de columna por defecto: los mismos que pide la pestaña CSV de app.py
+COLUMNAS_POR_DEFECTO = {
+    "exitos_a": "Conversiones A",
+    "visitas_a": "Visitas A",
+    "exitos_b": "Conversiones B",
+    "visitas_b": "Visitas B",
+}
+
+_DECISIONES = {
+    GANA_B: ("B", "Implementar B"),
+    GANA_A: ("A", "Mantener A"),
+    CONTINUAR: (None, "Continuar prueba"),
+}
+
+
+class AnalisisSegmentado:
+    """
+    Análisis bayesiano de un experimento desglosado en segmentos
+    (país × dispositivo × canal, etc.) en una sola pasada vectorizada.
+
+    En lugar de crear una calculadora por segmento, todos los parámetros
+    conjugados se guardan en arrays (un elemento por segmento):
+    - modelo="conversiones": Beta-Binomial, igual que CalculadoraConversionesBayesiana
+    - modelo="clicks": Gamma-Poisson, igual que CalculadoraClicksBayesiana
+
+    Con num_samples=None las probabilidades se calculan de forma analítica
+    (aproximación normal); con un entero se usa Monte Carlo por bloques de
+    segmentos, limitando la memoria a max_elementos muestras simultáneas.
+
+    Con pooling=True cada segmento parte de un prior informado por el
+    resultado global (empirical Bayes por método de momentos), lo que
+    encoge hacia la media los segmentos con pocas visitas.
+    """
+
+    def __init__(self, modelo="conversiones",
+                       alpha_prior_a=1, beta_prior_a=1,
+                       alpha_prior_b=1, beta_prior_b=1,
+                       num_samples=None, pooling=False, fuerza_pooling=None,
+                       max_elementos=5_000_000, semilla=None):
+        if modelo not in MODELOS:
+            raise ValueError(f"Modelo desconocido: {modelo!r}. Opciones: {', '.join(MODELOS)}")
+
+        self.modelo = modelo
+        self.alpha_prior_a = alpha_prior_a
+        self.beta_prior_a = beta_prior_a
+        self.alpha_prior_b = alpha_prior_b
+        self.beta_prior_b = beta_prior_b
+        self.num_samples = num_samples
+        self.pooling = pooling
+        self.fuerza_pooling = fuerza_pooling
+        self.max_elementos = max_elementos
+        self.rng = np.random.default_rng(semilla)
+
+        self.resultados = None  # DataFrame con una fila por segmento
+
+    # ------------------------------------------------------------------
+    # Priors
+    # ------------------------------------------------------------------
+    def _prior_agrupado(self, exitos, visitas):
+        """
+        Prior común a todos los segmentos para un brazo, centrado en la
+        tasa global. La fuerza (pseudo-visitas) se estima por método de
+        momentos descontando el ruido de muestreo, salvo que se fije
+        fuerza_pooling.
+        """
+        total_visitas = visitas.sum()
+        tasa_global = exitos.sum() / total_visitas if total_visitas > 0 else 0.0
+
+        if self.fuerza_pooling is not None:
+            fuerza = float(self.fuerza_pooling)
+        else:
+            con_datos = visitas > 0
+            tasas = exitos[con_datos] / visitas[con_datos]
+            pesos = visitas[con_datos] / visitas[con_datos].sum()
+            var_observada = np.sum(pesos * (tasas - tasa_global) ** 2)
+
+            if self.modelo == "conversiones":
+                ruido = tasa_global * (1 - tasa_global) * np.mean(1 / visitas[con_datos])
+                var_real = var_observada - ruido
+                fuerza = tasa_global * (1 - tasa_global) / var_real - 1 if var_real > 0 else np.inf
+            else:
+                ruido = tasa_global * np.mean(1 / visitas[con_datos])
+                var_real = var_observada - ruido
+                fuerza = tasa_global / var_real if var_real > 0 else np.inf
+
+            # Sin heterogeneidad apreciable: pooling fuerte pero acotado
+            fuerza = float(np.clip(fuerza, 1.0, total_visitas))
+
+        if self.modelo == "conversiones":
+            return tasa_global * fuerza + 1e-9, (1 - tasa_global) * fuerza + 1e-9
+        return tasa_global * fuerza + 1e-9, fuerza
+
+    # ------------------------------------------------------------------
+    # Cálculo
+    # ------------------------------------------------------------------
+    def _posteriores(self, exitos_a, visitas_a, exitos_b, visitas_b):
+        if self.pooling:
+            alpha0_a, beta0_a = self._prior_agrupado(exitos_a, visitas_a)
+            alpha0_b, beta0_b = self._prior_agrupado(exitos_b, visitas_b)
+        else:
+            alpha0_a, beta0_a = self.alpha_prior_a, self.beta_prior_a
+            alpha0_b, beta0_b = self.alpha_prior_b, self.beta_prior_b
+
+        if self.modelo == "conversiones":
+            return (alpha0_a + exitos_a, beta0_a + (visitas_a - exitos_a),
+                    alpha0_b + exitos_b, beta0_b + (visitas_b - exitos_b))
+        return (alpha0_a + exitos_a, beta0_a + visitas_a,
+                alpha0_b + exitos_b, beta0_b + visitas_b)
+
+    def _comparacion_analitica(self, alpha_a, beta_a, alpha_b, beta_b):
+        momentos = momentos_beta if self.modelo == "conversiones" else momentos_gamma
+        media_a, var_a = momentos(alpha_a, beta_a)
+        media_b, var_b = momentos(alpha_b, beta_b)
+        prob_b_mejor = prob_b_mejor_normal(media_a, var_a, media_b, var_b)
+
+        if self.modelo == "conversiones":
+            # Misma métrica que CalculadoraConversionesBayesiana: E[(B - A) / A]
+            mejora = uplift_medio_beta(alpha_a, beta_a, media_b)
+        else:
+            # Misma métrica que CalculadoraClicksBayesiana: cociente de medias
+            mejora = (media_b - media_a) / media_a
+        return media_a, media_b, prob_b_mejor, mejora
+
+    def _comparacion_muestreo(self, alpha_a, beta_a, alpha_b, beta_b):
+        n = len(alpha_a)
+        media_a = np.empty(n)
+        media_b = np.empty(n)
+        prob_b_mejor = np.empty(n)
+        mejora = np.empty(n)
+
+        bloque = max(1, self.max_elementos // self.num_samples)
+        forma = (self.num_samples,)
+        for ini in range(0, n, bloque):
+            s = slice(ini, min(ini + bloque, n))
+            if self.modelo == "conversiones":
+                muestras_a = self.rng.beta(alpha_a[s, None], beta_a[s, None], size=(s.stop - s.start,) + forma)
+                muestras_b = self.rng.beta(alpha_b[s, None], beta_b[s, None], size=(s.stop - s.start,) + forma)
+            else:
+                muestras_a = self.rng.gamma(alpha_a[s, None], 1 / beta_a[s, None], size=(s.stop - s.start,) + forma)
+                muestras_b = self.rng.gamma(alpha_b[s, None], 1 / beta_b[s, None], size=(s.stop - s.start,) + forma)
+
+            media_a[s] = muestras_a.mean(axis=1)
+            media_b[s] = muestras_b.mean(axis=1)
+            prob_b_mejor[s] = np.mean(muestras_b > muestras_a, axis=1)
+
+            if self.modelo == "conversiones":
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    uplift = np.where(muestras_a != 0, (muestras_b - muestras_a) / muestras_a, np.nan)
+                mejora[s] = np.nanmean(uplift, axis=1)
+            else:
+                mejora[s] = (media_b[s] - media_a[s]) / media_a[s]
+
+        return media_a, media_b, prob_b_mejor, mejora
+
+    def analizar(self, df, columnas_segmento, columnas=None,
+                 umbral_probabilidad=0.95, umbral_mejora_minima=0.01):
+        """
+        df: tabla en formato largo con una o varias filas por segmento
+        (por ejemplo, una por día) y las columnas de recuento del CSV.
+        columnas_segmento: lista de columnas que definen el segmento.
+        columnas: dict opcional que sobreescribe COLUMNAS_POR_DEFECTO.
+
+        Devuelve un DataFrame con una fila por segmento: recuentos,
+        parámetros posteriores, medias, P(B > A), mejora y decisión.
+        """
+        columnas = {**COLUMNAS_POR_DEFECTO, **(columnas or {})}
+        columnas_segmento = list(columnas_segmento)
+        faltantes = [c for c in columnas_segmento + list(columnas.values()) if c not in df.columns]
+        if faltantes:
+            raise ValueError(f"Faltan las siguientes columnas: {', '.join(faltantes)}")
+
+        recuentos = [columnas["exitos_a"], columnas["visitas_a"], columnas["exitos_b"], columnas["visitas_b"]]
+        agregado = (
+            df.groupby(columnas_segmento, sort=True, observed=True)[recuentos]
+              .sum()
+              .reset_index()
+        )
+
+        exitos_a, visitas_a, exitos_b, visitas_b = (agregado[c].to_numpy(dtype=float) for c in recuentos)
+        alpha_a, beta_a, alpha_b, beta_b = (
+            np.broadcast_to(p, exitos_a.shape).astype(float)
+            for p in self._posteriores(exitos_a, visitas_a, exitos_b, visitas_b)
+        )
+
+        if self.num_samples:
+            media_a, media_b, prob_b_mejor, mejora = self._comparacion_muestreo(alpha_a, beta_a, alpha_b, beta_b)
+        else:
+            media_a, media_b, prob_b_mejor, mejora = self._comparacion_analitica(alpha_a, beta_a, alpha_b, beta_b)
+
+        codigos = decidir(prob_b_mejor, mejora, umbral_probabilidad, umbral_mejora_minima)
+
+        resultados = agregado.copy()
+        resultados["alpha_a"] = alpha_a
+        resultados["beta_a"] = beta_a
+        resultados["alpha_b"] = alpha_b
+        resultados["beta_b"] = beta_b
+        resultados["media_a"] = media_a
+        resultados["media_b"] = media_b
+        resultados["prob_b_mejor"] = prob_b_mejor
+        resultados["mejora_relativa"] = mejora
+        resultados["ganador"] = [_DECISIONES[c][0] for c in codigos]
+        resultados["decision"] = [_DECISIONES[c][1] for c in codigos]
+
+        self.resultados = resultados
+        return resultados
+
+    def resumen_decisiones(self):
+        """
+        Número de segmentos por decisión del último análisis.
+        """
+        if self.resultados is None:
+            return {}
+        return self.resultados["decision"].value_counts().to_dict()
@@ -1,12 +1,132 @@
 import streamlit as st
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # backend sin interfaz: las figuras solo se renderizan para Streamlit
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
-import io
-from contextlib import redirect_stdout
 from calculadora_bayesiana import CalculadoraClicksBayesiana
 from calculadora_bayesiana_conversiones import CalculadoraConversionesBayesiana
+from calculadora_bayesiana_ingresos import CalculadoraIngresosBayesiana
+from calculadora_frecuentista import ConversionFrecuentistaMultiGrupo
+from analisis_segmentado import AnalisisSegmentado
+from lectura_datos import COLUMNAS_RECUENTO, COLUMNAS_REQUERIDAS, leer_recuentos_agregados
+from granularidad import SeriePeriodos
+from informe_historial import num_paginas, pagina_historial
+from agregacion_logs import agregar_logs
+from simulacion import simular_experimentos
+from cache_compartido import CacheHistorial
+from cuantiles import prob_mayor
+from barrido_umbrales import barrer_umbrales, tabla_primer_dia
+from experimento_multimetrica import ExperimentoMultiMetrica
+from exportacion import escribir_parquet, tabla_historial, tabla_muestras
+from registro_experimentos import RegistroExperimentos
+from priors_empiricos import priors_desde_historico
+from estadistica_conjugada import CONTINUAR, GANA_A, GANA_B
+
+# Máximo de muestras por curva en los gráficos (las KDE no necesitan más)
+PRESUPUESTO_GRAFICO = 5_000
+
+
+def muestras_para_grafico(muestras, presupuesto=PRESUPUESTO_GRAFICO):
+    """
+    Copia en float32, sin NaN y aclarada a como mucho `presupuesto` puntos,
+    para que las KDE no recorran (ni dupliquen) los arrays completos.
+    """
+    muestras = np.asarray(muestras, dtype=np.float32).ravel()
+    muestras = muestras[~np.isnan(muestras)]
+    salto = max(1, len(muestras) // presupuesto)
+    return muestras[::salto][:presupuesto]
+
+
+def mostrar_figura(fig):
+    """
+    Renderiza la figura en Streamlit y la cierra para que pyplot no la
+    retenga entre ejecuciones.
+    """
+    st.pyplot(fig)
+    plt.close(fig)
+
+
+@st.cache_resource
+def obtener_cache_compartido():
+    """
+    Caché de pasos del historial común a todas las sesiones del proceso:
+    si otro usuario ya procesó los mismos datos, el resultado es inmediato.
+    """
+    return CacheHistorial()
+
+
+# Columnas adicionales del CSV para el modelo de ingresos por visitante
+COLUMNAS_INGRESOS = ['Ingresos A', 'Ingresos B']
+# Columnas que activan el análisis conjunto de clicks y conversiones
+COLUMNAS_MULTIMETRICA = ['Clicks A', 'Clicks B']
+
+# Funciones de gasto de alfa de la monitorización frecuentista secuencial
+METODOS_SECUENCIALES = {
+    "O'Brien–Fleming": "obrien_fleming",
+    "Pocock": "pocock",
+}
+
+@st.cache_resource
+def obtener_registro():
+    """
+    Registro SQLite de experimentos, con una conexión compartida por
+    todas las sesiones del proceso.
+    """
+    return RegistroExperimentos()
+
+
+# Calculadora que corresponde a cada modelo de EstadisticosSuficientes
+CALCULADORAS_POR_MODELO = {
+    "clicks": CalculadoraClicksBayesiana,
+    "conversiones": CalculadoraConversionesBayesiana,
+    "ingresos": CalculadoraIngresosBayesiana,
+}
+
+# Decisión guardada en el registro (la de estadistica_conjugada.decidir)
+DECISIONES_GUARDADAS = {GANA_B: "Implementar B", GANA_A: "Mantener A", CONTINUAR: "Continuar prueba"}
+
+MOTORES_CLICKS = {
+    "NUTS (MCMC)": "nuts",
+    "Laplace (aproximado)": "laplace",
+    "Automático (según presupuesto)": "auto",
+}
+
+
+# Modelo de priors_desde_historico de cada tipo de experimento: en ingresos
+# se ajusta el prior Beta de la probabilidad de compra (compras / visitas)
+MODELO_PRIOR = {
+    "Clicks (Gamma–Poisson)": "clicks",
+    "Conversiones 0/1 (Beta–Binomial)": "conversiones",
+    "Ingresos por visitante (Beta–Gamma)": "conversiones",
+}
+
+
+def nueva_calculadora(modelo):
+    # Priors ajustados con experimentos anteriores, si los hay para este modelo
+    priors = st.session_state.get('priors_empiricos', {}).get(modelo, {})
+    if modelo == "Ingresos por visitante (Beta–Gamma)":
+        return CalculadoraIngresosBayesiana(cache=obtener_cache_compartido(), **priors)
+
+    # Vistas de ventana deslizante y decaimiento (0 y 1 las desactivan)
+    vistas = {
+        "ventana": st.session_state.get('ventana_dias', 0) or None,
+        "decaimiento": st.session_state.get('factor_decaimiento', 1.0) if st.session_state.get('factor_decaimiento', 1.0) < 1 else None,
+    }
+    # Presupuesto por actualización (0 = sin límite); con alguno activo el motor se elige solo
+    presupuesto = {
+        "presupuesto_ms": st.session_state.get('presupuesto_ms', 0) or None,
+        "precision": st.session_state.get('precision_prob', 0.0) or None,
+    }
+    con_presupuesto = any(valor is not None for valor in presupuesto.values())
+    if modelo == "Conversiones 0/1 (Beta–Binomial)":
+        motor = "auto" if con_presupuesto else "montecarlo"
+        return CalculadoraConversionesBayesiana(cache=obtener_cache_compartido(), motor=motor,
+                                                **(presupuesto if con_presupuesto else {}), **priors, **vistas)
+    motor = "auto" if con_presupuesto else MOTORES_CLICKS[st.session_state.get('motor_clicks', "NUTS (MCMC)")]
+    return CalculadoraClicksBayesiana(motor=motor, cache=obtener_cache_compartido(), **presupuesto, **priors, **vistas)
+
 
 # Configuración de la página
 st.set_page_config(
@@ -229,10 +349,7 @@ st.markdown('<div class="section-spacer"></div>', unsafe_allow_html=True)
 # Inicializar la calculadora en el estado de la sesión
 if 'calculadora' not in st.session_state:
     modelo_inicial = st.session_state.get('tipo_modelo', 'Clicks (Gamma–Poisson)')
-    if modelo_inicial == 'Conversiones 0/1 (Beta–Binomial)':
-        st.session_state.calculadora = CalculadoraConversionesBayesiana()
-    else:
-        st.session_state.calculadora = CalculadoraClicksBayesiana()
+    st.session_state.calculadora = nueva_calculadora(modelo_inicial)
     st.session_state.datos_procesados = False
 
 # Sidebar con información y opciones
@@ -252,11 +369,70 @@ with st.sidebar:
     # Selector de tipo de modelo
     tipo_modelo = st.radio(
         "Tipo de experimento", 
-        ["Clicks (Gamma–Poisson)", "Conversiones 0/1 (Beta–Binomial)"], 
+        ["Clicks (Gamma–Poisson)", "Conversiones 0/1 (Beta–Binomial)", "Ingresos por visitante (Beta–Gamma)"], 
         key="tipo_modelo",
-        help="Elige si tus datos representan clics/visitas (CTR) o conversiones/visitas (tasa de conversión)."
+        help="Elige si tus datos representan clics/visitas (CTR), conversiones/visitas (tasa de conversión) o compras con su importe (ingresos por visitante)."
     )
 
+    if tipo_modelo == "Clicks (Gamma–Poisson)":
+        st.selectbox(
+            "Motor de inferencia",
+            list(MOTORES_CLICKS),
+            key="motor_clicks",
+            help="Laplace aproxima el posterior con una normal en escala logarítmica: el modelo se compila una sola vez "
+                 "y cada día tarda milisegundos. El modo automático elige motor y número de muestras según el presupuesto. Se aplica al reiniciar la calculadora.",
+            disabled=bool(st.session_state.get('presupuesto_ms') or st.session_state.get('precision_prob'))
+        )
+        if st.session_state.get('presupuesto_ms') or st.session_state.get('precision_prob'):
+            st.caption("Con un presupuesto por actualización activo, el motor se elige automáticamente.")
+
+    if tipo_modelo != "Ingresos por visitante (Beta–Gamma)":
+        with st.expander("Presupuesto por actualización"):
+            st.number_input(
+                "Tiempo máximo por día (ms, 0 = sin límite)", min_value=0, max_value=600_000, value=0, step=50,
+                key="presupuesto_ms",
+                help="El motor (analítico, QMC, Monte Carlo o MCMC) y el número de muestras se eligen con los tiempos medidos en este servidor."
+            )
+            st.number_input(
+                "Precisión de P(B > A) (± , 0 = sin objetivo)", min_value=0.0, max_value=0.1, value=0.0, step=0.001,
+                format="%.3f", key="precision_prob",
+                help="Semiancho del intervalo del 95 % del error de muestreo de P(B > A). Se aplica al reiniciar la calculadora."
+            )
+
+    if tipo_modelo != "Ingresos por visitante (Beta–Gamma)":
+        with st.expander("Vistas temporales"):
+            st.number_input(
+                "Ventana deslizante (días, 0 = desactivada)", min_value=0, max_value=365, value=0,
+                key="ventana_dias",
+                help="Posterior calculado solo con los últimos días, para que los efectos de novedad iniciales no dominen."
+            )
+            st.slider(
+                "Factor de decaimiento diario (1 = sin decaimiento)", min_value=0.5, max_value=1.0, value=1.0, step=0.01,
+                key="factor_decaimiento",
+                help="Cada día pesa este factor elevado a su antigüedad. Se aplica al reiniciar la calculadora."
+            )
+
+    with st.expander("Priors desde experimentos anteriores"):
+        historico = st.file_uploader(
+            "CSV con un experimento por fila", type=["csv"], key="historico_priors",
+            help="Columnas 'Conversiones A', 'Visitas A', 'Conversiones B' y 'Visitas B' con los totales de cada experimento. "
+                 "En ingresos por visitante, las conversiones son las compras y se ajusta el prior de la probabilidad de compra."
+        )
+        escala_prior = st.slider(
+            "Peso del prior", min_value=0.05, max_value=1.0, value=1.0, step=0.05,
+            help="Por debajo de 1 el prior ajustado cuenta como menos visitas, manteniendo su media."
+        )
+        if historico is not None and st.button("Ajustar priors"):
+            try:
+                priors = priors_desde_historico(pd.read_csv(historico), modelo=MODELO_PRIOR[tipo_modelo], escala=escala_prior)
+                st.session_state.setdefault('priors_empiricos', {})[tipo_modelo] = priors
+                st.success(
+                    f"Prior ajustado: alpha={priors['alpha_prior_a']:.2f}, beta={priors['beta_prior_a']:.2f}. "
+                    "Se aplica al reiniciar la calculadora."
+                )
+            except ValueError as e:
+                st.error(f"❌ {e}")
+
     st.markdown('<p class="sub-header">Configuración</p>', unsafe_allow_html=True)
 
     # Opciones de configuración
@@ -281,17 +457,85 @@ with st.sidebar:
     # Botón para reiniciar
     if st.button("Reiniciar calculadora"):
         modelo = st.session_state.get('tipo_modelo', 'Clicks (Gamma–Poisson)')
-        if modelo == "Conversiones 0/1 (Beta–Binomial)":
-            st.session_state.calculadora = CalculadoraConversionesBayesiana()
-        else:
-            st.session_state.calculadora = CalculadoraClicksBayesiana()
+        st.session_state.calculadora = nueva_calculadora(modelo)
         st.session_state.datos_procesados = False
         st.success("Calculadora reiniciada correctamente")
 
+    # Registro persistente de experimentos
+    st.markdown('<p class="sub-header">Experimentos guardados</p>', unsafe_allow_html=True)
+    registro = obtener_registro()
+    nombre_experimento = st.text_input("Nombre del experimento", key="nombre_experimento")
+    if st.button("💾 Guardar experimento", disabled=not nombre_experimento or len(st.session_state.calculadora.historial) < 2):
+        escritos = registro.guardar(nombre_experimento, st.session_state.calculadora, umbral_prob, umbral_mejora)
+        st.success(f"Experimento guardado ({escritos} días escritos)")
+
+    experimentos = registro.listar()
+    if not experimentos.empty:
+        experimento_elegido = st.selectbox("Experimento", experimentos["nombre"], key="experimento_elegido")
+        estado = registro.ultimo_estado(experimento_elegido)
+        if estado:
+            st.caption(f"{estado['dia']}: P(B > A) = {estado['prob_b_mejor']:.1%}, mejora = {estado['mejora_relativa']:.1%}")
+        if st.button("📂 Cargar experimento"):
+            # Resúmenes y decisiones guardados por día: no se repite la inferencia
+            st.session_state.experimento_cargado = {
+                **registro.experimento(experimento_elegido),
+                "nombre": experimento_elegido,
+                "dias": registro.resumen_dias(experimento_elegido),
+            }
+            st.success(f"Experimento '{experimento_elegido}' cargado")
+        with st.expander("Todos los experimentos"):
+            st.dataframe(experimentos, hide_index=True)
+
+# Experimento cargado del registro: resultados guardados de cada día. Las
+# muestras y los gráficos solo se recalculan si se piden
+if 'experimento_cargado' in st.session_state:
+    cargado = st.session_state.experimento_cargado
+    dias_guardados = cargado["dias"]
+    with st.expander(f"📂 Experimento guardado: {cargado['nombre']}", expanded=True):
+        if dias_guardados.empty:
+            st.info("El experimento no tiene días guardados.")
+        else:
+            ultimo_guardado = dias_guardados.iloc[-1]
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric(f"P(B > A) en {ultimo_guardado['dia']}", f"{ultimo_guardado['prob_b_mejor']:.2%}")
+            with col2:
+                st.metric("Mejora relativa", f"{ultimo_guardado['mejora_relativa']:.2%}")
+            with col3:
+                st.metric("Decisión", DECISIONES_GUARDADAS[int(ultimo_guardado['decision'])])
+            st.caption(
+                f"Decisiones con los umbrales del guardado: probabilidad {cargado['umbral_probabilidad']:.2f}, "
+                f"mejora mínima {cargado['umbral_mejora_minima']:.0%}. Actualizado: {cargado['actualizado']}."
+            )
+            st.line_chart(pd.DataFrame({"P(B > A)": dias_guardados["prob_b_mejor"].to_numpy()},
+                                       index=np.arange(1, len(dias_guardados) + 1)))
+            st.dataframe(dias_guardados, width="stretch", hide_index=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            recalcular = st.button(
+                "🔄 Recalcular muestras y gráficos", disabled=dias_guardados.empty,
+                help="Repite la inferencia de cada día con el modelo y las opciones guardados. Con NUTS puede tardar minutos."
+            )
+        with col2:
+            cerrar = st.button("Cerrar experimento guardado")
+        if recalcular:
+            with st.spinner("Reconstruyendo el historial..."):
+                clase = CALCULADORAS_POR_MODELO[cargado["modelo"]]
+                st.session_state.calculadora = clase.desde_estadisticos(
+                    obtener_registro().estadisticos(cargado["nombre"]), cache=obtener_cache_compartido(), **cargado["opciones"]
+                )
+            st.session_state.datos_procesados = True
+        if recalcular or cerrar:
+            del st.session_state.experimento_cargado
+
 # Pestañas para diferentes métodos de entrada
 st.markdown('<div class="subsection-spacer"></div>', unsafe_allow_html=True)
 
-tab1, tab2, tab3 = st.tabs(["📊 Cargar CSV", "✏️ Entrada manual", "📋 Formato CSV"])
+# El modelo de ingresos necesita además el importe de las compras de cada grupo
+es_ingresos = isinstance(st.session_state.calculadora, CalculadoraIngresosBayesiana)
+
+tab1, tab2, tab3, tab4 = st.tabs(["📊 Cargar CSV", "✏️ Entrada manual", "📋 Formato CSV", "🧪 Planificar test"])
 
 # Pestaña de carga de CSV (simplificada)
 with tab1:
@@ -302,70 +546,151 @@ with tab1:
    # Subida del archivo
    uploaded_file = st.file_uploader(
        "Selecciona tu archivo CSV", 
-       type=["csv"],
-       help="El archivo debe seguir el formato especificado en la pestaña 'Formato CSV'"
+       type=["csv", "gz", "parquet"],
+       help="El archivo debe seguir el formato especificado en la pestaña 'Formato CSV'. También se admiten CSV comprimidos (.csv.gz) y Parquet."
+   )
+   
+   es_log_bruto = st.checkbox(
+       "El archivo contiene logs en bruto (user_id, variant, event, timestamp)",
+       help="Los logs se agregan en visitantes únicos y conversiones por día y variante antes del análisis."
+   )
+
+   es_subdiario = st.checkbox(
+       "La columna Día contiene fecha y hora (datos por hora o cada 15 minutos)",
+       disabled=es_ingresos or es_log_bruto,
+       help="Los periodos se agregan por hora, día y semana; el historial de la calculadora tiene un paso por día."
    )
    
    if uploaded_file is not None:
        try:
-           df = pd.read_csv(uploaded_file)
+           if es_log_bruto:
+               # Agregación por bloques con deduplicación de visitantes por día
+               df = agregar_logs(uploaded_file, nombre=uploaded_file.name)
+           else:
+               # Lectura por bloques con tipos enteros; valida columnas y rangos al vuelo y
+               # suma cada bloque por día (y segmento), sin guardar las filas en bruto
+               columnas_requeridas = COLUMNAS_REQUERIDAS + (COLUMNAS_INGRESOS if es_ingresos else [])
+               df = leer_recuentos_agregados(
+                   uploaded_file, nombre=uploaded_file.name, columnas_requeridas=columnas_requeridas,
+                   columnas_suma=COLUMNAS_INGRESOS + COLUMNAS_MULTIMETRICA,
+                   # Con clicks puede haber más clicks que visitas
+                   exitos_acotados=not isinstance(st.session_state.calculadora, CalculadoraClicksBayesiana)
+               )
+
+           serie = None
+           if es_subdiario and not es_ingresos and not es_log_bruto:
+               # Periodos finos: recuentos compactos con agregados por hora, día y semana
+               modelo_serie = "conversiones" if st.session_state.get('tipo_modelo') == "Conversiones 0/1 (Beta–Binomial)" else "clicks"
+               priors_serie = st.session_state.get('priors_empiricos', {}).get(st.session_state.get('tipo_modelo'), {})
+               serie = SeriePeriodos(modelo=modelo_serie, **priors_serie)
+               serie.agregar_lote(df['Día'], df['Conversiones A'], df['Visitas A'], df['Conversiones B'], df['Visitas B'])
+
+           st.success("✅ ¡Archivo cargado correctamente!")
            
-           # Validar las columnas requeridas
-           columnas_requeridas = ['Día', 'Conversiones A', 'Visitas A', 'Conversiones B', 'Visitas B']
-           columnas_faltantes = [col for col in columnas_requeridas if col not in df.columns]
+           # Mostrar vista previa de los datos
+           st.subheader("Vista previa de tus datos:")
+           st.dataframe(df, width="stretch")
            
-           if columnas_faltantes:
-               st.error(f"❌ Faltan las siguientes columnas en tu CSV: {', '.join(columnas_faltantes)}")
-               st.info("Por favor, revisa los requisitos en la pestaña **'Formato CSV'** y ajusta tu archivo.")
-           else:
-               st.success("✅ ¡Archivo cargado correctamente!")
-               
-               # Mostrar vista previa de los datos
-               st.subheader("Vista previa de tus datos:")
-               st.dataframe(df, width="stretch")
-               
-               # Mostrar estadísticas rápidas
-               col1, col2, col3 = st.columns(3)
-               with col1:
-                   st.metric("Días de datos", len(df))
-               with col2:
-                   total_visitas_a = df['Visitas A'].sum()
-                   total_conversiones_a = df['Conversiones A'].sum()
-                   tasa_promedio_a = total_conversiones_a / total_visitas_a if total_visitas_a > 0 else 0
-                   st.metric("Tasa promedio A", f"{tasa_promedio_a:.2%}")
-               with col3:
-                   total_visitas_b = df['Visitas B'].sum()
-                   total_conversiones_b = df['Conversiones B'].sum()
-                   tasa_promedio_b = total_conversiones_b / total_visitas_b if total_visitas_b > 0 else 0
-                   st.metric("Tasa promedio B", f"{tasa_promedio_b:.2%}")
-               
-               # Botón para procesar
-               if st.button("🚀 Procesar datos del CSV", type="primary"):
-                   calculadora = st.session_state.calculadora
-
-                   with st.spinner("Por favor ten paciencia mientras se cargan los datos..."):
+           # Mostrar estadísticas rápidas
+           col1, col2, col3 = st.columns(3)
+           with col1:
+               st.metric("Días de datos", df["Día"].nunique() if serie is None else serie.agregados["dia"].n)
+           with col2:
+               total_visitas_a = df['Visitas A'].sum()
+               total_conversiones_a = df['Conversiones A'].sum()
+               tasa_promedio_a = total_conversiones_a / total_visitas_a if total_visitas_a > 0 else 0
+               st.metric("Tasa promedio A", f"{tasa_promedio_a:.2%}")
+           with col3:
+               total_visitas_b = df['Visitas B'].sum()
+               total_conversiones_b = df['Conversiones B'].sum()
+               tasa_promedio_b = total_conversiones_b / total_visitas_b if total_visitas_b > 0 else 0
+               st.metric("Tasa promedio B", f"{tasa_promedio_b:.2%}")
+
+           # Resúmenes posteriores a la granularidad elegida (se calculan al consultarla)
+           if serie is not None:
+               with st.expander("⏱️ Vista por periodos"):
+                   etiquetas_granularidad = {"Hora": "hora", "Día": "dia", "Semana": "semana"}
+                   vista = st.radio("Granularidad", list(etiquetas_granularidad), index=1, horizontal=True)
+                   resumen_serie = serie.resumen(etiquetas_granularidad[vista])
+                   st.line_chart(resumen_serie.set_index("inicio")[["prob_b_mejor"]])
+                   st.dataframe(resumen_serie, width="stretch", hide_index=True)
+
+           # Análisis por segmentos (columnas extra del CSV, p. ej. país o dispositivo)
+           columnas_extra = [col for col in df.columns if col not in COLUMNAS_REQUERIDAS + COLUMNAS_INGRESOS + COLUMNAS_MULTIMETRICA]
+           if columnas_extra and not es_ingresos:
+               with st.expander("🧩 Análisis por segmentos"):
+                   columnas_segmento = st.multiselect(
+                       "Columnas que definen el segmento",
+                       columnas_extra,
+                       help="Cada combinación de valores se analiza como un experimento independiente en una sola pasada."
+                   )
+                   pooling = st.checkbox(
+                       "Agrupar parcialmente hacia el resultado global",
+                       help="Los segmentos con pocas visitas se acercan a la tasa global (empirical Bayes)."
+                   )
+                   if columnas_segmento:
+                       modelo_segmentos = "conversiones" if st.session_state.get('tipo_modelo') == "Conversiones 0/1 (Beta–Binomial)" else "clicks"
+                       analisis = AnalisisSegmentado(modelo=modelo_segmentos, pooling=pooling)
+                       resultados_segmentos = analisis.analizar(
+                           df, columnas_segmento,
+                           umbral_probabilidad=umbral_prob,
+                           umbral_mejora_minima=umbral_mejora
+                       )
+                       st.write(analisis.resumen_decisiones())
+                       st.dataframe(resultados_segmentos, width="stretch", hide_index=True)
+           
+           # Clicks y conversiones de las mismas visitas: ambos modelos en una sola pasada
+           if all(col in df.columns for col in COLUMNAS_MULTIMETRICA) and not es_ingresos:
+               with st.expander("📈 Clicks y conversiones a la vez"):
+                   if st.button("Analizar las dos métricas"):
+                       with st.spinner("Actualizando los dos modelos..."):
+                           experimento = ExperimentoMultiMetrica().procesar_dataframe(df)
+                       combinado = experimento.detectar_ganador(umbral_prob, umbral_mejora)
+                       st.write(f"**Recomendación combinada:** {combinado['decision']}")
+                       st.write(f"**Razón:** {combinado['razon']}")
+                       st.write({f"Decisión por {metrica}": decision for metrica, decision in combinado['por_metrica'].items()})
+                       st.dataframe(experimento.resumen_dias(), width="stretch", hide_index=True)
+
+           # Botón para procesar
+           if st.button("🚀 Procesar datos del CSV", type="primary"):
+               calculadora = st.session_state.calculadora
+
+               with st.spinner("Por favor ten paciencia mientras se cargan los datos..."):
+                   if serie is not None:
+                       # Un paso del historial por día completo, no por periodo
+                       dias_volcados = serie.volcar_en_calculadora(calculadora, incluir_ultimo=True)
+                       st.session_state.datos_procesados = True
+                       st.markdown(f'<div class="success-box">¡{dias_volcados} días procesados correctamente! Ve a la sección de resultados para ver el análisis.</div>', unsafe_allow_html=True)
+                   else:
                        # Barra de progreso mejorada
                        progress_text = "Procesando datos del test A/B..."
                        progress_bar = st.progress(0, text=progress_text)
-                       total_rows = len(df)
-                       
-                       # Procesar cada fila del CSV
-                       for i, row in df.iterrows():
+                       # Un paso por día: los segmentos del mismo día se suman
+                       columnas_dia = COLUMNAS_RECUENTO + (COLUMNAS_INGRESOS if es_ingresos else [])
+                       diario = df.groupby('Día', sort=False)[columnas_dia].sum().reset_index()
+                       total_rows = len(diario)
+
+                       # Procesar cada día del CSV
+                       for i, row in diario.iterrows():
                            dia = f"Día {int(row['Día'])}"
                            clicks_a = int(row['Conversiones A'])
                            visitas_a = int(row['Visitas A'])
                            clicks_b = int(row['Conversiones B'])
                            visitas_b = int(row['Visitas B'])
-                           calculadora.actualizar_con_datos(clicks_a, visitas_a, clicks_b, visitas_b, dia=dia)
-                           
+                           if es_ingresos:
+                               calculadora.actualizar_con_datos(clicks_a, visitas_a, float(row['Ingresos A']),
+                                                                clicks_b, visitas_b, float(row['Ingresos B']), dia=dia)
+                           else:
+                               calculadora.actualizar_con_datos(clicks_a, visitas_a, clicks_b, visitas_b, dia=dia)
+
                            # Actualizar barra de progreso
                            current_progress = (i + 1) / total_rows
                            progress_bar.progress(current_progress, text=f"Procesando día {i+1} de {total_rows}... ({int(current_progress*100)}%)")
-                       
+
                        st.session_state.datos_procesados = True
                        st.markdown('<div class="success-box">¡Datos procesados correctamente! Ve a la sección de resultados para ver el análisis.</div>', unsafe_allow_html=True)
 
-       
+
        except Exception as e:
            st.error(f"❌ Error al procesar el archivo: {e}")
            st.info("Verifica que tu archivo siga el formato CSV correcto (pestaña 'Formato CSV') y que todos los datos sean números válidos.")
@@ -381,6 +706,8 @@ with tab2:
            st.subheader("Grupo A")
            clicks_a = st.number_input("Conversiones A", min_value=0, value=0)
            visitas_a = st.number_input("Visitas A", min_value=1, value=100)
+           if es_ingresos:
+               ingresos_a = st.number_input("Ingresos A", min_value=0.0, value=0.0)
            tasa_a = clicks_a / visitas_a if visitas_a > 0 else 0
            st.metric("Tasa de conversión A", f"{tasa_a:.2%}")
        
@@ -388,6 +715,8 @@ with tab2:
            st.subheader("Grupo B")
            clicks_b = st.number_input("Conversiones B", min_value=0, value=0)
            visitas_b = st.number_input("Visitas B", min_value=1, value=100)
+           if es_ingresos:
+               ingresos_b = st.number_input("Ingresos B", min_value=0.0, value=0.0)
            tasa_b = clicks_b / visitas_b if visitas_b > 0 else 0
            st.metric("Tasa de conversión B", f"{tasa_b:.2%}")
        
@@ -398,10 +727,51 @@ with tab2:
        if submitted:
           with st.spinner("Por favor ten paciencia mientras se procesan los datos..."):
               calculadora = st.session_state.calculadora
-              calculadora.actualizar_con_datos(clicks_a, visitas_a, clicks_b, visitas_b, dia=dia)
+              if es_ingresos:
+                  calculadora.actualizar_con_datos(clicks_a, visitas_a, ingresos_a, clicks_b, visitas_b, ingresos_b, dia=dia)
+              else:
+                  calculadora.actualizar_con_datos(clicks_a, visitas_a, clicks_b, visitas_b, dia=dia)
               st.session_state.datos_procesados = True
               st.markdown(f'<div class="success-box">Datos del {dia} añadidos correctamente</div>', unsafe_allow_html=True)
 
+   # Corrección de un día ya cargado sin reprocesar todo el historial
+   dias_cargados = [paso["dia"] for paso in st.session_state.calculadora.historial[1:]]
+   if dias_cargados:
+       with st.expander("🛠️ Corregir o eliminar un día"):
+           dia_a_corregir = st.selectbox("Día", dias_cargados, key="dia_a_corregir")
+           datos_actuales = next(paso["datos"] for paso in st.session_state.calculadora.historial[1:] if paso["dia"] == dia_a_corregir)
+           valores_actuales = list(datos_actuales.values())
+
+           with st.form("corregir_dia"):
+               # Mismo orden de campos que actualizar_con_datos (sin la etiqueta del día)
+               nuevos_valores = []
+               columnas = st.columns(len(valores_actuales))
+               for columna, (campo, valor) in zip(columnas, datos_actuales.items()):
+                   with columna:
+                       nombre = campo.replace("_", " ").capitalize()
+                       if isinstance(valor, float):
+                           nuevos_valores.append(st.number_input(nombre, min_value=0.0, value=float(valor)))
+                       else:
+                           nuevos_valores.append(st.number_input(nombre, min_value=0, value=int(valor)))
+
+               col1, col2 = st.columns(2)
+               with col1:
+                   corregir = st.form_submit_button("Guardar corrección")
+               with col2:
+                   eliminar = st.form_submit_button("Eliminar día")
+
+           if corregir or eliminar:
+               try:
+                   with st.spinner("Recalculando los días posteriores..."):
+                       if eliminar:
+                           st.session_state.calculadora.eliminar_dia(dia_a_corregir)
+                       else:
+                           st.session_state.calculadora.corregir_dia(dia_a_corregir, *nuevos_valores)
+                   st.session_state.datos_procesados = len(st.session_state.calculadora.historial) > 1
+                   st.success(f"{dia_a_corregir} {'eliminado' if eliminar else 'corregido'} correctamente")
+               except ValueError as e:
+                   st.error(f"❌ {e}")
+
 
 # Nueva pestaña para el formato CSV
 with tab3:
@@ -442,6 +812,11 @@ with tab3:
 5,22,189,28,201"""
    
    st.code(ejemplo_csv_texto, language="csv")
+
+   st.markdown("""
+   Para el modelo **Ingresos por visitante** añade además las columnas `Ingresos A` e `Ingresos B`
+   con la suma del importe de las compras de cada grupo en ese día (las conversiones son el número de compras).
+   """)
    
    # Consejos
    col1, col2 = st.columns(2)
@@ -453,7 +828,7 @@ with tab3:
        - No incluyas espacios extra en los nombres de las columnas
        - Asegúrate de que los números no contengan puntos de miles
        - Cada fila representa un día/período de tu experimento
-       - Guarda el archivo con extensión `.csv`
+       - Guarda el archivo con extensión `.csv` (también valen `.csv.gz` y `.parquet`)
        """)
    
    with col2:
@@ -471,6 +846,52 @@ with tab3:
        3. Guárdalo como `mi_test_ab.csv`
        """)
 
+# Pestaña de planificación: simulación de la duración del test
+with tab4:
+   st.markdown('<p class="sub-header">¿Cuántos días necesita mi test?</p>', unsafe_allow_html=True)
+   st.info("Se simulan miles de experimentos con la regla de decisión actual (umbrales de la barra lateral) para estimar cuándo se declarará un ganador.")
+
+   with st.form("planificacion"):
+       col1, col2, col3 = st.columns(3)
+       with col1:
+           tasa_base = st.number_input("Tasa base de A", min_value=0.0001, max_value=1.0, value=0.10, step=0.01, format="%.4f")
+           uplift_esperado = st.number_input("Mejora relativa esperada de B", min_value=-0.9, max_value=5.0, value=0.10, step=0.01, format="%.2f")
+       with col2:
+           visitas_por_dia = st.number_input("Visitas diarias por grupo", min_value=1, value=1000)
+           dias_maximos = st.number_input("Duración máxima (días)", min_value=1, max_value=365, value=30)
+       with col3:
+           num_simulaciones = st.number_input("Número de simulaciones", min_value=100, max_value=1_000_000, value=10_000, step=1000)
+
+       simular = st.form_submit_button("Simular")
+
+   if simular:
+       # Con el modelo de ingresos se simula la tasa de compra (Beta–Binomial)
+       modelo_simulacion = "clicks" if st.session_state.get('tipo_modelo', 'Clicks (Gamma–Poisson)') == "Clicks (Gamma–Poisson)" else "conversiones"
+       with st.spinner("Simulando experimentos..."):
+           simulacion = simular_experimentos(
+               tasa_base, uplift_esperado, int(visitas_por_dia), int(dias_maximos),
+               num_simulaciones=int(num_simulaciones), modelo=modelo_simulacion,
+               umbral_probabilidad=umbral_prob, umbral_mejora_minima=umbral_mejora
+           )
+       resumen_sim = simulacion["resumen"]
+
+       col1, col2, col3, col4 = st.columns(4)
+       with col1:
+           st.metric("Tests con decisión", f"{resumen_sim['prob_decision']:.1%}")
+       with col2:
+           st.metric("Mediana de días", resumen_sim['mediana_dias'] if resumen_sim['mediana_dias'] is not None else "—")
+       with col3:
+           st.metric("Potencia", f"{resumen_sim['potencia']:.1%}")
+       with col4:
+           st.metric("Tasa de error", f"{resumen_sim['tasa_error']:.1%}")
+
+       st.line_chart(
+           pd.DataFrame(
+               {"Probabilidad de haber decidido": resumen_sim["prob_decision_por_dia"]},
+               index=pd.RangeIndex(1, int(dias_maximos) + 1, name="Día")
+           )
+       )
+
 # Separador visual grande entre secciones principales
 st.markdown('<div class="section-spacer"></div>', unsafe_allow_html=True)
 st.markdown('<div class="section-spacer"></div>', unsafe_allow_html=True)
@@ -521,6 +942,33 @@ if st.session_state.datos_procesados:
             dias_con_datos = [paso for paso in st.session_state.calculadora.historial if paso.get('dia') and paso['dia'] != 'A priori']
             if len(dias_con_datos) < 6:
                 st.warning("⚠️ Has cargado menos de 6 días de datos. La recomendación puede cambiar al añadir más información.")
+
+            # Aviso si el muestreo MCMC del último día no alcanzó la convergencia
+            diagnostico = st.session_state.calculadora.historial[-1].get('diagnostico')
+            if diagnostico and not diagnostico['convergido']:
+                st.warning(
+                    f"⚠️ El muestreo MCMC del último día no convergió del todo "
+                    f"(ESS mínimo {min(diagnostico['ess'].values()):.0f}, R-hat máximo {max(diagnostico['rhat'].values()):.3f}). "
+                    "Interpreta el resultado con cautela."
+                )
+
+            # Motor elegido en modo automático para el último día
+            motor_usado = st.session_state.calculadora.historial[-1].get('motor')
+            if motor_usado and 'tiempo_estimado_ms' in motor_usado:
+                st.caption(
+                    f"Motor del último día: {motor_usado['motor']} con {motor_usado['num_muestras']:,} muestras "
+                    f"en {motor_usado['tiempo_ms']:.0f} ms (estimado {motor_usado['tiempo_estimado_ms']:.0f} ms)"
+                )
+                if not motor_usado.get('cumple_presupuesto', True):
+                    st.warning(
+                        f"⚠️ Ningún motor cabe en el presupuesto de {motor_usado['presupuesto_ms']:.0f} ms: "
+                        "se ha usado el más rápido disponible."
+                    )
+                elif not motor_usado.get('cumple_precision', True):
+                    st.warning(
+                        f"⚠️ La precisión pedida (±{motor_usado['precision']:.3f}) no cabe en el presupuesto: "
+                        f"error estimado de P(B > A) ±{motor_usado['error_estimado']:.3f}."
+                    )
         
         with col2:
             if "probabilidad" in resultado:
@@ -530,6 +978,15 @@ if st.session_state.datos_procesados:
             
             if "mejora_relativa" in resultado:
                 st.metric("Mejora relativa", f"{resultado['mejora_relativa']:.2%}")
+
+            # Búsqueda binaria en la CDF del último paso: instantáneo al mover el slider
+            prob_mejora_minima = st.session_state.calculadora.probabilidad_uplift(umbral_mejora)
+            if prob_mejora_minima is not None:
+                st.metric("Probabilidad de superar la mejora mínima", f"{prob_mejora_minima:.2%}")
+
+            # Reparto de tráfico sugerido si el test se convierte en bandit
+            asignacion = st.session_state.calculadora.sugerir_asignacion(10_000)
+            st.metric("Tráfico sugerido para B (Thompson sampling)", f"{asignacion['pesos']['B']:.1%}")
         
         # Mostrar último estado
         if len(st.session_state.calculadora.historial) > 0:
@@ -538,27 +995,161 @@ if st.session_state.datos_procesados:
             st.subheader("Estado actual")
             col1, col2 = st.columns(2)
             
+            # Conversiones e ingresos guardan la media posterior; en clicks es alpha / beta
+            if "posterior" in ultimo:
+                mean_a, mean_b = ultimo["posterior"]["A"]["media"], ultimo["posterior"]["B"]["media"]
+            else:
+                mean_a, mean_b = ultimo['alpha_a'] / ultimo['beta_a'], ultimo['alpha_b'] / ultimo['beta_b']
+            if isinstance(st.session_state.calculadora, CalculadoraIngresosBayesiana):
+                etiqueta_media = "Ingresos por visitante esperados"
+            else:
+                etiqueta_media = "Tasa de conversión esperada"
+
             with col1:
                 st.write("**Grupo A**")
-                mean_a = ultimo['alpha_a'] / ultimo['beta_a']
-                st.metric("Tasa de conversión esperada", f"{mean_a:.4f}")
+                st.metric(etiqueta_media, f"{mean_a:.4f}")
                 st.write(f"Parámetros: alpha={ultimo['alpha_a']:.1f}, beta={ultimo['beta_a']:.1f}")
             
             with col2:
                 st.write("**Grupo B**")
-                mean_b = ultimo['alpha_b'] / ultimo['beta_b']
-                st.metric("Tasa de conversión esperada", f"{mean_b:.4f}")
+                st.metric(etiqueta_media, f"{mean_b:.4f}")
                 st.write(f"Parámetros: alpha={ultimo['alpha_b']:.1f}, beta={ultimo['beta_b']:.1f}")
 
+        # Sensibilidad de la decisión a los umbrales: toda la rejilla y todos los días en una llamada
+        if len(st.session_state.calculadora.historial) > 1:
+            with st.expander("🔥 Sensibilidad a los umbrales"):
+                barrido = barrer_umbrales(st.session_state.calculadora)
+                primer_dia = np.where(barrido["primer_dia"] >= 0, barrido["primer_dia"] + 1, np.nan)
+
+                fig, ax = plt.subplots(figsize=(10, 6))
+                sns.heatmap(
+                    primer_dia, ax=ax, cmap="viridis_r", annot=False,
+                    xticklabels=[f"{m:.1%}" for m in barrido["umbrales_mejora"]],
+                    yticklabels=[f"{p:.2f}" for p in barrido["umbrales_probabilidad"]],
+                    cbar_kws={"label": "Primer día con ganador"}
+                )
+                ax.set_xlabel("Umbral de mejora mínima")
+                ax.set_ylabel("Umbral de probabilidad")
+                ax.set_title("Primer día en que se declararía un ganador (en blanco: nunca)")
+                fig.tight_layout()
+                mostrar_figura(fig)
+
+                st.dataframe(tabla_primer_dia(barrido), width="stretch")
+
+        # Contraste frecuentista secuencial sobre la misma serie diaria (solo tasas 0/1)
+        pasos_con_datos = [paso for paso in st.session_state.calculadora.historial[1:] if "datos" in paso]
+        prefijo_exitos = {CalculadoraConversionesBayesiana: "conversiones", CalculadoraIngresosBayesiana: "compras"}.get(
+            type(st.session_state.calculadora))
+        if pasos_con_datos and prefijo_exitos:
+            with st.expander("📉 Monitorización frecuentista secuencial"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    metodo_secuencial = st.selectbox("Función de gasto de alfa", list(METODOS_SECUENCIALES))
+                with col2:
+                    dias_previstos = st.number_input(
+                        "Duración prevista del test (días)", min_value=len(pasos_con_datos), value=len(pasos_con_datos),
+                        help="Con más días previstos que cargados, se reserva alfa para las miradas futuras."
+                    )
+
+                datos_diarios = {
+                    grupo: {
+                        'visitas': [paso["datos"][f"visitas_{sufijo}"] for paso in pasos_con_datos],
+                        'conv': [paso["datos"][f"{prefijo_exitos}_{sufijo}"] for paso in pasos_con_datos],
+                    }
+                    for grupo, sufijo in (("A", "a"), ("B", "b"))
+                }
+                secuencial = ConversionFrecuentistaMultiGrupo().analizar_secuencial(
+                    datos_diarios, alpha=1 - umbral_prob, metodo=METODOS_SECUENCIALES[metodo_secuencial],
+                    dias_previstos=int(dias_previstos), dias=[paso["dia"] for paso in pasos_con_datos]
+                )
+                comparacion = secuencial['comparaciones']['A_vs_B']
+                if comparacion['ganador']:
+                    st.success(f"Se cruza el límite el {comparacion['dia_parada']}: gana el grupo {comparacion['ganador']}")
+                else:
+                    st.info("Ningún día cruza el límite: el test frecuentista debe continuar")
+
+                fig, ax = plt.subplots(figsize=(10, 4))
+                ax.plot(secuencial['dias'], np.abs(comparacion['z']), 'o-', label="|z| acumulado (A vs B)")
+                ax.plot(secuencial['dias'], secuencial['limites'], 'r--', label="Límite")
+                ax.set_xlabel("Día")
+                ax.set_ylabel("|z|")
+                ax.set_title(f"Monitorización secuencial ({metodo_secuencial}, alfa = {1 - umbral_prob:.2f})")
+                ax.legend()
+                ax.tick_params(axis="x", labelrotation=45)
+                fig.tight_layout()
+                mostrar_figura(fig)
+
 
     with res_tab2:
-        # Capturar la salida de la función mostrar_historial_completo
-        buffer = io.StringIO()
-        with redirect_stdout(buffer):
-            st.session_state.calculadora.mostrar_historial_completo()
-        
-        # Mostrar la salida en Streamlit
-        st.code(buffer.getvalue(), language="text")
+        # Historial paginado: las filas se calcularon al añadir cada día y
+        # solo se generan los gráficos de los días de la página visible
+        if len(st.session_state.calculadora.historial) > 1:
+            col_pagina, col_tamano = st.columns(2)
+            with col_tamano:
+                por_pagina = st.selectbox("Días por página", [10, 25, 50, 100], index=1, key="historial_por_pagina")
+            paginas = num_paginas(st.session_state.calculadora, por_pagina)
+            with col_pagina:
+                pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, value=paginas,
+                                         key=f"historial_pagina_{por_pagina}")
+            informe = pagina_historial(st.session_state.calculadora, int(pagina), por_pagina)
+            st.dataframe(informe["filas"], width="stretch", hide_index=True)
+
+            if st.checkbox("Mostrar gráficos de los días de esta página", key="historial_graficos"):
+                for paso in informe["pasos"]:
+                    if "muestras" in paso:
+                        muestras_a, muestras_b = paso["muestras"]["tasa_clicks_a"], paso["muestras"]["tasa_clicks_b"]
+                    elif "posterior" in paso:
+                        muestras_a, muestras_b = paso["posterior"]["A"]["muestras"], paso["posterior"]["B"]["muestras"]
+                    else:
+                        continue
+                    fig, ax = plt.subplots(figsize=(10, 3))
+                    sns.kdeplot(muestras_para_grafico(muestras_a), label="Grupo A", fill=True, ax=ax)
+                    sns.kdeplot(muestras_para_grafico(muestras_b), label="Grupo B", fill=True, ax=ax)
+                    ax.set_title(f"{paso['dia']} - Distribuciones posteriores")
+                    ax.legend()
+                    mostrar_figura(fig)
+        else:
+            st.info("Todavía no hay días en el historial.")
+
+        # Exportación en columnas para BI (sin pasar por el texto anterior). Los
+        # bytes se guardan en la sesión hasta que cambian el historial o las opciones
+        if len(st.session_state.calculadora.historial) > 1:
+            calculadora = st.session_state.calculadora
+            # Los pasos no se modifican en su sitio: cualquier cambio crea un último paso nuevo
+            version_historial = (id(calculadora), len(calculadora.historial), id(calculadora.historial[-1]))
+
+            clave_historial = (version_historial, umbral_prob, umbral_mejora)
+            exportado = st.session_state.get('exportacion_historial')
+            if exportado is None or exportado[0] != clave_historial:
+                exportado = (clave_historial, escribir_parquet(tabla_historial(calculadora, umbral_prob, umbral_mejora)))
+                st.session_state.exportacion_historial = exportado
+            st.download_button(
+                "⬇️ Descargar historial (Parquet)",
+                exportado[1],
+                file_name="historial.parquet",
+                mime="application/octet-stream"
+            )
+
+            col1, col2 = st.columns(2)
+            with col1:
+                max_muestras = st.number_input(
+                    "Muestras por día en la exportación", min_value=1_000, max_value=1_000_000, value=10_000, step=1_000,
+                    help="Las muestras apenas se comprimen: cada 1.000 muestras por día son unos 8 KB por día."
+                )
+            clave_muestras = (version_historial, max_muestras)
+            with col2:
+                if st.button("Preparar muestras posteriores (Parquet)"):
+                    with st.spinner("Generando el archivo de muestras..."):
+                        st.session_state.exportacion_muestras = (
+                            clave_muestras, escribir_parquet(tabla_muestras(calculadora, max_muestras)))
+            exportado = st.session_state.get('exportacion_muestras')
+            if exportado is not None and exportado[0] == clave_muestras:
+                st.download_button(
+                    "⬇️ Descargar muestras (Parquet)",
+                    exportado[1],
+                    file_name="muestras.parquet",
+                    mime="application/octet-stream"
+                )
 
     with res_tab3:
         if len(st.session_state.calculadora.historial) > 0:
@@ -585,7 +1176,7 @@ if st.session_state.datos_procesados:
                 st.info("No hay datos suficientes para mostrar gráficos.")
             else:
                 # Detectar tipo de modelo
-                es_gamma = "trace" in paso_seleccionado           # CalculadoraClicksBayesiana
+                es_gamma = "muestras" in paso_seleccionado        # CalculadoraClicksBayesiana
                 es_beta = "posterior" in paso_seleccionado and "comparacion" in paso_seleccionado  # Conversiones
 
                 # ---------------------------
@@ -594,26 +1185,26 @@ if st.session_state.datos_procesados:
                 if es_gamma:
                     # === Modelo Gamma–Poisson (Clicks/CTR) ===
                     fig1, ax1 = plt.subplots(figsize=(10, 5))
-                    tasa_a_samples = paso_seleccionado["trace"].posterior["tasa_clicks_a"].values.flatten()
-                    tasa_b_samples = paso_seleccionado["trace"].posterior["tasa_clicks_b"].values.flatten()
+                    tasa_a_samples = muestras_para_grafico(paso_seleccionado["muestras"]["tasa_clicks_a"])
+                    tasa_b_samples = muestras_para_grafico(paso_seleccionado["muestras"]["tasa_clicks_b"])
 
                     sns.kdeplot(tasa_a_samples, label="Grupo A", fill=True, ax=ax1)
                     sns.kdeplot(tasa_b_samples, label="Grupo B", fill=True, ax=ax1)
                     ax1.set_title(f"{paso_seleccionado['dia']} - Distribuciones posteriores (Gamma–Poisson)")
                     ax1.set_xlabel("Tasa de clicks por visita")
                     ax1.legend()
-                    st.pyplot(fig1)
+                    mostrar_figura(fig1)
 
                     # Gráfico de diferencia
                     fig2, ax2 = plt.subplots(figsize=(10, 4))
-                    diff = paso_seleccionado["trace"].posterior["diferencia"].values.flatten()
+                    diff = paso_seleccionado["muestras"]["diferencia"].ravel()
 
-                    sns.kdeplot(diff, label="Diferencia (B - A)", fill=True, ax=ax2)
+                    sns.kdeplot(muestras_para_grafico(diff), label="Diferencia (B - A)", fill=True, ax=ax2)
                     ax2.axvline(0, color="black", linestyle="--")
                     ax2.set_title(f"{paso_seleccionado['dia']} - Diferencia de tasa de clicks")
                     ax2.set_xlabel("Diferencia en clicks por visita")
                     ax2.legend()
-                    st.pyplot(fig2)
+                    mostrar_figura(fig2)
 
                     # Estadísticas del día
                     col1, col2 = st.columns(2)
@@ -630,11 +1221,15 @@ if st.session_state.datos_procesados:
                             st.metric("Media", f"{uplift['media']:.2%}")
                             st.metric("IC 95%", f"[{uplift['ic_95'][0]:.2%}, {uplift['ic_95'][1]:.2%}]")
 
-                        prob_b_mejor = np.mean(diff > 0)
+                        prob_b_mejor = prob_mayor(paso_seleccionado["cdf"]["diferencia"], 0.0)
                         st.metric("Probabilidad de que B > A", f"{prob_b_mejor:.2%}")
 
                 elif es_beta:
-                    # === Modelo Beta–Binomial (Conversiones 0/1) ===
+                    # === Modelo Beta–Binomial (Conversiones 0/1) o ingresos por visitante ===
+                    if isinstance(st.session_state.calculadora, CalculadoraIngresosBayesiana):
+                        modelo_grafico, metrica, etiqueta_media = "Beta–Gamma", "ingresos por visitante", "Ingresos por visitante esperados"
+                    else:
+                        modelo_grafico, metrica, etiqueta_media = "Beta–Binomial", "tasa de conversión", "Tasa esperada"
                     post_a = paso_seleccionado["posterior"]["A"]
                     post_b = paso_seleccionado["posterior"]["B"]
                     comp = paso_seleccionado["comparacion"]
@@ -646,30 +1241,29 @@ if st.session_state.datos_procesados:
 
                     # Gráfico de distribuciones posteriores
                     fig1, ax1 = plt.subplots(figsize=(10, 5))
-                    sns.kdeplot(muestras_a, label="Grupo A", fill=True, ax=ax1)
-                    sns.kdeplot(muestras_b, label="Grupo B", fill=True, ax=ax1)
-                    ax1.set_title(f"{paso_seleccionado['dia']} - Distribuciones posteriores (Beta–Binomial)")
-                    ax1.set_xlabel("Tasa de conversión")
+                    sns.kdeplot(muestras_para_grafico(muestras_a), label="Grupo A", fill=True, ax=ax1)
+                    sns.kdeplot(muestras_para_grafico(muestras_b), label="Grupo B", fill=True, ax=ax1)
+                    ax1.set_title(f"{paso_seleccionado['dia']} - Distribuciones posteriores ({modelo_grafico})")
+                    ax1.set_xlabel(metrica.capitalize())
                     ax1.legend()
-                    st.pyplot(fig1)
+                    mostrar_figura(fig1)
 
                     # Gráfico de diferencia B - A
                     fig2, ax2 = plt.subplots(figsize=(10, 4))
-                    # Filtramos NaNs por si los hubiera en uplift/diff
-                    diff_clean = diff[~np.isnan(diff)]
-                    sns.kdeplot(diff_clean, label="Diferencia (B - A)", fill=True, ax=ax2)
+                    # muestras_para_grafico ya filtra los NaN que pudiera haber en diff
+                    sns.kdeplot(muestras_para_grafico(diff), label="Diferencia (B - A)", fill=True, ax=ax2)
                     ax2.axvline(0, color="black", linestyle="--")
-                    ax2.set_title(f"{paso_seleccionado['dia']} - Diferencia de tasa de conversión")
-                    ax2.set_xlabel("Diferencia en tasa de conversión")
+                    ax2.set_title(f"{paso_seleccionado['dia']} - Diferencia de {metrica}")
+                    ax2.set_xlabel(f"Diferencia en {metrica}")
                     ax2.legend()
-                    st.pyplot(fig2)
+                    mostrar_figura(fig2)
 
                     # Estadísticas del día
                     col1, col2 = st.columns(2)
                     with col1:
                         st.subheader(f"Estadísticas del {paso_seleccionado['dia']}")
-                        st.metric("Tasa esperada A", f"{post_a['media']:.4f}")
-                        st.metric("Tasa esperada B", f"{post_b['media']:.4f}")
+                        st.metric(f"{etiqueta_media} A", f"{post_a['media']:.4f}")
+                        st.metric(f"{etiqueta_media} B", f"{post_b['media']:.4f}")
                         st.write(f"IC95% A: [{post_a['ci'][0]:.4f}, {post_a['ci'][1]:.4f}]")
                         st.write(f"IC95% B: [{post_b['ci'][0]:.4f}, {post_b['ci'][1]:.4f}]")
                     with col2:
@@ -684,18 +1278,22 @@ if st.session_state.datos_procesados:
             # 2) Gráfico de evolución
             # ---------------------------
             if len(st.session_state.calculadora.historial) > 2:  # Más de 2 porque el primero es "A priori"
-                st.subheader("Evolución de tasas")
+                es_rpv = isinstance(st.session_state.calculadora, CalculadoraIngresosBayesiana)
+                titulo_evolucion = "Evolución de ingresos por visitante" if es_rpv else "Evolución de tasas"
+                st.subheader(titulo_evolucion)
 
                 dias = []
                 tasas_a = []
                 tasas_b = []
+                # Series alternativas (ventana / decaimiento) si la calculadora las guarda
+                series_vistas = {}
 
                 for paso in st.session_state.calculadora.historial[1:]:  # excluimos "A priori"
                     if "dia" not in paso:
                         continue
                     dias.append(paso["dia"])
 
-                    if "trace" in paso:
+                    if "muestras" in paso:
                         # Gamma–Poisson
                         tasa_a = paso["alpha_a"] / paso["beta_a"]
                         tasa_b = paso["alpha_b"] / paso["beta_b"]
@@ -709,19 +1307,27 @@ if st.session_state.datos_procesados:
 
                     tasas_a.append(tasa_a)
                     tasas_b.append(tasa_b)
+                    for nombre, vista in paso.get("vistas", {}).items():
+                        serie = series_vistas.setdefault(nombre, {"dias": [], "A": [], "B": []})
+                        serie["dias"].append(paso["dia"])
+                        serie["A"].append(vista["media_a"])
+                        serie["B"].append(vista["media_b"])
 
                 if dias:
                     fig3, ax3 = plt.subplots(figsize=(10, 5))
                     ax3.plot(dias, tasas_a, 'o-', label="Grupo A")
                     ax3.plot(dias, tasas_b, 'o-', label="Grupo B")
-                    ax3.set_title("Evolución de tasas")
+                    for (nombre, serie), color in zip(series_vistas.items(), ("tab:green", "tab:purple")):
+                        ax3.plot(serie["dias"], serie["A"], '--', color=color, alpha=0.6, label=f"Grupo A ({nombre})")
+                        ax3.plot(serie["dias"], serie["B"], ':', color=color, label=f"Grupo B ({nombre})")
+                    ax3.set_title(titulo_evolucion)
                     ax3.set_xlabel("Día")
-                    ax3.set_ylabel("Tasa")
+                    ax3.set_ylabel("Ingresos por visitante" if es_rpv else "Tasa")
                     ax3.legend()
                     ax3.grid(True)
-                    plt.xticks(rotation=45)
-                    plt.tight_layout()
-                    st.pyplot(fig3)
+                    ax3.tick_params(axis="x", labelrotation=45)
+                    fig3.tight_layout()
+                    mostrar_figura(fig3)
         else:
             st.info("Todavía no has añadido datos a la calculadora.")
 
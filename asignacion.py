@@ -0,0 +1,43 @@
+# asignacion.py
+import numpy as np
+
+METODOS = ("thompson", "top_two")
+
+
+def asignar(muestras_a, muestras_b, metodo="thompson", rng=None, beta_top_two=0.5):
+    """
+    Asignación adaptativa de visitantes a partir de una muestra del
+    posterior de cada brazo por visitante (arrays de la misma longitud).
+
+    - metodo="thompson": cada visitante va al brazo con mayor muestra.
+    - metodo="top_two": el líder de la muestra se elige con probabilidad
+      beta_top_two y el otro brazo en caso contrario (con dos brazos el
+      "retador" de top-two es siempre el brazo que no lidera).
+
+    Devuelve un dict con:
+    - asignaciones: array int8 por visitante (0 = A, 1 = B)
+    - A / B: número de visitantes asignados a cada brazo
+    - pesos: reparto de tráfico esperado para el siguiente periodo
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método desconocido: {metodo!r}. Opciones: {', '.join(METODOS)}")
+
+    lider_b = muestras_b > muestras_a
+    peso_b = float(lider_b.mean()) if lider_b.size else 0.5
+
+    if metodo == "thompson":
+        asignaciones = lider_b.astype(np.int8)
+    else:
+        rng = rng or np.random.default_rng()
+        elegir_lider = rng.random(lider_b.size) < beta_top_two
+        asignaciones = (lider_b == elegir_lider).astype(np.int8)
+        peso_b = beta_top_two * peso_b + (1 - beta_top_two) * (1 - peso_b)
+
+    n_b = int(asignaciones.sum())
+    return {
+        "metodo": metodo,
+        "asignaciones": asignaciones,
+        "A": asignaciones.size - n_b,
+        "B": n_b,
+        "pesos": {"A": 1 - peso_b, "B": peso_b},
+    }
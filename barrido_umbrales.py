@@ -0,0 +1,74 @@
+# barrido_umbrales.py
+import numpy as np
+import pandas as pd
+
+from estadistica_conjugada import CONTINUAR, GANA_A, GANA_B, decidir
+
+# Rejillas por defecto (las mismas que permiten los sliders de app.py)
+UMBRALES_PROBABILIDAD = np.round(np.arange(0.80, 0.995, 0.01), 2)
+UMBRALES_MEJORA = np.round(np.arange(0.01, 0.205, 0.01), 2)
+
+ETIQUETAS_DECISION = {GANA_B: "Implementar B", GANA_A: "Mantener A", CONTINUAR: "Continuar prueba"}
+
+
+def barrer_umbrales(calculadora, umbrales_probabilidad=UMBRALES_PROBABILIDAD,
+                    umbrales_mejora=UMBRALES_MEJORA):
+    """
+    Evalúa la regla de detectar_ganador en todos los días del historial y
+    en toda la rejilla umbral_probabilidad × umbral_mejora_minima con una
+    sola operación vectorizada sobre los resúmenes ya guardados en cada
+    paso (ver series_decision() de las calculadoras).
+
+    Devuelve un dict con:
+    - dias, umbrales_probabilidad, umbrales_mejora
+    - decisiones: array int8 (días, probabilidades, mejoras) con GANA_B, GANA_A o CONTINUAR
+    - primer_dia: índice del primer día con ganador para cada par de umbrales (-1 si nunca)
+    - ganador: decisión tomada ese primer día (CONTINUAR si nunca)
+    """
+    serie = calculadora.series_decision()
+    umbrales_probabilidad = np.asarray(umbrales_probabilidad, dtype=float)
+    umbrales_mejora = np.asarray(umbrales_mejora, dtype=float)
+
+    # Broadcasting: (días, 1, 1) frente a (1, P, 1) y (1, 1, M)
+    decisiones = decidir(
+        serie["prob_b_mejor"][:, None, None],
+        serie["mejora_relativa"][:, None, None],
+        umbrales_probabilidad[None, :, None],
+        umbrales_mejora[None, None, :],
+    )
+
+    hay_decision = decisiones != CONTINUAR
+    if len(serie["dias"]):
+        primer_dia = np.where(hay_decision.any(axis=0), hay_decision.argmax(axis=0), -1)
+        ganador = np.take_along_axis(decisiones, np.maximum(primer_dia, 0)[None], axis=0)[0]
+        ganador = np.where(primer_dia >= 0, ganador, CONTINUAR).astype(np.int8)
+    else:
+        forma = (len(umbrales_probabilidad), len(umbrales_mejora))
+        primer_dia = np.full(forma, -1)
+        ganador = np.full(forma, CONTINUAR, dtype=np.int8)
+
+    return {
+        "dias": list(serie["dias"]),
+        "umbrales_probabilidad": umbrales_probabilidad,
+        "umbrales_mejora": umbrales_mejora,
+        "decisiones": decisiones,
+        "primer_dia": primer_dia,
+        "ganador": ganador,
+    }
+
+
+def tabla_primer_dia(barrido):
+    """
+    Tabla (umbral de probabilidad × umbral de mejora) con el primer día en
+    que se declararía un ganador y cuál, o "—" si no se declara nunca.
+    """
+    dias = barrido["dias"]
+    celdas = [
+        [f"{dias[d]} ({ETIQUETAS_DECISION[int(g)]})" if d >= 0 else "—" for d, g in zip(fila_dias, fila_ganador)]
+        for fila_dias, fila_ganador in zip(barrido["primer_dia"], barrido["ganador"])
+    ]
+    return pd.DataFrame(
+        celdas,
+        index=pd.Index([f"{p:.2f}" for p in barrido["umbrales_probabilidad"]], name="Umbral de probabilidad"),
+        columns=pd.Index([f"{m:.1%}" for m in barrido["umbrales_mejora"]], name="Mejora mínima"),
+    )
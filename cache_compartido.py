@@ -0,0 +1,102 @@
+# cache_compartido.py
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def clave_inicial(modelo, priors, ajustes=None):
+    """
+    Clave de un experimento vacío: modelo, priors y ajustes del motor
+    (número de muestras, configuración de MCMC, etc.).
+    """
+    return encadenar_clave("", modelo, sorted(priors.items()), sorted((ajustes or {}).items()))
+
+
+def encadenar_clave(clave_anterior, *componentes):
+    """
+    Clave del paso siguiente a partir de la del paso anterior y los datos
+    del día. Al encadenarse, la clave de un paso identifica la secuencia
+    completa de días que lleva hasta él.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(clave_anterior.encode())
+    for componente in componentes:
+        h.update(b"\x1f")
+        h.update(repr(componente).encode())
+    return h.hexdigest()
+
+
+def _tamano(valor):
+    """
+    Estimación de los bytes que ocupa un paso del historial: suma de los
+    arrays que contiene (los escalares y cadenas son despreciables).
+    """
+    if isinstance(valor, dict):
+        return sum(_tamano(v) for v in valor.values()) + 64
+    if isinstance(valor, (list, tuple)):
+        return sum(_tamano(v) for v in valor) + 64
+    if isinstance(valor, np.ndarray) or hasattr(valor, "nbytes"):
+        return int(valor.nbytes)
+    if hasattr(valor, "groups"):  # arviz.InferenceData
+        return sum(int(getattr(valor, grupo).nbytes) for grupo in valor.groups())
+    return 64
+
+
+class CacheHistorial:
+    """
+    Caché de pasos del historial compartida entre sesiones (una por
+    proceso). La clave encadena priors, ajustes del motor y la secuencia
+    de datos diarios, así que dos sesiones que cargan el mismo CSV
+    reutilizan los posteriores ya calculados.
+
+    Se expulsan las entradas menos usadas cuando se supera max_bytes.
+    Es segura entre hilos (Streamlit atiende cada sesión en un hilo).
+    Los pasos guardados se comparten entre sesiones y no deben mutarse.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()  # clave -> (paso, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[0]
+
+    def guardar(self, clave, paso):
+        tamano = _tamano(paso)
+        if tamano > self.max_bytes:
+            return
+        with self._lock:
+            if clave in self._entradas:
+                self._bytes -= self._entradas.pop(clave)[1]
+            self._entradas[clave] = (paso, tamano)
+            self._bytes += tamano
+            while self._bytes > self.max_bytes:
+                _, (_, liberado) = self._entradas.popitem(last=False)
+                self._bytes -= liberado
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "entradas": len(self._entradas),
+                "bytes": self._bytes,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+            }
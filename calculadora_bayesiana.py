@@ -1,22 +1,520 @@
 # calculadora_bayesiana.py
+import threading
+import time
+import warnings
+
 import pymc as pm
+from pymc.blocking import DictToArrayBijection, RaveledVars
+from pymc.step_methods.hmc.quadpotential import QuadPotentialDiagAdapt
+import arviz as az
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
+from scipy.optimize import minimize
+
+from asignacion import asignar
+from cache_compartido import clave_inicial, encadenar_clave
+from cuantiles import prob_mayor, prob_menor, resumir_cdf
+from estadisticos_suficientes import EstadisticosSuficientes
+from informe_historial import fila_informe
+from seleccion_motor import CRONOMETRO, MUESTRAS_MINIMAS, elegir_motor, muestrear, prob_estimada, resumen_analitico
+from vistas_temporales import calcular_vistas, validar_vistas
 
 # Estilo para los gráficos
 sns.set(style="whitegrid")
 
+# Variables cuya convergencia se vigila en el muestreo por bloques
+VARIABLES_DIAGNOSTICO = ['tasa_clicks_a', 'tasa_clicks_b', 'diferencia']
+
+# Variables de la traza que se guardan en cada paso (lo único que leen
+# detectar_ganador, mostrar_historial_completo y los gráficos de app.py)
+VARIABLES_GUARDADAS = ['tasa_clicks_a', 'tasa_clicks_b', 'diferencia']
+
+MOTORES = ("nuts", "laplace", "advi", "auto")
+PRIORS_TASA = ("gamma", "lognormal")
+VEROSIMILITUDES = ("poisson", "negbinomial")
+
+# Modelos de Laplace con sus funciones compiladas, por estructura de modelo
+# (prior, verosimilitud): se comparten entre calculadoras y sesiones
+_PLANTILLAS_LAPLACE = {}
+_LOCK_LAPLACE = threading.Lock()
+
+# Peso (en muestras) de la métrica heredada del día anterior al arrancar
+# NUTS en caliente: la readaptación corta la corrige sin partir de cero
+PESO_METRICA_CALIENTE = 10
+
 class CalculadoraClicksBayesiana:
-    def __init__(self, alpha_prior_a=1, beta_prior_a=1, alpha_prior_b=1, beta_prior_b=1):
+    def __init__(self, alpha_prior_a=1, beta_prior_a=1, alpha_prior_b=1, beta_prior_b=1,
+                 draws=2000, tune=1000, chains=2, cache=None,
+                 adaptativo=True, draws_bloque=500, ess_objetivo=800, rhat_max=1.01, tune_bloque=100,
+                 motor="nuts", prior_tasa="gamma", mu_log=np.log(0.05), sigma_log=1.0,
+                 verosimilitud="poisson", num_muestras_aprox=4000, iteraciones_advi=20_000,
+                 ventana=None, decaimiento=None, adelgazar=1, guardar_traza=False,
+                 presupuesto_ms=None, precision=None, arranque_en_caliente=True, tune_caliente=200):
+        if motor not in MOTORES:
+            raise ValueError(f"Motor desconocido: {motor!r}. Opciones: {', '.join(MOTORES)}")
+        if motor != "auto" and (presupuesto_ms is not None or precision is not None):
+            raise ValueError("El presupuesto de tiempo o de precisión solo se aplica con motor='auto'")
+        if prior_tasa not in PRIORS_TASA:
+            raise ValueError(f"Prior desconocido: {prior_tasa!r}. Opciones: {', '.join(PRIORS_TASA)}")
+        if verosimilitud not in VEROSIMILITUDES:
+            raise ValueError(f"Verosimilitud desconocida: {verosimilitud!r}. Opciones: {', '.join(VEROSIMILITUDES)}")
+        validar_vistas(ventana, decaimiento)
+        if int(adelgazar) != adelgazar or adelgazar < 1:
+            raise ValueError("adelgazar debe ser un entero mayor o igual que 1")
+
         self.alpha_a = alpha_prior_a
         self.beta_a = beta_prior_a
         self.alpha_b = alpha_prior_b
         self.beta_b = beta_prior_b
+        self.draws = draws
+        self.tune = tune
+        self.chains = chains
+        # Muestreo por bloques: se para en cuanto ESS y R-hat son suficientes
+        # (draws pasa a ser el máximo de muestras por cadena)
+        self.adaptativo = adaptativo
+        self.draws_bloque = draws_bloque
+        self.ess_objetivo = ess_objetivo
+        self.rhat_max = rhat_max
+        self.tune_bloque = tune_bloque
+        # Arranque en caliente: cada día NUTS parte de las posiciones finales,
+        # la métrica diagonal y el tamaño de paso adaptados el día anterior
+        # (guardados en paso['adaptacion']) y solo readapta tune_caliente
+        # iteraciones en lugar de tune
+        self.arranque_en_caliente = arranque_en_caliente
+        self.tune_caliente = tune_caliente
+        # Motor de inferencia y variantes no conjugadas del modelo:
+        # - motor: "nuts" (MCMC), las aproximaciones "laplace" / "advi" o
+        #   "auto": cada día se elige motor y número de muestras para
+        #   cumplir presupuesto_ms y/o precision (semiancho del IC 95 % de
+        #   P(B > A)) con los tiempos medidos en esta máquina. En el modelo
+        #   conjugado puede evitar NUTS (analítico, QMC o Monte Carlo sobre
+        #   el posterior Gamma exacto); si no, ajusta las muestras de NUTS.
+        # - prior_tasa="lognormal": LogNormal(mu_log, sigma_log) sobre la tasa
+        # - verosimilitud="negbinomial": clicks sobredispersos
+        # "advi" recompila y optimiza el modelo desde cero cada día y no
+        # suele converger en iteraciones_advi: no se ofrece en app.py.
+        self.motor = motor
+        self.prior_tasa = prior_tasa
+        self.mu_log = mu_log
+        self.sigma_log = sigma_log
+        self.verosimilitud = verosimilitud
+        self.num_muestras_aprox = num_muestras_aprox
+        self.iteraciones_advi = iteraciones_advi
+        self.presupuesto_ms = presupuesto_ms
+        self.precision = precision
+        # Vistas alternativas al acumulado (ver vistas_temporales): últimos
+        # `ventana` días y recuentos con decaimiento exponencial. Usan la
+        # actualización Gamma–Poisson también con los modelos no conjugados.
+        self.ventana = ventana
+        self.decaimiento = decaimiento
+        # Almacenamiento de las muestras: cada paso guarda solo
+        # VARIABLES_GUARDADAS en float32 contiguo (una de cada `adelgazar`
+        # muestras por cadena). Con guardar_traza=True se conserva además
+        # el InferenceData completo, solo para depuración.
+        self.adelgazar = int(adelgazar)
+        self.guardar_traza = guardar_traza
         self.historial = []
+        self._rng = np.random.default_rng()
+        # Moda de Laplace del último paso: punto de partida del siguiente
+        self._moda_laplace = None
+        self._cache_asignacion = None
+
+        # Caché de pasos compartida entre sesiones (opcional, ver CacheHistorial)
+        self.cache = cache
+        self._clave_inicial = self._clave_cache = clave_inicial(
+            "clicks",
+            {'alpha_a': float(alpha_prior_a), 'beta_a': float(beta_prior_a),
+             'alpha_b': float(alpha_prior_b), 'beta_b': float(beta_prior_b)},
+            self._ajustes_motor(),
+        )
         self._guardar_estado("A priori")
 
+    def _ajustes_motor(self):
+        # Todo lo que, además de los datos, determina el resultado de un paso
+        ajustes = {'motor': self.motor, 'prior_tasa': self.prior_tasa, 'verosimilitud': self.verosimilitud,
+                   'ventana': self.ventana, 'decaimiento': self.decaimiento,
+                   'adelgazar': self.adelgazar, 'guardar_traza': self.guardar_traza}
+        if self.prior_tasa == "lognormal":
+            ajustes.update(mu_log=float(self.mu_log), sigma_log=float(self.sigma_log))
+        if self.motor in ("nuts", "auto"):
+            ajustes.update(draws=self.draws, tune=self.tune, chains=self.chains)
+            if self.adaptativo:
+                ajustes.update(draws_bloque=self.draws_bloque, ess_objetivo=self.ess_objetivo,
+                               rhat_max=self.rhat_max, tune_bloque=self.tune_bloque)
+            if self.arranque_en_caliente:
+                ajustes.update(arranque_en_caliente=True, tune_caliente=self.tune_caliente)
+        if self.motor != "nuts":
+            ajustes.update(num_muestras_aprox=self.num_muestras_aprox)
+            if self.motor == "advi":
+                ajustes.update(iteraciones_advi=self.iteraciones_advi)
+        if self.motor == "auto":
+            ajustes.update(presupuesto_ms=self.presupuesto_ms, precision=self.precision)
+        return ajustes
+
+    @property
+    def conjugado(self):
+        """
+        True con prior Gamma y verosimilitud Poisson: el posterior de cada
+        día es el prior del siguiente y alpha/beta lo describen exactamente.
+        En las variantes no conjugadas cada día se ajusta el modelo sobre
+        todos los días acumulados partiendo del prior original.
+        """
+        return self.prior_tasa == "gamma" and self.verosimilitud == "poisson"
+
+    def _datos_modelo(self, prior, dias):
+        """
+        Valores de los contenedores pm.Data del modelo de un paso:
+        - prior: (alpha_a, beta_a, alpha_b, beta_b) del prior Gamma
+        - dias: lista de dicts de datos ('clicks_a', 'visitas_a', ...) que
+          entran en la verosimilitud (solo el día actual en el caso conjugado)
+        """
+        datos = {clave: np.array([d[clave] for d in dias]) for clave in ('clicks_a', 'visitas_a', 'clicks_b', 'visitas_b')}
+        if self.prior_tasa == "gamma":
+            datos['prior'] = np.asarray(prior, dtype=float)
+        return datos
+
+    def _construir_modelo(self, prior, dias):
+        """
+        Modelo de PyMC para un paso (ver _datos_modelo). Datos y prior van
+        en contenedores pm.Data, de modo que el mismo modelo sirve para
+        otro paso con pm.set_data sin volver a compilarlo.
+        """
+        with pm.Model() as model:
+            datos = {nombre: pm.Data(nombre, valor) for nombre, valor in self._datos_modelo(prior, dias).items()}
+            if self.prior_tasa == "gamma":
+                prior = datos['prior']
+                tasa_a = pm.Gamma('tasa_clicks_a', alpha=prior[0], beta=prior[1])
+                tasa_b = pm.Gamma('tasa_clicks_b', alpha=prior[2], beta=prior[3])
+            else:
+                tasa_a = pm.LogNormal('tasa_clicks_a', mu=self.mu_log, sigma=self.sigma_log)
+                tasa_b = pm.LogNormal('tasa_clicks_b', mu=self.mu_log, sigma=self.sigma_log)
+
+            mu_a, mu_b = tasa_a * datos['visitas_a'], tasa_b * datos['visitas_b']
+            if self.verosimilitud == "poisson":
+                pm.Poisson('obs_a', mu=mu_a, observed=datos['clicks_a'])
+                pm.Poisson('obs_b', mu=mu_b, observed=datos['clicks_b'])
+            else:
+                dispersion_a = pm.Gamma('dispersion_a', alpha=2, beta=0.1)
+                dispersion_b = pm.Gamma('dispersion_b', alpha=2, beta=0.1)
+                pm.NegativeBinomial('obs_a', mu=mu_a, alpha=dispersion_a, observed=datos['clicks_a'])
+                pm.NegativeBinomial('obs_b', mu=mu_b, alpha=dispersion_b, observed=datos['clicks_b'])
+
+            pm.Deterministic('diferencia', tasa_b - tasa_a)
+        return model
+
+    def _entradas_paso(self, indice, datos_dia=None):
+        """
+        Prior y días que entran en el modelo del paso `indice` del historial
+        (o del día nuevo datos_dia, que iría en esa posición).
+        """
+        anterior = self.historial[indice - 1]
+        datos_dia = datos_dia or self.historial[indice]['datos']
+        if self.conjugado:
+            return (anterior['alpha_a'], anterior['beta_a'], anterior['alpha_b'], anterior['beta_b']), [datos_dia]
+
+        inicial = self.historial[0]
+        prior = (inicial['alpha_a'], inicial['beta_a'], inicial['alpha_b'], inicial['beta_b'])
+        previos = [paso['datos'] for paso in self.historial[1:indice] if 'datos' in paso]
+        return prior, previos + [datos_dia]
+
+    def _modelo_para_paso(self, indice, datos_dia=None):
+        """
+        Modelo del paso `indice` del historial (o del día nuevo datos_dia,
+        que iría en esa posición).
+        """
+        return self._construir_modelo(*self._entradas_paso(indice, datos_dia))
+
+    def _aproximar(self, motor, indice, datos_dia=None):
+        """
+        Inferencia aproximada del paso `indice` (o del día nuevo datos_dia):
+        - laplace: ver _laplace
+        - advi: ADVI de campo medio sobre el modelo del paso
+        Devuelve un InferenceData con la misma estructura de posterior que
+        NUTS y un dict con la información de la aproximación.
+        """
+        if motor == "laplace":
+            return self._laplace(*self._entradas_paso(indice, datos_dia))
+        with self._modelo_para_paso(indice, datos_dia):
+            aproximacion = pm.fit(n=self.iteraciones_advi, method="advi", progressbar=False)
+            trace = aproximacion.sample(self.num_muestras_aprox)
+        perdidas = np.asarray(aproximacion.hist)
+        final = perdidas[-max(1, len(perdidas) // 10):]
+        return trace, {'motor': 'advi', 'iteraciones': len(perdidas), 'elbo_final': float(-final.mean())}
+
+    def _plantilla_laplace(self, prior, dias):
+        """
+        Modelo y funciones compiladas (log-densidad con el jacobiano, su
+        gradiente y su Hessiano respecto de las variables no restringidas)
+        para la estructura de modelo de esta calculadora. Se compilan una
+        vez por proceso y estructura; cada paso solo cambia los datos.
+        """
+        estructura = (self.prior_tasa, self.verosimilitud,
+                      *((float(self.mu_log), float(self.sigma_log)) if self.prior_tasa == "lognormal" else ()))
+        with _LOCK_LAPLACE:
+            plantilla = _PLANTILLAS_LAPLACE.get(estructura)
+            if plantilla is None:
+                model = self._construir_modelo(prior, dias)
+                plantilla = {
+                    'model': model,
+                    'logp': model.compile_logp(jacobian=True),
+                    'dlogp': model.compile_dlogp(jacobian=True),
+                    'd2logp': model.compile_d2logp(jacobian=True, negate_output=False),
+                    'lock': threading.Lock(),
+                }
+                _PLANTILLAS_LAPLACE[estructura] = plantilla
+        return plantilla
+
+    def _laplace(self, prior, dias):
+        """
+        Aproximación de Laplace en el espacio no restringido (log) de las
+        variables: normal centrada en el máximo de la log-densidad con el
+        jacobiano de la transformación (la moda de log(tasa), no la de la
+        tasa, que con cero clicks está en el borde) y covarianza igual a la
+        inversa del Hessiano negativo en ese punto. Las muestras se
+        devuelven a la escala original con exp.
+        """
+        plantilla = self._plantilla_laplace(prior, dias)
+        model = plantilla['model']
+        with plantilla['lock']:
+            with model:
+                pm.set_data(self._datos_modelo(prior, dias))
+            inicio = self._moda_laplace if self._moda_laplace is not None else model.initial_point()
+            inicio = DictToArrayBijection.map(inicio)
+
+            def objetivo(x):
+                punto = DictToArrayBijection.rmap(RaveledVars(x, inicio.point_map_info))
+                return -plantilla['logp'](punto), -plantilla['dlogp'](punto)
+
+            resultado = minimize(objetivo, inicio.data, jac=True, method="BFGS")
+            moda = DictToArrayBijection.rmap(RaveledVars(resultado.x, inicio.point_map_info))
+            precision = -plantilla['d2logp'](moda)
+        if not np.all(np.isfinite(resultado.x)) or not np.all(np.linalg.eigvalsh(precision) > 0):
+            raise ValueError("La aproximación de Laplace no encontró un máximo: usa NUTS o ADVI")
+        self._moda_laplace = moda
+
+        muestras = self._rng.multivariate_normal(resultado.x, np.linalg.inv(precision), size=self.num_muestras_aprox)
+        posterior = {}
+        for i, rv in enumerate(model.free_RVs):
+            # Todas las variables del modelo son positivas (transformación log)
+            transformada = model.rvs_to_transforms.get(rv) is not None
+            posterior[rv.name] = np.exp(muestras[:, i]) if transformada else muestras[:, i]
+        posterior['diferencia'] = posterior['tasa_clicks_b'] - posterior['tasa_clicks_a']
+        trace = az.from_dict(posterior={nombre: valores[None, :] for nombre, valores in posterior.items()})
+        moda_original = {rv.name: float(np.exp(resultado.x[i])) for i, rv in enumerate(model.free_RVs)}
+        return trace, {'motor': 'laplace', 'map': moda_original, 'iteraciones': int(resultado.nit)}
+
+    def validar_con_conjugado(self, indice=-1):
+        """
+        Compara un paso hecho con un motor aproximado (Laplace o ADVI) con
+        el posterior Gamma exacto del modelo conjugado: P(B > A) por
+        cuadratura y medias de cada grupo. Sirve de comprobación de
+        regresión de las aproximaciones, también con grupos sin clicks.
+        """
+        if not self.conjugado:
+            raise ValueError("La comparación exacta solo es posible con prior Gamma y verosimilitud Poisson")
+        indice = indice % len(self.historial)
+        paso = self.historial[indice]
+        if 'muestras' not in paso:
+            raise ValueError("El paso indicado no tiene inferencia que validar")
+        exacto = resumen_analitico("clicks", paso['alpha_a'], paso['beta_a'], paso['alpha_b'], paso['beta_b'])
+        aproximado = {
+            'prob_b_mejor': float(np.mean(paso['muestras']['diferencia'] > 0)),
+            'media_a': float(np.mean(paso['muestras']['tasa_clicks_a'], dtype=np.float64)),
+            'media_b': float(np.mean(paso['muestras']['tasa_clicks_b'], dtype=np.float64)),
+        }
+        return {
+            'aproximado': aproximado,
+            'exacto': {clave: float(exacto[clave]) for clave in ('prob_b_mejor', 'media_a', 'media_b')},
+            'error_prob_b_mejor': abs(aproximado['prob_b_mejor'] - float(exacto['prob_b_mejor'])),
+        }
+
+    def validar_con_nuts(self, indice=-1):
+        """
+        Repite con NUTS la inferencia de un paso hecho con un motor
+        aproximado y compara los resúmenes que usa detectar_ganador.
+        """
+        indice = indice % len(self.historial)
+        paso = self.historial[indice]
+        if 'muestras' not in paso:
+            raise ValueError("El paso indicado no tiene inferencia que validar")
+
+        trace_nuts, diagnostico = self._muestrear(self._modelo_para_paso(indice))
+
+        def resumen(diff):
+            diff = np.ravel(diff)
+            return {'prob_b_mejor': float(np.mean(diff > 0)), 'media_diferencia': float(np.mean(diff)),
+                    'ic_95_diferencia': np.percentile(diff, [2.5, 97.5])}
+
+        aproximado = resumen(paso['muestras']['diferencia'])
+        exacto = resumen(trace_nuts.posterior['diferencia'].values)
+        return {
+            'aproximado': aproximado,
+            'nuts': exacto,
+            'error_prob_b_mejor': abs(aproximado['prob_b_mejor'] - exacto['prob_b_mejor']),
+            'diagnostico_nuts': diagnostico,
+        }
+
+    def _compactar(self, trace):
+        """
+        Arrays (cadena, muestra) de VARIABLES_GUARDADAS en float32
+        contiguo, con una de cada `adelgazar` muestras.
+        """
+        return {
+            nombre: np.ascontiguousarray(trace.posterior[nombre].values[:, ::self.adelgazar], dtype=np.float32)
+            for nombre in VARIABLES_GUARDADAS
+        }
+
+    def traza_completa(self, indice=-1):
+        """
+        InferenceData completo de un paso, para depuración. Si no se guardó
+        (guardar_traza=False) se repite la inferencia de ese paso con el
+        mismo modelo y motor: es equivalente, pero no son las mismas muestras.
+        """
+        indice = indice % len(self.historial)
+        paso = self.historial[indice]
+        if 'trace' in paso:
+            return paso['trace']
+        if 'datos' not in paso:
+            raise ValueError("El paso indicado no tiene inferencia")
+        motor = paso.get('motor', {}).get('motor', self.motor)
+        if motor not in ("nuts", "laplace", "advi"):
+            parametros = (paso['alpha_a'], paso['beta_a'], paso['alpha_b'], paso['beta_b'])
+            return self._muestrear_conjugado(motor, paso['motor']['num_muestras'], parametros)[0]
+        if motor == "nuts":
+            return self._muestrear(self._modelo_para_paso(indice))[0]
+        return self._aproximar(motor, indice)[0]
+
+    def _diagnosticar(self, trace, ess_objetivo=None):
+        ess = az.ess(trace, var_names=VARIABLES_DIAGNOSTICO)
+        rhat = az.rhat(trace, var_names=VARIABLES_DIAGNOSTICO)
+        diagnostico = {
+            'ess': {var: float(ess[var]) for var in VARIABLES_DIAGNOSTICO},
+            'rhat': {var: float(rhat[var]) for var in VARIABLES_DIAGNOSTICO},
+            'draws': int(trace.posterior.sizes['draw']),
+        }
+        diagnostico['convergido'] = (
+            min(diagnostico['ess'].values()) >= (ess_objetivo or self.ess_objetivo)
+            and max(diagnostico['rhat'].values()) <= self.rhat_max
+        )
+        return diagnostico
+
+    @staticmethod
+    def _adaptacion(model, trace):
+        """
+        Estado de NUTS al final de una traza, para arrancar en caliente la
+        siguiente: posición final de cada cadena, media y varianza de las
+        variables en el espacio no restringido (la métrica diagonal) y el
+        tamaño de paso adaptado. Son unos pocos floats por variable.
+        """
+        nombres = [rv.name for rv in model.free_RVs]
+        columnas = []
+        for rv in model.free_RVs:
+            valores = trace.posterior[rv.name].values.ravel()
+            # Todas las variables del modelo son positivas (transformación log)
+            columnas.append(np.log(valores) if model.rvs_to_transforms.get(rv) is not None else valores)
+        no_restringidas = np.column_stack(columnas)
+        posterior = trace.posterior
+        return {
+            'variables': nombres,
+            'media': no_restringidas.mean(axis=0),
+            'varianza': no_restringidas.var(axis=0),
+            'tamano_paso': float(trace.sample_stats['step_size'].values[:, -1].mean()),
+            'posiciones': [{nombre: float(posterior[nombre].values[c, -1]) for nombre in nombres}
+                           for c in range(posterior.sizes['chain'])],
+        }
+
+    def _ejecutar_nuts(self, draws, tune, adaptacion=None):
+        """
+        pm.sample dentro del contexto del modelo. Con `adaptacion` (ver
+        _adaptacion) las cadenas parten de sus posiciones finales con la
+        métrica y el tamaño de paso heredados, así que basta un tune corto.
+        """
+        model = pm.modelcontext(None)
+        opciones = {'tune': tune, 'chains': self.chains, 'cores': 1, 'progressbar': False}
+        if (adaptacion is not None and adaptacion['variables'] == [rv.name for rv in model.free_RVs]
+                and len(adaptacion['posiciones']) == self.chains):
+            valores = [model.rvs_to_values[rv] for rv in model.free_RVs]
+            potencial = QuadPotentialDiagAdapt(len(valores), np.asarray(adaptacion['media']),
+                                               np.asarray(adaptacion['varianza']),
+                                               initial_weight=PESO_METRICA_CALIENTE)
+            # NUTS empieza con step_scale / n^(1/4) como tamaño de paso
+            opciones['step'] = pm.NUTS(vars=valores, potential=potencial,
+                                       step_scale=adaptacion['tamano_paso'] * len(valores) ** 0.25)
+            opciones['initvals'] = adaptacion['posiciones']
+        return pm.sample(draws, **opciones)
+
+    def _muestrear(self, model, draws=None, ess_objetivo=None, adaptacion=None):
+        """
+        Ejecuta NUTS sobre el modelo del día. En modo adaptativo muestrea en
+        bloques de draws_bloque por cadena, continuando cada cadena desde su
+        última posición con una readaptación corta, hasta que el ESS de las
+        tasas y la diferencia alcanza ess_objetivo y R-hat queda por debajo
+        de rhat_max (o se llega a draws). draws y ess_objetivo sustituyen a
+        los del constructor (el modo auto los ajusta a su presupuesto).
+        Con `adaptacion` (la del día anterior) el primer bloque arranca en
+        caliente con tune_caliente iteraciones de readaptación.
+        """
+        draws = draws or self.draws
+        tune = self.tune_caliente if adaptacion is not None else self.tune
+        with model:
+            if not self.adaptativo:
+                trace = self._ejecutar_nuts(draws, tune, adaptacion)
+                return trace, self._diagnosticar(trace, ess_objetivo)
+
+            bloque = min(self.draws_bloque, draws)
+            bloques = [self._ejecutar_nuts(bloque, tune, adaptacion)]
+            trace = bloques[0]
+            diagnostico = self._diagnosticar(trace, ess_objetivo)
+
+            while not diagnostico['convergido'] and diagnostico['draws'] < draws:
+                bloque = min(self.draws_bloque, draws - diagnostico['draws'])
+                if self.arranque_en_caliente:
+                    bloques.append(self._ejecutar_nuts(bloque, self.tune_bloque, self._adaptacion(model, bloques[-1])))
+                else:
+                    ultimo = bloques[-1].posterior
+                    iniciales = [
+                        {var: float(ultimo[var].values[c, -1]) for var in ('tasa_clicks_a', 'tasa_clicks_b')}
+                        for c in range(self.chains)
+                    ]
+                    bloques.append(pm.sample(bloque, tune=self.tune_bloque, chains=self.chains, cores=1,
+                                             initvals=iniciales, progressbar=False))
+                trace = az.concat(*bloques, dim='draw')
+                diagnostico = self._diagnosticar(trace, ess_objetivo)
+
+        diagnostico['bloques'] = len(bloques)
+        return trace, diagnostico
+
+    def _muestrear_conjugado(self, motor, n, parametros):
+        """
+        Muestras del posterior Gamma exacto del modelo conjugado
+        (parametros = alpha_a, beta_a, alpha_b, beta_b) con los motores de
+        muestreo directo de seleccion_motor ("analitico", "qmc" o
+        "montecarlo"), en un InferenceData de una cadena con la misma
+        estructura que el de NUTS.
+        """
+        muestras_a, muestras_b = muestrear("clicks", motor, *parametros, n, self._rng)
+        trace = az.from_dict(posterior={
+            'tasa_clicks_a': muestras_a[None, :],
+            'tasa_clicks_b': muestras_b[None, :],
+            'diferencia': (muestras_b - muestras_a)[None, :],
+        })
+        return trace, {'motor': motor}
+
+    def _elegir_motor(self, datos_dia):
+        """
+        Elección del modo auto para el día que se va a ingerir (ver
+        seleccion_motor.elegir_motor). Sin conjugación solo queda NUTS, con
+        las muestras ajustadas al presupuesto.
+        """
+        parametros = (self.alpha_a + datos_dia['clicks_a'], self.beta_a + datos_dia['visitas_a'],
+                      self.alpha_b + datos_dia['clicks_b'], self.beta_b + datos_dia['visitas_b'])
+        disponibles = ("analitico", "qmc", "montecarlo", "mcmc") if self.conjugado else ("mcmc",)
+        return elegir_motor("clicks", prob_estimada("clicks", *parametros), disponibles=disponibles,
+                            presupuesto_ms=self.presupuesto_ms, precision=self.precision,
+                            num_muestras=self.num_muestras_aprox, muestras_mcmc=self.draws * self.chains)
+
     def _guardar_estado(self, dia):
         estado = {
             'dia': dia,
@@ -34,38 +532,269 @@ class CalculadoraClicksBayesiana:
             'clicks_b': clicks_b,
             'visitas_b': visitas_b
         }
+        self._ingerir(datos_dia, dia or f"Día {len(self.historial)}")
 
-        with pm.Model() as model:
-            tasa_a = pm.Gamma('tasa_clicks_a', alpha=self.alpha_a, beta=self.beta_a)
-            tasa_b = pm.Gamma('tasa_clicks_b', alpha=self.alpha_b, beta=self.beta_b)
+    def _ingerir(self, datos_dia, dia, intermedio=False):
+        """
+        Añade el paso de un día. Con intermedio (días desplazados por
+        _rehacer_desde en el modelo conjugado que no son el último) el
+        posterior Gamma exacto se muestrea directamente con MUESTRAS_MINIMAS,
+        lo justo para la CDF y los gráficos, y el paso no se guarda en la caché.
+        """
+        clicks_a, visitas_a = datos_dia['clicks_a'], datos_dia['visitas_a']
+        clicks_b, visitas_b = datos_dia['clicks_b'], datos_dia['visitas_b']
 
-            pm.Poisson('obs_a', mu=tasa_a * visitas_a, observed=clicks_a)
-            pm.Poisson('obs_b', mu=tasa_b * visitas_b, observed=clicks_b)
+        # Si otra sesión ya calculó esta misma secuencia de días, se reutiliza
+        clave = self._clave_dia(self._clave_cache, dia, datos_dia)
+        if self.cache is not None:
+            paso = self.cache.obtener(clave)
+            if paso is not None:
+                self.alpha_a, self.beta_a = paso['alpha_a'], paso['beta_a']
+                self.alpha_b, self.beta_b = paso['alpha_b'], paso['beta_b']
+                self._cache_asignacion = None
+                self._clave_cache = clave
+                self.historial.append(paso)
+                return
 
-            pm.Deterministic('diferencia', tasa_b - tasa_a)
+        seleccion = None
+        motor = "montecarlo" if intermedio else self.motor
+        if motor == "auto":
+            seleccion = self._elegir_motor(datos_dia)
+            motor = "nuts" if seleccion['motor'] == "mcmc" else seleccion['motor']
 
-            trace = pm.sample(2000, tune=1000, chains=2, cores=1, progressbar=False)
+        inicio = time.perf_counter()
+        if motor == "nuts":
+            model = self._modelo_para_paso(len(self.historial), datos_dia)
+            # El posterior de hoy se parece mucho al de ayer: se parte de su adaptación
+            adaptacion = self.historial[-1].get('adaptacion') if self.arranque_en_caliente else None
+            if seleccion is not None:
+                # Muestras efectivas pedidas por la elección, repartidas entre las cadenas
+                draws = max(seleccion['num_muestras'] // self.chains, 1)
+                ess_objetivo = seleccion['num_muestras'] if self.precision is not None else None
+                trace, diagnostico = self._muestrear(model, draws=draws, ess_objetivo=ess_objetivo,
+                                                     adaptacion=adaptacion)
+            else:
+                trace, diagnostico = self._muestrear(model, adaptacion=adaptacion)
+            diagnostico['arranque_en_caliente'] = adaptacion is not None
+            if not diagnostico['convergido']:
+                warnings.warn(
+                    f"{dia}: el muestreo no alcanzó la convergencia objetivo "
+                    f"(ESS mínimo {min(diagnostico['ess'].values()):.0f}, "
+                    f"R-hat máximo {max(diagnostico['rhat'].values()):.3f})"
+                )
+        elif motor in ("laplace", "advi"):
+            trace, aproximacion = self._aproximar(motor, len(self.historial), datos_dia)
+        else:
+            parametros = (self.alpha_a + clicks_a, self.beta_a + visitas_a, self.alpha_b + clicks_b, self.beta_b + visitas_b)
+            num_muestras = MUESTRAS_MINIMAS if intermedio else seleccion['num_muestras']
+            trace, aproximacion = self._muestrear_conjugado(motor, num_muestras, parametros)
+        segundos = time.perf_counter() - inicio
+        num_muestras = int(trace.posterior.sizes['chain'] * trace.posterior.sizes['draw'])
+        if motor != "laplace" and motor != "advi" and not intermedio:
+            CRONOMETRO.registrar("clicks", "mcmc" if motor == "nuts" else motor, num_muestras, segundos)
 
         self.alpha_a += clicks_a
         self.beta_a += visitas_a
         self.alpha_b += clicks_b
         self.beta_b += visitas_b
+        self._cache_asignacion = None
+
+        vistas = calcular_vistas("clicks", self.historial, {
+            'alpha_a': self.alpha_a, 'beta_a': self.beta_a, 'alpha_b': self.alpha_b, 'beta_b': self.beta_b,
+        }, self.ventana, self.decaimiento)
 
-        self._guardar_estado(dia or f"Día {len(self.historial)}")
-        self.historial[-1]["trace"] = trace
+        self._guardar_estado(dia)
+        if vistas:
+            self.historial[-1]["vistas"] = vistas
+        self.historial[-1]["muestras"] = self._compactar(trace)
+        if self.guardar_traza:
+            self.historial[-1]["trace"] = trace
         self.historial[-1]["datos"] = datos_dia
+        if motor == "nuts":
+            self.historial[-1]["diagnostico"] = diagnostico
+            if self.arranque_en_caliente:
+                self.historial[-1]["adaptacion"] = self._adaptacion(model, trace)
+        else:
+            self.historial[-1]["aproximacion"] = aproximacion
+        # Motor usado (y, en modo auto, la elección con sus estimaciones)
+        self.historial[-1]["motor"] = {**(seleccion or {}), "motor": motor, "num_muestras": num_muestras,
+                                       "tiempo_ms": 1000 * segundos}
 
-        # Cálculo de uplift/downlift
+        # Cálculo de uplift/downlift (con la traza completa en float64)
         tasa_a_muestral = trace.posterior['tasa_clicks_a'].values.flatten()
         tasa_b_muestral = trace.posterior['tasa_clicks_b'].values.flatten()
         uplift_muestral = (tasa_b_muestral - tasa_a_muestral) / tasa_a_muestral
 
+        if self.conjugado:
+            tasa_a = self.alpha_a / self.beta_a
+            tasa_b = self.alpha_b / self.beta_b
+        else:
+            # Sin conjugación alpha/beta no describen el posterior: medias muestrales
+            tasa_a = tasa_a_muestral.mean()
+            tasa_b = tasa_b_muestral.mean()
+
         self.historial[-1]["uplift"] = {
             "media": np.mean(uplift_muestral),
             "std": np.std(uplift_muestral),
-            "ic_95": np.percentile(uplift_muestral, [2.5, 97.5])
+            "ic_95": np.percentile(uplift_muestral, [2.5, 97.5]),
+            "mejora_relativa": float((tasa_b - tasa_a) / tasa_a)
+        }
+
+        # CDF compactas: detectar_ganador y los umbrales de la interfaz se
+        # resuelven con búsquedas binarias sin volver a recorrer la traza
+        self.historial[-1]["cdf"] = {
+            "diferencia": resumir_cdf(trace.posterior['diferencia'].values),
+            "uplift": resumir_cdf(uplift_muestral)
+        }
+        # Sin conjugación, el informe resume las muestras en lugar de alpha/beta
+        self.historial[-1]["conjugado"] = self.conjugado
+        # Fila del historial detallado, calculada una sola vez
+        self.historial[-1]["informe"] = fila_informe(self.historial[-1])
+
+        self._clave_cache = clave
+        if self.cache is not None and not intermedio:
+            self.cache.guardar(clave, self.historial[-1])
+
+    @staticmethod
+    def _clave_dia(clave_anterior, dia, datos):
+        return encadenar_clave(clave_anterior, dia, int(datos['clicks_a']), int(datos['visitas_a']),
+                               int(datos['clicks_b']), int(datos['visitas_b']))
+
+    def _indice_dia(self, dia):
+        """
+        Posición en el historial de un día, por etiqueta ("Día 3") o por
+        índice (1 = primer día con datos).
+        """
+        if isinstance(dia, (int, np.integer)):
+            if not 1 <= dia < len(self.historial):
+                raise ValueError(f"No existe el día en la posición {dia}")
+            return int(dia)
+        for indice, paso in enumerate(self.historial[1:], start=1):
+            if paso['dia'] == dia:
+                return indice
+        raise ValueError(f"No existe el día {dia!r} en el historial")
+
+    def _rehacer_desde(self, indice, dias):
+        """
+        Deja el historial como estaba antes del paso `indice` y vuelve a
+        ingerir `dias` (lista de (etiqueta, datos)). Los pasos anteriores
+        no se tocan y el estado se recupera del último de ellos, así que el
+        coste es proporcional a los días que quedan detrás del modificado.
+        Los pasos se comparten con la caché: se recorta la lista, nunca se
+        modifican en el sitio.
+
+        En el modelo conjugado alpha/beta de cada día posterior quedan
+        desplazados exactamente en lo que cambió el día modificado, así que
+        solo el último día, el que lee detectar_ganador, pasa por el motor
+        de la calculadora (NUTS incluido); los intermedios se muestrean del
+        posterior Gamma exacto (ver _ingerir). Sin conjugación cada día
+        depende de todos los anteriores y se repite la inferencia completa.
+        """
+        self.historial = self.historial[:indice]
+        anterior = self.historial[-1]
+        self.alpha_a, self.beta_a = anterior['alpha_a'], anterior['beta_a']
+        self.alpha_b, self.beta_b = anterior['alpha_b'], anterior['beta_b']
+        self._cache_asignacion = None
+
+        clave = self._clave_inicial
+        for paso in self.historial[1:]:
+            clave = self._clave_dia(clave, paso['dia'], paso['datos'])
+        self._clave_cache = clave
+
+        for posicion, (dia, datos) in enumerate(dias, start=1):
+            self._ingerir(datos, dia, intermedio=self.conjugado and posicion < len(dias))
+
+    def eliminar_dia(self, dia):
+        """
+        Quita un día del historial (por ejemplo, uno afectado por una caída
+        del tracking). Los parámetros acumulados se recuperan del día
+        anterior y solo se recalculan los días posteriores, cuyo posterior
+        dependía del eliminado.
+        """
+        indice = self._indice_dia(dia)
+        posteriores = [(paso['dia'], paso['datos']) for paso in self.historial[indice + 1:]]
+        self._rehacer_desde(indice, posteriores)
+
+    def corregir_dia(self, dia, clicks_a, visitas_a, clicks_b, visitas_b):
+        """
+        Sustituye los datos de un día manteniendo su etiqueta y posición.
+        Igual que eliminar_dia, solo se recalculan ese día y los siguientes.
+        """
+        indice = self._indice_dia(dia)
+        corregido = {'clicks_a': clicks_a, 'visitas_a': visitas_a, 'clicks_b': clicks_b, 'visitas_b': visitas_b}
+        dias = [(self.historial[indice]['dia'], corregido)]
+        dias += [(paso['dia'], paso['datos']) for paso in self.historial[indice + 1:]]
+        self._rehacer_desde(indice, dias)
+
+    def opciones(self):
+        """
+        Argumentos del constructor (salvo priors y caché), para reconstruir
+        una calculadora equivalente con desde_estadisticos(..., **opciones).
+        RegistroExperimentos los guarda con cada experimento.
+        """
+        return {
+            'draws': self.draws, 'tune': self.tune, 'chains': self.chains,
+            'adaptativo': self.adaptativo, 'draws_bloque': self.draws_bloque, 'ess_objetivo': self.ess_objetivo,
+            'rhat_max': self.rhat_max, 'tune_bloque': self.tune_bloque,
+            'motor': self.motor, 'prior_tasa': self.prior_tasa, 'mu_log': float(self.mu_log),
+            'sigma_log': float(self.sigma_log), 'verosimilitud': self.verosimilitud,
+            'num_muestras_aprox': self.num_muestras_aprox, 'iteraciones_advi': self.iteraciones_advi,
+            'ventana': self.ventana, 'decaimiento': self.decaimiento,
+            'adelgazar': self.adelgazar, 'guardar_traza': self.guardar_traza,
+            'presupuesto_ms': self.presupuesto_ms, 'precision': self.precision,
+            'arranque_en_caliente': self.arranque_en_caliente, 'tune_caliente': self.tune_caliente,
         }
 
+    def estadisticos_suficientes(self):
+        """
+        Recuentos por día y priors iniciales, serializables y fusionables
+        con los de otras calculadoras (ver EstadisticosSuficientes.fusionar).
+        """
+        inicial = self.historial[0]
+        priors = {clave: float(inicial[clave]) for clave in ('alpha_a', 'beta_a', 'alpha_b', 'beta_b')}
+        estadisticos = EstadisticosSuficientes("clicks", priors)
+        for paso in self.historial[1:]:
+            datos = paso["datos"]
+            estadisticos.agregar(paso["dia"], exitos_a=datos['clicks_a'], visitas_a=datos['visitas_a'],
+                                 exitos_b=datos['clicks_b'], visitas_b=datos['visitas_b'])
+        return estadisticos
+
+    @classmethod
+    def desde_estadisticos(cls, estadisticos, **opciones):
+        """
+        Reconstruye una calculadora a partir de estadísticos suficientes
+        (por ejemplo, la fusión de los estados parciales de varios
+        trabajadores), ingiriendo los días en orden.
+
+        Repite la inferencia completa de cada día: con el motor NUTS es un
+        muestreo MCMC por día (minutos para historiales largos). Para
+        consultar un experimento ya analizado sin recalcular, ver
+        RegistroExperimentos.resumen_dias.
+        """
+        if estadisticos.modelo != "clicks":
+            raise ValueError(f"Se esperaban estadísticos de clicks, no de {estadisticos.modelo}")
+        priors = estadisticos.priors
+        calculadora = cls(priors['alpha_a'], priors['beta_a'], priors['alpha_b'], priors['beta_b'], **opciones)
+        for dia, r in estadisticos.recuentos.items():
+            calculadora.actualizar_con_datos(r['exitos_a'], r['visitas_a'], r['exitos_b'], r['visitas_b'], dia=dia)
+        return calculadora
+
+    def sugerir_asignacion(self, n=1, metodo="thompson", beta_top_two=0.5):
+        """
+        Reparto de los próximos n visitantes entre A y B según el posterior
+        Gamma actual (Thompson sampling o top-two). Las muestras se extraen
+        en bloque y los parámetros se cachean hasta la siguiente
+        actualización, de modo que se puede llamar en cada petición.
+        Con n grande, 'pesos' sirve como reparto de tráfico del siguiente periodo.
+        """
+        if self._cache_asignacion is None:
+            self._cache_asignacion = (self.alpha_a, 1 / self.beta_a, self.alpha_b, 1 / self.beta_b)
+        alpha_a, escala_a, alpha_b, escala_b = self._cache_asignacion
+
+        muestras_a = self._rng.gamma(alpha_a, escala_a, n)
+        muestras_b = self._rng.gamma(alpha_b, escala_b, n)
+        return asignar(muestras_a, muestras_b, metodo, self._rng, beta_top_two)
+
     def _resumen(self, muestras):
         return {
             'Media': np.mean(muestras),
@@ -74,22 +803,19 @@ class CalculadoraClicksBayesiana:
         }
 
     def detectar_ganador(self, umbral_probabilidad = 0.95, umbral_mejora_minima = 0.01):
-        if not self.historial or 'trace' not in self.historial[-1]:
+        if not self.historial or 'cdf' not in self.historial[-1]:
             return {
                 "ganador": None,
                 "decision": "Continuar prueba",
                 "razon": "No hay datos suficientes"
             }
 
-        ultimo_trace = self.historial[-1]['trace']
-        diff = ultimo_trace.posterior['diferencia'].values.flatten()
-
-        prob_b_mejor = np.mean(diff > 0)
-        prob_a_mejor = np.mean(diff < 0)
-
-        tasa_a = self.alpha_a / self.beta_a
-        tasa_b = self.alpha_b / self.beta_b
-        mejora_relativa = (tasa_b - tasa_a) / tasa_a
+        # Todo lo necesario está precalculado en el paso: la consulta es
+        # O(log n) y se puede repetir en cada cambio de los umbrales
+        ultimo = self.historial[-1]
+        prob_b_mejor = float(prob_mayor(ultimo['cdf']['diferencia'], 0.0))
+        prob_a_mejor = float(prob_menor(ultimo['cdf']['diferencia'], 0.0))
+        mejora_relativa = ultimo['uplift']['mejora_relativa']
 
         if prob_b_mejor >= umbral_probabilidad and mejora_relativa >= umbral_mejora_minima:
             return {
@@ -116,7 +842,35 @@ class CalculadoraClicksBayesiana:
                 "mejora_relativa": mejora_relativa
             }
 
-    def mostrar_historial_completo(self):
+    def series_decision(self):
+        """
+        P(B > A) y mejora relativa de cada día (sin el paso "A priori"),
+        las dos entradas de la regla de detectar_ganador, como arrays.
+        Se usa en barrido_umbrales.barrer_umbrales.
+        """
+        pasos = [paso for paso in self.historial[1:] if 'cdf' in paso]
+        return {
+            'dias': [paso['dia'] for paso in pasos],
+            'prob_b_mejor': np.array([prob_mayor(paso['cdf']['diferencia'], 0.0) for paso in pasos], dtype=float),
+            'mejora_relativa': np.array([paso['uplift']['mejora_relativa'] for paso in pasos], dtype=float),
+        }
+
+    def probabilidad_uplift(self, umbral=0.0, indice=-1):
+        """
+        P(uplift de B sobre A > umbral) en el paso indicado, por búsqueda
+        binaria en la CDF compacta. Admite un array de umbrales.
+        """
+        paso = self.historial[indice]
+        if 'cdf' not in paso:
+            return None
+        return prob_mayor(paso['cdf']['uplift'], umbral)
+
+    def mostrar_historial_completo(self, graficos=False):
+        """
+        Imprime el historial día a día con los resúmenes ya guardados en
+        cada paso (ver informe_historial). Con graficos=True dibuja además
+        las densidades de cada día, lo que es lento con muchos días.
+        """
         for paso in self.historial:
             print(f"\n🗓️  {paso['dia']}")
             print(f"Parámetros:")
@@ -129,9 +883,10 @@ class CalculadoraClicksBayesiana:
                 print(f"  Grupo A: {datos['clicks_a']} clicks en {datos['visitas_a']} visitas (tasa: {datos['clicks_a']/datos['visitas_a']:.4f})")
                 print(f"  Grupo B: {datos['clicks_b']} clicks en {datos['visitas_b']} visitas (tasa: {datos['clicks_b']/datos['visitas_b']:.4f})")
 
+            informe = paso['informe'] if 'informe' in paso else fila_informe(paso)
             mean_a = paso['alpha_a'] / paso['beta_a']
             std_a = np.sqrt(paso['alpha_a'] / (paso['beta_a']**2))
-            ic_a = np.percentile(np.random.gamma(paso['alpha_a'], 1/paso['beta_a'], 10000), [2.5, 97.5])
+            ic_a = (informe['ic_inf_a'], informe['ic_sup_a'])
             print("Grupo A:")
             print(f"  Media esperada: {mean_a:.4f}")
             print(f"  Desviación estándar: {std_a:.4f}")
@@ -139,14 +894,20 @@ class CalculadoraClicksBayesiana:
 
             mean_b = paso['alpha_b'] / paso['beta_b']
             std_b = np.sqrt(paso['alpha_b'] / (paso['beta_b']**2))
-            ic_b = np.percentile(np.random.gamma(paso['alpha_b'], 1/paso['beta_b'], 10000), [2.5, 97.5])
+            ic_b = (informe['ic_inf_b'], informe['ic_sup_b'])
             print("Grupo B:")
             print(f"  Media esperada: {mean_b:.4f}")
             print(f"  Desviación estándar: {std_b:.4f}")
             print(f"  IC 95%: [{ic_b[0]:.4f}, {ic_b[1]:.4f}]")
 
-            if "trace" in paso:
-                diff = paso['trace'].posterior['diferencia'].values.flatten()
+            if "diagnostico" in paso:
+                diag = paso["diagnostico"]
+                estado = "OK" if diag['convergido'] else "NO CONVERGIDO"
+                print(f"Diagnóstico MCMC: {diag['draws']} muestras/cadena, "
+                      f"ESS mínimo {min(diag['ess'].values()):.0f}, R-hat máximo {max(diag['rhat'].values()):.3f} ({estado})")
+
+            if "muestras" in paso:
+                diff = paso['muestras']['diferencia'].ravel()
                 resumen_diff = self._resumen(diff)
                 print("Diferencia (B - A):")
                 print(f"  Media: {resumen_diff['Media']:.4f}")
@@ -161,8 +922,10 @@ class CalculadoraClicksBayesiana:
                     print(f"  Desviación estándar: {uplift['std']:.2%}")
                     print(f"  IC 95%: [{uplift['ic_95'][0]:.2%}, {uplift['ic_95'][1]:.2%}]")
 
-                tasa_a_samples = paso['trace'].posterior['tasa_clicks_a'].values.flatten()
-                tasa_b_samples = paso['trace'].posterior['tasa_clicks_b'].values.flatten()
+                if not graficos:
+                    continue
+                tasa_a_samples = paso['muestras']['tasa_clicks_a'].ravel()
+                tasa_b_samples = paso['muestras']['tasa_clicks_b'].ravel()
 
                 plt.figure(figsize=(10, 5))
                 sns.kdeplot(tasa_a_samples, label="Grupo A", fill=True)
@@ -1,6 +1,19 @@
 # calculadora_bayesiana_conversiones.py
+import time
+
 import numpy as np
 
+from asignacion import asignar
+from cache_compartido import clave_inicial, encadenar_clave
+from cuantiles import prob_mayor, resumir_cdf
+from estadistica_conjugada import uplift_medio_beta
+from estadisticos_suficientes import EstadisticosSuficientes
+from informe_historial import fila_informe
+from seleccion_motor import CRONOMETRO, MUESTRAS_MINIMAS, elegir_motor, muestrear, prob_estimada, resumen_analitico
+from vistas_temporales import PARAMETROS, calcular_vistas, validar_vistas
+
+MOTORES = ("montecarlo", "qmc", "analitico", "auto")
+
 class CalculadoraConversionesBayesiana:
     """
     Calculadora bayesiana para conversiones 0/1 (por ejemplo: compra / no compra),
@@ -12,7 +25,15 @@ class CalculadoraConversionesBayesiana:
 
     def __init__(self, alpha_prior_a=1, beta_prior_a=1,
                        alpha_prior_b=1, beta_prior_b=1,
-                       num_samples=100_000):
+                       num_samples=100_000, cache=None,
+                       ventana=None, decaimiento=None,
+                       motor="montecarlo", presupuesto_ms=None, precision=None):
+        validar_vistas(ventana, decaimiento)
+        if motor not in MOTORES:
+            raise ValueError(f"Motor desconocido: {motor!r}. Opciones: {', '.join(MOTORES)}")
+        if motor != "auto" and (presupuesto_ms is not None or precision is not None):
+            raise ValueError("El presupuesto de tiempo o de precisión solo se aplica con motor='auto'")
+
         # Priors Beta para A y B
         self.alpha_a = alpha_prior_a
         self.beta_a = beta_prior_a
@@ -22,6 +43,35 @@ class CalculadoraConversionesBayesiana:
         self.num_samples = num_samples
         self.historial = []  # lista de "pasos" (días)
 
+        # Vistas alternativas al acumulado (ver vistas_temporales):
+        # - ventana: posterior con solo los últimos `ventana` días
+        # - decaimiento: recuentos con peso decaimiento**antigüedad
+        self.ventana = ventana
+        self.decaimiento = decaimiento
+
+        # Motor de cada actualización: muestreo "montecarlo", "qmc" (Sobol),
+        # "analitico" (P(B > A) por cuadratura) o "auto", que elige motor y
+        # número de muestras para cumplir presupuesto_ms (milisegundos) y/o
+        # precision (semiancho del IC 95 % de P(B > A)) según los tiempos
+        # medidos en esta máquina (ver seleccion_motor)
+        self.motor = motor
+        self.presupuesto_ms = presupuesto_ms
+        self.precision = precision
+
+        # Generador y parámetros cacheados para sugerir_asignacion()
+        self._rng = np.random.default_rng()
+        self._cache_asignacion = None
+
+        # Caché de pasos compartida entre sesiones (opcional, ver CacheHistorial)
+        self.cache = cache
+        self._clave_inicial = self._clave_cache = clave_inicial(
+            "conversiones",
+            {"alpha_a": float(alpha_prior_a), "beta_a": float(beta_prior_a),
+             "alpha_b": float(alpha_prior_b), "beta_b": float(beta_prior_b)},
+            {"num_samples": num_samples, "ventana": ventana, "decaimiento": decaimiento,
+             "motor": motor, "presupuesto_ms": presupuesto_ms, "precision": precision},
+        )
+
         # Paso 0: estado “a priori”
         self.historial.append({
             "dia": "A priori",
@@ -38,22 +88,66 @@ class CalculadoraConversionesBayesiana:
         - conv_b / visitas_b: conversiones y visitas del grupo B
         """
         dia = dia or f"Día {len(self.historial)}"
+        datos = {"conversiones_a": conv_a, "visitas_a": visitas_a, "conversiones_b": conv_b, "visitas_b": visitas_b}
 
-        # Posterior A
-        alpha_post_a = self.alpha_a + conv_a
-        beta_post_a  = self.beta_a + (visitas_a - conv_a)
+        # Si otra sesión ya calculó esta misma secuencia de días, se reutiliza
+        clave = self._clave_dia(self._clave_cache, dia, datos)
+        paso = self.cache.obtener(clave) if self.cache is not None else None
+        if paso is None:
+            incremento = self._incremento(datos)
+            parametros = {c: self.historial[-1][c] + incremento[c] for c in PARAMETROS}
+            paso = self._calcular_paso(dia, datos, parametros)
+            if self.cache is not None:
+                self.cache.guardar(clave, paso)
+        self._anadir_paso(paso, clave)
 
-        # Posterior B
-        alpha_post_b = self.alpha_b + conv_b
-        beta_post_b  = self.beta_b + (visitas_b - conv_b)
+    @staticmethod
+    def _incremento(datos):
+        """
+        Lo que suma un día a los parámetros Beta acumulados.
+        """
+        return {
+            "alpha_a": datos["conversiones_a"], "beta_a": datos["visitas_a"] - datos["conversiones_a"],
+            "alpha_b": datos["conversiones_b"], "beta_b": datos["visitas_b"] - datos["conversiones_b"],
+        }
+
+    def _anadir_paso(self, paso, clave):
+        self.alpha_a, self.beta_a = paso["alpha_a"], paso["beta_a"]
+        self.alpha_b, self.beta_b = paso["alpha_b"], paso["beta_b"]
+        self._cache_asignacion = None
+        self._clave_cache = clave
+        self.historial.append(paso)
+
+    def _calcular_paso(self, dia, datos, parametros, intermedio=False):
+        """
+        Paso del historial con los parámetros Beta acumulados `parametros`
+        (el historial actual es el de los días anteriores). Con intermedio
+        (días desplazados por _rehacer_desde que no son el último) los
+        resúmenes son los exactos del motor analítico y las muestras
+        mínimas para la CDF y los gráficos se extraen directamente.
+        """
+        alpha_post_a, beta_post_a = parametros["alpha_a"], parametros["beta_a"]
+        alpha_post_b, beta_post_b = parametros["alpha_b"], parametros["beta_b"]
+        vistas = calcular_vistas("conversiones", self.historial, parametros, self.ventana, self.decaimiento)
 
-        # Guardamos como nuevos priors para la siguiente iteración
-        self.alpha_a, self.beta_a = alpha_post_a, beta_post_a
-        self.alpha_b, self.beta_b = alpha_post_b, beta_post_b
+        parametros = (alpha_post_a, beta_post_a, alpha_post_b, beta_post_b)
+        seleccion = None
+        motor, num_muestras = ("analitico", MUESTRAS_MINIMAS) if intermedio else (self.motor, self.num_samples)
+        if motor == "auto":
+            seleccion = elegir_motor("conversiones", prob_estimada("conversiones", *parametros),
+                                     disponibles=("analitico", "qmc", "montecarlo"),
+                                     presupuesto_ms=self.presupuesto_ms, precision=self.precision,
+                                     num_muestras=self.num_samples)
+            motor, num_muestras = seleccion["motor"], seleccion["num_muestras"]
+        inicio = time.perf_counter()
 
-        # Muestreo Beta
-        muestras_a = np.random.beta(alpha_post_a, beta_post_a, self.num_samples).astype(float)
-        muestras_b = np.random.beta(alpha_post_b, beta_post_b, self.num_samples).astype(float)
+        # Muestreo Beta (con el motor analítico, solo las necesarias para la CDF y los gráficos)
+        if motor == "montecarlo" or intermedio:
+            muestras_a = np.random.beta(alpha_post_a, beta_post_a, num_muestras).astype(float)
+            muestras_b = np.random.beta(alpha_post_b, beta_post_b, num_muestras).astype(float)
+        else:
+            muestras_a, muestras_b = muestrear("conversiones", motor, *parametros,
+                                               num_muestras if motor == "qmc" else MUESTRAS_MINIMAS, self._rng)
 
         # Estadísticos individuales
         mean_a = muestras_a.mean()
@@ -69,18 +163,30 @@ class CalculadoraConversionesBayesiana:
         uplift_mean = np.nanmean(uplift)
         uplift_ci   = np.nanpercentile(uplift, [2.5, 97.5])
 
+        if motor == "analitico":
+            exacto = resumen_analitico("conversiones", *parametros)
+            prob_b_mejor = exacto["prob_b_mejor"]
+            mean_a, mean_b = exacto["media_a"], exacto["media_b"]
+            ci_a, ci_b = exacto["ci_a"], exacto["ci_b"]
+            if alpha_post_a > 1:
+                uplift_mean = float(uplift_medio_beta(alpha_post_a, beta_post_a, mean_b))
+
+        segundos = time.perf_counter() - inicio
+        if not intermedio:
+            CRONOMETRO.registrar("conversiones", motor, len(muestras_a), segundos)
+
+        # Los estadísticos se calculan en float64; las muestras se guardan
+        # en float32 (solo se usan para gráficos) para reducir la memoria
+        muestras_a, muestras_b = muestras_a.astype(np.float32), muestras_b.astype(np.float32)
+        diff, uplift = diff.astype(np.float32), uplift.astype(np.float32)
+
         paso = {
             "dia": dia,
             "alpha_a": alpha_post_a,
             "beta_a": beta_post_a,
             "alpha_b": alpha_post_b,
             "beta_b": beta_post_b,
-            "datos": {
-                "conversiones_a": conv_a,
-                "visitas_a": visitas_a,
-                "conversiones_b": conv_b,
-                "visitas_b": visitas_b,
-            },
+            "datos": datos,
             "posterior": {
                 "A": {
                     "media": float(mean_a),
@@ -100,9 +206,95 @@ class CalculadoraConversionesBayesiana:
                 "uplift_media": float(uplift_mean),
                 "uplift_ci": uplift_ci,
             },
+            # CDF compactas para consultar umbrales con búsqueda binaria
+            "cdf": {
+                "diferencia": resumir_cdf(diff),
+                "uplift": resumir_cdf(uplift),
+            },
         }
+        if vistas:
+            paso["vistas"] = vistas
+        # Motor usado (y, en modo auto, la elección con sus estimaciones)
+        paso["motor"] = {**(seleccion or {}), "motor": motor, "num_muestras": len(muestras_a),
+                         "tiempo_ms": 1000 * segundos}
+        # Fila del historial detallado, calculada una sola vez
+        paso["informe"] = fila_informe(paso)
+        return paso
 
-        self.historial.append(paso)
+    @staticmethod
+    def _clave_dia(clave_anterior, dia, datos):
+        return encadenar_clave(clave_anterior, dia, int(datos["conversiones_a"]), int(datos["visitas_a"]),
+                               int(datos["conversiones_b"]), int(datos["visitas_b"]))
+
+    def _indice_dia(self, dia):
+        """
+        Posición en el historial de un día, por etiqueta ("Día 3") o por
+        índice (1 = primer día con datos).
+        """
+        if isinstance(dia, (int, np.integer)):
+            if not 1 <= dia < len(self.historial):
+                raise ValueError(f"No existe el día en la posición {dia}")
+            return int(dia)
+        for indice, paso in enumerate(self.historial[1:], start=1):
+            if paso["dia"] == dia:
+                return indice
+        raise ValueError(f"No existe el día {dia!r} en el historial")
+
+    def _rehacer_desde(self, indice, datos=None):
+        """
+        Quita el paso `indice` (datos=None) o sustituye sus datos, y
+        desplaza los pasos posteriores: sus parámetros Beta acumulados
+        cambian exactamente en lo que cambió ese día, sin recorrer los
+        datos. Los días intermedios se resumen con el motor analítico
+        (cuadratura y muestras mínimas para la CDF); solo el último, el que
+        lee detectar_ganador, se muestrea con el motor de la calculadora.
+        Los pasos que ya estén en la caché se reutilizan; los demás son
+        diccionarios nuevos, porque los antiguos pueden estar compartidos.
+        """
+        anterior, actual = self.historial[indice - 1], self.historial[indice]
+        pendientes = [(paso["dia"], paso["datos"], paso) for paso in self.historial[indice + 1:]]
+        if datos is None:
+            delta = {c: anterior[c] - actual[c] for c in PARAMETROS}
+        else:
+            incremento = self._incremento(datos)
+            delta = {c: anterior[c] + incremento[c] - actual[c] for c in PARAMETROS}
+            pendientes.insert(0, (actual["dia"], datos, actual))
+
+        self.historial = self.historial[:indice]
+        self.alpha_a, self.beta_a = anterior["alpha_a"], anterior["beta_a"]
+        self.alpha_b, self.beta_b = anterior["alpha_b"], anterior["beta_b"]
+        self._cache_asignacion = None
+        clave = self._clave_inicial
+        for paso in self.historial[1:]:
+            clave = self._clave_dia(clave, paso["dia"], paso["datos"])
+        self._clave_cache = clave
+
+        for posicion, (dia, d, viejo) in enumerate(pendientes, start=1):
+            clave = self._clave_dia(clave, dia, d)
+            paso = self.cache.obtener(clave) if self.cache is not None else None
+            if paso is None:
+                parametros = {c: viejo[c] + delta[c] for c in PARAMETROS}
+                final = posicion == len(pendientes)
+                paso = self._calcular_paso(dia, d, parametros, intermedio=not final)
+                if final and self.cache is not None:
+                    self.cache.guardar(clave, paso)
+            self._anadir_paso(paso, clave)
+
+    def eliminar_dia(self, dia):
+        """
+        Quita un día del historial (por ejemplo, uno afectado por una caída
+        del tracking). Los días anteriores no se tocan; los posteriores se
+        desplazan porque su posterior acumulado incluía el día eliminado.
+        """
+        self._rehacer_desde(self._indice_dia(dia))
+
+    def corregir_dia(self, dia, conv_a, visitas_a, conv_b, visitas_b):
+        """
+        Sustituye los datos de un día manteniendo su etiqueta y posición.
+        Solo se recalculan ese día y los siguientes.
+        """
+        corregido = {"conversiones_a": conv_a, "visitas_a": visitas_a, "conversiones_b": conv_b, "visitas_b": visitas_b}
+        self._rehacer_desde(self._indice_dia(dia), corregido)
 
     def detectar_ganador(self, umbral_probabilidad=0.95, umbral_mejora_minima=0.01):
         """
@@ -158,6 +350,92 @@ class CalculadoraConversionesBayesiana:
                 "mejora_relativa": uplift_media
             }
 
+    def opciones(self):
+        """
+        Argumentos del constructor (salvo priors y caché), para reconstruir
+        una calculadora equivalente con desde_estadisticos(..., **opciones).
+        """
+        return {
+            "num_samples": self.num_samples, "ventana": self.ventana, "decaimiento": self.decaimiento,
+            "motor": self.motor, "presupuesto_ms": self.presupuesto_ms, "precision": self.precision,
+        }
+
+    def estadisticos_suficientes(self):
+        """
+        Devuelve los recuentos por día y los priors iniciales como un
+        EstadisticosSuficientes, que se puede serializar (a_json) y fusionar
+        con los de otros trabajadores que vean otra parte del tráfico.
+        """
+        inicial = self.historial[0]
+        priors = {clave: float(inicial[clave]) for clave in ("alpha_a", "beta_a", "alpha_b", "beta_b")}
+        estadisticos = EstadisticosSuficientes("conversiones", priors)
+        for paso in self.historial[1:]:
+            d = paso["datos"]
+            estadisticos.agregar(paso["dia"], exitos_a=d["conversiones_a"], visitas_a=d["visitas_a"],
+                                 exitos_b=d["conversiones_b"], visitas_b=d["visitas_b"])
+        return estadisticos
+
+    @classmethod
+    def desde_estadisticos(cls, estadisticos, **opciones):
+        """
+        Crea una calculadora a partir de estadísticos suficientes (por
+        ejemplo, el resultado de fusionar varios shards). Los días se
+        ingieren en orden, así que el estado final es el mismo que con la
+        ingestión secuencial de los datos originales. Cada día se vuelve a
+        muestrear el posterior, con el coste de la ingestión original.
+        """
+        if estadisticos.modelo != "conversiones":
+            raise ValueError(f"Se esperaban estadísticos de conversiones, no de {estadisticos.modelo}")
+        p = estadisticos.priors
+        calculadora = cls(alpha_prior_a=p["alpha_a"], beta_prior_a=p["beta_a"],
+                          alpha_prior_b=p["alpha_b"], beta_prior_b=p["beta_b"], **opciones)
+        for dia, r in estadisticos.recuentos.items():
+            calculadora.actualizar_con_datos(r["exitos_a"], r["visitas_a"], r["exitos_b"], r["visitas_b"], dia=dia)
+        return calculadora
+
+    def series_decision(self):
+        """
+        P(B > A) y uplift medio de cada día (sin el paso "A priori"), las
+        dos entradas de la regla de detectar_ganador, como arrays.
+        Se usa en barrido_umbrales.barrer_umbrales.
+        """
+        pasos = [paso for paso in self.historial[1:] if "comparacion" in paso]
+        return {
+            "dias": [paso["dia"] for paso in pasos],
+            "prob_b_mejor": np.array([paso["comparacion"]["prob_b_mejor"] for paso in pasos], dtype=float),
+            "mejora_relativa": np.array([paso["comparacion"]["uplift_media"] for paso in pasos], dtype=float),
+        }
+
+    def probabilidad_uplift(self, umbral=0.0, indice=-1):
+        """
+        P(uplift de B sobre A > umbral) en el paso indicado, por búsqueda
+        binaria en la CDF compacta. Admite un array de umbrales.
+        """
+        paso = self.historial[indice]
+        if "cdf" not in paso:
+            return None
+        return prob_mayor(paso["cdf"]["uplift"], umbral)
+
+    def sugerir_asignacion(self, n=1, metodo="thompson", beta_top_two=0.5):
+        """
+        Reparto de los próximos n visitantes entre A y B según el posterior
+        Beta actual:
+        - metodo="thompson": Thompson sampling
+        - metodo="top_two": top-two Thompson sampling con beta_top_two
+
+        Las n muestras de cada brazo se extraen en una sola llamada y los
+        parámetros se cachean hasta la siguiente actualización, así que es
+        barato llamarlo en cada petición. Con n grande, 'pesos' sirve como
+        reparto de tráfico del siguiente periodo.
+        """
+        if self._cache_asignacion is None:
+            self._cache_asignacion = (self.alpha_a, self.beta_a, self.alpha_b, self.beta_b)
+        alpha_a, beta_a, alpha_b, beta_b = self._cache_asignacion
+
+        muestras_a = self._rng.beta(alpha_a, beta_a, n)
+        muestras_b = self._rng.beta(alpha_b, beta_b, n)
+        return asignar(muestras_a, muestras_b, metodo, self._rng, beta_top_two)
+
     def mostrar_historial_completo(self):
         """
         Imprime un resumen parecido al de CalculadoraClicksBayesiana,
@@ -0,0 +1,426 @@
+# calculadora_bayesiana_ingresos.py
+import numpy as np
+
+from asignacion import asignar
+from cache_compartido import clave_inicial, encadenar_clave
+from cuantiles import prob_mayor, resumir_cdf
+from estadisticos_suficientes import EstadisticosSuficientes
+from informe_historial import fila_informe
+from seleccion_motor import MUESTRAS_MINIMAS
+
+class CalculadoraIngresosBayesiana:
+    """
+    Calculadora bayesiana de ingresos por visitante (RPV) para dos grupos A y B,
+    totalmente conjugada (sin MCMC):
+
+    - Compra por visita: Beta-Binomial, p ~ Beta(alpha, beta)
+    - Valor de cada pedido: Exponencial con tasa theta, theta ~ Gamma(alpha_valor, beta_valor)
+      (el valor medio del pedido es 1 / theta)
+    - RPV = p / theta
+
+    El prior por defecto del valor, Gamma(3, 2), tiene alpha_valor > 2:
+    E[1 / theta] y su varianza son finitos desde el primer día (con
+    alpha_valor <= 1 la media del RPV no existe y la de su uplift la
+    dominan las colas). La mejora relativa de la decisión es el cociente
+    de las medias posteriores exactas, E[RPV_B] / E[RPV_A] - 1.
+
+    Cada día solo se necesitan los estadísticos suficientes: compras, visitas
+    e ingresos totales por grupo. La interfaz imita a las otras calculadoras
+    (.actualizar_con_datos(), .historial, .detectar_ganador(), etc.) y cada
+    paso guarda "posterior" y "comparacion" con la misma estructura que
+    CalculadoraConversionesBayesiana, expresados en ingresos por visitante.
+    """
+
+    def __init__(self, alpha_prior_a=1, beta_prior_a=1,
+                       alpha_prior_b=1, beta_prior_b=1,
+                       alpha_valor_prior=3, beta_valor_prior=2,
+                       num_samples=100_000, cache=None):
+        # Priors Beta de la probabilidad de compra
+        self.alpha_a = alpha_prior_a
+        self.beta_a = beta_prior_a
+        self.alpha_b = alpha_prior_b
+        self.beta_b = beta_prior_b
+
+        # Priors Gamma de la tasa del valor de pedido (iguales para A y B)
+        self.alpha_valor_a = self.alpha_valor_b = alpha_valor_prior
+        self.beta_valor_a = self.beta_valor_b = beta_valor_prior
+
+        self.num_samples = num_samples
+        self.historial = []  # lista de "pasos" (días)
+
+        # Generador y parámetros cacheados para sugerir_asignacion()
+        self._rng = np.random.default_rng()
+        self._cache_asignacion = None
+
+        # Caché de pasos compartida entre sesiones (opcional, ver CacheHistorial)
+        self.cache = cache
+        self._clave_inicial = self._clave_cache = clave_inicial("ingresos", self._priors(), {"num_samples": num_samples})
+
+        # Paso 0: estado “a priori”
+        self.historial.append({"dia": "A priori", **self._parametros()})
+
+    def _parametros(self):
+        return {
+            "alpha_a": self.alpha_a,
+            "beta_a": self.beta_a,
+            "alpha_b": self.alpha_b,
+            "beta_b": self.beta_b,
+            "alpha_valor_a": self.alpha_valor_a,
+            "beta_valor_a": self.beta_valor_a,
+            "alpha_valor_b": self.alpha_valor_b,
+            "beta_valor_b": self.beta_valor_b,
+        }
+
+    def _priors(self):
+        inicial = self.historial[0] if self.historial else self._parametros()
+        return {clave: float(valor) for clave, valor in inicial.items() if clave != "dia"}
+
+    def _muestrear_rpv(self, n, alpha, beta, alpha_valor, beta_valor, rng=None):
+        rng = rng or self._rng
+        prob_compra = rng.beta(alpha, beta, n)
+        tasa_valor = rng.gamma(alpha_valor, 1 / beta_valor, n)
+        return prob_compra / tasa_valor
+
+    def actualizar_con_datos(self, compras_a, visitas_a, ingresos_a,
+                                   compras_b, visitas_b, ingresos_b, dia=None):
+        """
+        Actualiza los posteriores con los datos de un día:
+        - compras_x / visitas_x: número de compras y de visitas del grupo
+        - ingresos_x: suma del valor de esas compras
+        """
+        dia = dia or f"Día {len(self.historial)}"
+        datos = {
+            "compras_a": compras_a, "visitas_a": visitas_a, "ingresos_a": ingresos_a,
+            "compras_b": compras_b, "visitas_b": visitas_b, "ingresos_b": ingresos_b,
+        }
+
+        # Si otra sesión ya calculó esta misma secuencia de días, se reutiliza
+        clave = self._clave_dia(self._clave_cache, dia, datos)
+        paso = self.cache.obtener(clave) if self.cache is not None else None
+        if paso is None:
+            incremento = self._incremento(datos)
+            paso = self._calcular_paso(dia, datos, {c: self.historial[-1][c] + incremento[c] for c in incremento})
+            if self.cache is not None:
+                self.cache.guardar(clave, paso)
+        self._anadir_paso(paso, clave)
+
+    @staticmethod
+    def _incremento(datos):
+        """
+        Lo que suma un día a cada parámetro acumulado (actualización conjugada).
+        """
+        return {
+            "alpha_a": datos["compras_a"], "beta_a": datos["visitas_a"] - datos["compras_a"],
+            "alpha_b": datos["compras_b"], "beta_b": datos["visitas_b"] - datos["compras_b"],
+            "alpha_valor_a": datos["compras_a"], "beta_valor_a": datos["ingresos_a"],
+            "alpha_valor_b": datos["compras_b"], "beta_valor_b": datos["ingresos_b"],
+        }
+
+    def _anadir_paso(self, paso, clave):
+        for nombre in self._parametros():
+            setattr(self, nombre, paso[nombre])
+        self._cache_asignacion = None
+        self._clave_cache = clave
+        self.historial.append(paso)
+
+    def _calcular_paso(self, dia, datos, parametros, intermedio=False):
+        """
+        Paso del historial con los parámetros acumulados `parametros`. Con
+        intermedio (días desplazados por _rehacer_desde que no son el
+        último) se extraen solo las muestras mínimas para la CDF y los gráficos.
+        """
+        p = parametros
+        n = MUESTRAS_MINIMAS if intermedio else self.num_samples
+
+        # Muestras del RPV (vectorizadas)
+        rpv_a = self._muestrear_rpv(n, p["alpha_a"], p["beta_a"], p["alpha_valor_a"], p["beta_valor_a"])
+        rpv_b = self._muestrear_rpv(n, p["alpha_b"], p["beta_b"], p["alpha_valor_b"], p["beta_valor_b"])
+
+        diff = rpv_b - rpv_a
+        uplift = diff / rpv_a
+        prob_b_mejor = np.mean(diff > 0)
+
+        # Valor medio de pedido esperado: E[1 / theta] = beta / (alpha - 1)
+        def valor_medio(alpha_valor, beta_valor):
+            return beta_valor / (alpha_valor - 1) if alpha_valor > 1 else np.nan
+
+        # RPV medio exacto (p y theta son independientes): E[p] * E[1 / theta]
+        compra_a, compra_b = p["alpha_a"] / (p["alpha_a"] + p["beta_a"]), p["alpha_b"] / (p["alpha_b"] + p["beta_b"])
+        valor_a, valor_b = valor_medio(p["alpha_valor_a"], p["beta_valor_a"]), valor_medio(p["alpha_valor_b"], p["beta_valor_b"])
+        media_a, media_b = compra_a * valor_a, compra_b * valor_b
+
+        # Mejora relativa de la decisión: cociente de medias, como (E[B] - E[A]) / E[A]
+        # en clicks. La media muestral del uplift depende de E[1 / RPV_A] y la
+        # dominan las colas; sin medias finitas se usa la mediana del uplift.
+        if np.isfinite(media_a) and np.isfinite(media_b):
+            mejora = media_b / media_a - 1
+        else:
+            mejora = np.median(uplift)
+            media_a, media_b = rpv_a.mean(), rpv_b.mean()
+
+        paso = {
+            "dia": dia,
+            **parametros,
+            "datos": datos,
+            "posterior": {
+                "A": {
+                    "media": float(media_a),
+                    "ci": np.percentile(rpv_a, [2.5, 97.5]),
+                    "muestras": rpv_a.astype(np.float32),
+                    "prob_compra": compra_a,
+                    "valor_pedido": valor_a,
+                },
+                "B": {
+                    "media": float(media_b),
+                    "ci": np.percentile(rpv_b, [2.5, 97.5]),
+                    "muestras": rpv_b.astype(np.float32),
+                    "prob_compra": compra_b,
+                    "valor_pedido": valor_b,
+                },
+            },
+            "comparacion": {
+                "diff": diff.astype(np.float32),
+                "uplift": uplift.astype(np.float32),
+                "prob_b_mejor": float(prob_b_mejor),
+                "uplift_media": float(np.mean(uplift)),
+                "uplift_ci": np.percentile(uplift, [2.5, 97.5]),
+                "mejora_relativa": float(mejora),
+            },
+            # CDF compactas para consultar umbrales con búsqueda binaria
+            "cdf": {
+                "diferencia": resumir_cdf(diff),
+                "uplift": resumir_cdf(uplift),
+            },
+        }
+        # Fila del historial detallado, calculada una sola vez
+        paso["informe"] = fila_informe(paso)
+        return paso
+
+
+    @staticmethod
+    def _clave_dia(clave_anterior, dia, datos):
+        return encadenar_clave(clave_anterior, dia, int(datos["compras_a"]), int(datos["visitas_a"]), float(datos["ingresos_a"]),
+                               int(datos["compras_b"]), int(datos["visitas_b"]), float(datos["ingresos_b"]))
+
+    def _indice_dia(self, dia):
+        """
+        Posición en el historial de un día, por etiqueta ("Día 3") o por
+        índice (1 = primer día con datos).
+        """
+        if isinstance(dia, (int, np.integer)):
+            if not 1 <= dia < len(self.historial):
+                raise ValueError(f"No existe el día en la posición {dia}")
+            return int(dia)
+        for indice, paso in enumerate(self.historial[1:], start=1):
+            if paso["dia"] == dia:
+                return indice
+        raise ValueError(f"No existe el día {dia!r} en el historial")
+
+    def _rehacer_desde(self, indice, datos=None):
+        """
+        Quita el paso `indice` (datos=None) o sustituye sus datos, y
+        desplaza los parámetros acumulados de los pasos posteriores en lo
+        que cambió ese día, sin recorrer los datos. Los días intermedios se
+        resumen con las muestras mínimas; solo el último, el que lee
+        detectar_ganador, se muestrea con num_samples. Los pasos que ya
+        estén en la caché se reutilizan; los demás son diccionarios nuevos,
+        porque los antiguos pueden estar compartidos.
+        """
+        anterior, actual = self.historial[indice - 1], self.historial[indice]
+        pendientes = [(paso["dia"], paso["datos"], paso) for paso in self.historial[indice + 1:]]
+        nombres = list(self._parametros())
+        if datos is None:
+            delta = {c: anterior[c] - actual[c] for c in nombres}
+        else:
+            incremento = self._incremento(datos)
+            delta = {c: anterior[c] + incremento[c] - actual[c] for c in nombres}
+            pendientes.insert(0, (actual["dia"], datos, actual))
+
+        self.historial = self.historial[:indice]
+        for nombre in nombres:
+            setattr(self, nombre, anterior[nombre])
+        self._cache_asignacion = None
+        clave = self._clave_inicial
+        for paso in self.historial[1:]:
+            clave = self._clave_dia(clave, paso["dia"], paso["datos"])
+        self._clave_cache = clave
+
+        for posicion, (dia, d, viejo) in enumerate(pendientes, start=1):
+            clave = self._clave_dia(clave, dia, d)
+            paso = self.cache.obtener(clave) if self.cache is not None else None
+            if paso is None:
+                final = posicion == len(pendientes)
+                paso = self._calcular_paso(dia, d, {c: viejo[c] + delta[c] for c in nombres}, intermedio=not final)
+                if final and self.cache is not None:
+                    self.cache.guardar(clave, paso)
+            self._anadir_paso(paso, clave)
+
+    def eliminar_dia(self, dia):
+        """
+        Quita un día del historial. Los días anteriores no se tocan; los
+        posteriores se desplazan porque su posterior incluía el eliminado.
+        """
+        self._rehacer_desde(self._indice_dia(dia))
+
+    def corregir_dia(self, dia, compras_a, visitas_a, ingresos_a, compras_b, visitas_b, ingresos_b):
+        """
+        Sustituye los datos de un día manteniendo su etiqueta y posición.
+        Solo se recalculan ese día y los siguientes.
+        """
+        corregido = {"compras_a": compras_a, "visitas_a": visitas_a, "ingresos_a": ingresos_a,
+                     "compras_b": compras_b, "visitas_b": visitas_b, "ingresos_b": ingresos_b}
+        self._rehacer_desde(self._indice_dia(dia), corregido)
+
+    def detectar_ganador(self, umbral_probabilidad=0.95, umbral_mejora_minima=0.01):
+        """
+        Misma estructura de salida que las otras calculadoras; la mejora
+        relativa es la del ingreso por visitante medio (ver la clase).
+        """
+        if len(self.historial) < 2:
+            return {
+                "ganador": None,
+                "decision": "Continuar prueba",
+                "razon": "No hay datos suficientes para declarar un ganador",
+                "probabilidad_b_mejor": None,
+                "mejora_relativa": None
+            }
+
+        comp = self.historial[-1]["comparacion"]
+        prob_b_mejor = comp["prob_b_mejor"]
+        mejora = comp["mejora_relativa"]
+        prob_a_mejor = 1 - prob_b_mejor
+
+        if prob_b_mejor >= umbral_probabilidad and mejora >= umbral_mejora_minima:
+            return {
+                "ganador": "B",
+                "decision": "Implementar B",
+                "razon": f"B es mejor con {prob_b_mejor:.1%} de probabilidad y {mejora:.1%} de mejora en ingresos por visitante",
+                "probabilidad": prob_b_mejor,
+                "mejora_relativa": mejora
+            }
+        elif prob_a_mejor >= umbral_probabilidad and mejora <= -umbral_mejora_minima:
+            return {
+                "ganador": "A",
+                "decision": "Mantener A",
+                "razon": f"A es mejor con {prob_a_mejor:.1%} de probabilidad y {abs(mejora):.1%} de mejora en ingresos por visitante",
+                "probabilidad": prob_a_mejor,
+                "mejora_relativa": mejora
+            }
+        else:
+            return {
+                "ganador": None,
+                "decision": "Continuar prueba",
+                "razon": "No hay evidencia suficiente para declarar un ganador",
+                "probabilidad_b_mejor": prob_b_mejor,
+                "mejora_relativa": mejora
+            }
+
+    def opciones(self):
+        """
+        Argumentos del constructor (salvo priors y caché), para reconstruir
+        una calculadora equivalente con desde_estadisticos(..., **opciones).
+        """
+        return {"num_samples": self.num_samples}
+
+    def estadisticos_suficientes(self):
+        """
+        Compras, visitas e ingresos por día más los priors iniciales,
+        fusionables con los de otros trabajadores.
+        """
+        estadisticos = EstadisticosSuficientes("ingresos", self._priors())
+        for paso in self.historial[1:]:
+            d = paso["datos"]
+            estadisticos.agregar(paso["dia"], exitos_a=d["compras_a"], visitas_a=d["visitas_a"], ingresos_a=d["ingresos_a"],
+                                 exitos_b=d["compras_b"], visitas_b=d["visitas_b"], ingresos_b=d["ingresos_b"])
+        return estadisticos
+
+    @classmethod
+    def desde_estadisticos(cls, estadisticos, **opciones):
+        """
+        Crea una calculadora a partir de estadísticos suficientes,
+        ingiriendo los días en orden. Cada día se vuelve a muestrear el
+        posterior, con el coste de la ingestión original.
+        """
+        if estadisticos.modelo != "ingresos":
+            raise ValueError(f"Se esperaban estadísticos de ingresos, no de {estadisticos.modelo}")
+        p = estadisticos.priors
+        calculadora = cls(alpha_prior_a=p["alpha_a"], beta_prior_a=p["beta_a"],
+                          alpha_prior_b=p["alpha_b"], beta_prior_b=p["beta_b"],
+                          alpha_valor_prior=p["alpha_valor_a"], beta_valor_prior=p["beta_valor_a"], **opciones)
+        for dia, r in estadisticos.recuentos.items():
+            calculadora.actualizar_con_datos(r["exitos_a"], r["visitas_a"], r["ingresos_a"],
+                                             r["exitos_b"], r["visitas_b"], r["ingresos_b"], dia=dia)
+        return calculadora
+
+    def series_decision(self):
+        """
+        P(B > A) y mejora relativa de cada día (sin el paso "A priori"), las
+        dos entradas de la regla de detectar_ganador, como arrays.
+        Se usa en barrido_umbrales.barrer_umbrales.
+        """
+        pasos = [paso for paso in self.historial[1:] if "comparacion" in paso]
+        return {
+            "dias": [paso["dia"] for paso in pasos],
+            "prob_b_mejor": np.array([paso["comparacion"]["prob_b_mejor"] for paso in pasos], dtype=float),
+            "mejora_relativa": np.array([paso["comparacion"]["mejora_relativa"] for paso in pasos], dtype=float),
+        }
+
+    def probabilidad_uplift(self, umbral=0.0, indice=-1):
+        """
+        P(uplift de B sobre A > umbral) en el paso indicado, por búsqueda
+        binaria en la CDF compacta. Admite un array de umbrales.
+        """
+        paso = self.historial[indice]
+        if "cdf" not in paso:
+            return None
+        return prob_mayor(paso["cdf"]["uplift"], umbral)
+
+    def sugerir_asignacion(self, n=1, metodo="thompson", beta_top_two=0.5):
+        """
+        Reparto de los próximos n visitantes según el posterior del RPV
+        (Thompson sampling o top-two), igual que en las otras calculadoras.
+        """
+        if self._cache_asignacion is None:
+            self._cache_asignacion = (
+                (self.alpha_a, self.beta_a, self.alpha_valor_a, self.beta_valor_a),
+                (self.alpha_b, self.beta_b, self.alpha_valor_b, self.beta_valor_b),
+            )
+        parametros_a, parametros_b = self._cache_asignacion
+
+        muestras_a = self._muestrear_rpv(n, *parametros_a)
+        muestras_b = self._muestrear_rpv(n, *parametros_b)
+        return asignar(muestras_a, muestras_b, metodo, self._rng, beta_top_two)
+
+    def mostrar_historial_completo(self):
+        """
+        Imprime un resumen por día, para que app.py pueda capturarlo con redirect_stdout.
+        """
+        for paso in self.historial:
+            print(f"\n🗓️  {paso['dia']}")
+            print("Parámetros actuales:")
+            print(f"  Grupo A: compra Beta({paso['alpha_a']:.1f}, {paso['beta_a']:.1f}), "
+                  f"valor Gamma({paso['alpha_valor_a']:.1f}, {paso['beta_valor_a']:.1f})")
+            print(f"  Grupo B: compra Beta({paso['alpha_b']:.1f}, {paso['beta_b']:.1f}), "
+                  f"valor Gamma({paso['alpha_valor_b']:.1f}, {paso['beta_valor_b']:.1f})")
+
+            if "datos" in paso:
+                d = paso["datos"]
+                print("Datos del día:")
+                print(f"  Grupo A: {d['compras_a']} compras de {d['visitas_a']} visitas, ingresos {d['ingresos_a']:.2f}")
+                print(f"  Grupo B: {d['compras_b']} compras de {d['visitas_b']} visitas, ingresos {d['ingresos_b']:.2f}")
+
+            if "posterior" in paso:
+                for grupo in ("A", "B"):
+                    post = paso["posterior"][grupo]
+                    print(f"Posterior Grupo {grupo}:")
+                    print(f"  Ingreso por visitante: {post['media']:.4f}")
+                    print(f"  IC 95%: [{post['ci'][0]:.4f}, {post['ci'][1]:.4f}]")
+                    print(f"  Probabilidad de compra: {post['prob_compra']:.4f}")
+                    print(f"  Valor medio de pedido: {post['valor_pedido']:.2f}")
+
+            if "comparacion" in paso:
+                comp = paso["comparacion"]
+                print("Comparación B vs A (ingreso por visitante):")
+                print(f"  Uplift medio: {comp['uplift_media']:.4f}")
+                print(f"  IC 95% uplift: [{comp['uplift_ci'][0]:.4f}, {comp['uplift_ci'][1]:.4f}]")
+                print(f"  Probabilidad de que B > A: {comp['prob_b_mejor']:.2%}")
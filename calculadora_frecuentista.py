@@ -2,8 +2,84 @@
 import numpy as np
 from itertools import combinations
 from collections import defaultdict
+from functools import lru_cache
 from scipy.stats import norm  # IMPORTANTE
 
+from estadisticos_suficientes import EstadisticosSuficientes
+
+# Funciones de gasto de alfa (Lan-DeMets) para la monitorización secuencial
+METODOS_GASTO = ("obrien_fleming", "pocock")
+
+
+def alfa_gastado(fraccion_informacion, alpha=0.05, metodo="obrien_fleming"):
+    """
+    Alfa acumulado gastado (bilateral) hasta cada fracción de información t:
+    - obrien_fleming: 2 - 2 * Phi(z_{alpha/2} / sqrt(t)), casi nada al principio
+    - pocock: alpha * ln(1 + (e - 1) * t), reparto más uniforme
+    """
+    if metodo not in METODOS_GASTO:
+        raise ValueError(f"Método de gasto desconocido: {metodo!r}. Opciones: {', '.join(METODOS_GASTO)}")
+    t = np.clip(np.asarray(fraccion_informacion, dtype=float), 0, 1)
+    if metodo == "obrien_fleming":
+        with np.errstate(divide="ignore"):
+            return np.where(t > 0, 2 - 2 * norm.cdf(norm.ppf(1 - alpha / 2) / np.sqrt(t)), 0.0)
+    return alpha * np.log1p((np.e - 1) * t)
+
+
+def limites_secuenciales(fraccion_informacion, alpha=0.05, metodo="obrien_fleming",
+                         num_simulaciones=200_000, semilla=0):
+    """
+    Límites |z| de cada mirada tales que la probabilidad bajo H0 de
+    cruzar por primera vez en la mirada k sea el alfa gastado en ella.
+    Se calculan simulando el estadístico z acumulado como movimiento
+    browniano (con semilla fija, así que el resultado es reproducible):
+    un bucle sobre las miradas que solo avanza las trayectorias que siguen
+    sin cruzar, con memoria O(num_simulaciones) sea cual sea el número de
+    miradas. Las miradas sin alfa que gastar tienen límite infinito.
+
+    El resultado se cachea por (fracciones, alpha, método, simulaciones,
+    semilla): la interfaz lo pide en cada recarga con la misma serie.
+    """
+    if metodo not in METODOS_GASTO:
+        raise ValueError(f"Método de gasto desconocido: {metodo!r}. Opciones: {', '.join(METODOS_GASTO)}")
+    t = tuple(float(x) for x in np.ravel(fraccion_informacion))
+    return _limites_cacheados(t, float(alpha), metodo, int(num_simulaciones), semilla).copy()
+
+
+@lru_cache(maxsize=32)
+def _limites_cacheados(t, alpha, metodo, num_simulaciones, semilla):
+    t = np.asarray(t, dtype=float)
+    gasto = np.diff(alfa_gastado(t, alpha, metodo), prepend=0.0)
+    desviaciones = np.sqrt(np.maximum(np.diff(t, prepend=0.0), 0))
+
+    rng = np.random.default_rng(semilla)
+    limites = np.full(len(t), np.inf)
+    # Posición acumulada de las trayectorias vivas (las que aún no han cruzado)
+    posicion = np.zeros(num_simulaciones)
+    todas_vivas = True
+    for k in range(len(t)):
+        if len(posicion) == 0:
+            break
+        posicion += rng.standard_normal(len(posicion)) * desviaciones[k]
+        rechazos = int(round(gasto[k] * num_simulaciones))
+        if t[k] <= 0 or gasto[k] <= 0 or (rechazos <= 0 and not todas_vivas):
+            continue
+        z = np.abs(posicion) / np.sqrt(t[k])
+        if todas_vivas:
+            # Antes de cualquier parada el límite es exacto: z ~ N(0, 1)
+            limites[k] = norm.ppf(1 - gasto[k] / 2)
+        elif rechazos < len(z):
+            # El rechazos-ésimo mayor, sin ordenar todas las trayectorias
+            limites[k] = np.partition(z, len(z) - rechazos)[len(z) - rechazos]
+        else:
+            limites[k] = 0.0
+        siguen = z < limites[k]
+        if not siguen.all():
+            posicion = posicion[siguen]
+            todas_vivas = False
+    return limites
+
+
 class ConversionFrecuentistaMultiGrupo:
     def __init__(self):
         # Aquí guardaremos todo lo que luego pintará la interfaz
@@ -94,6 +170,112 @@ class ConversionFrecuentistaMultiGrupo:
                 ),
             }
 
+    def analizar_secuencial(self, datos_diarios, alpha=0.05, metodo="obrien_fleming",
+                            dias_previstos=None, dias=None):
+        """
+        Monitorización secuencial por grupos sobre la serie diaria, sin
+        inflar los falsos positivos al mirar cada día.
+
+        datos_diarios: dict del estilo:
+        {
+            'A': {'visitas': [120, 130, ...], 'conv': [10, 14, ...]},
+            'B': {...},
+            ...
+        }
+        Cada día es una mirada. La fracción de información es la proporción
+        de visitas acumuladas sobre las previstas (las actuales escaladas a
+        dias_previstos; por defecto el test termina en el último día dado).
+
+        Los z acumulados de todas las parejas y días se calculan en una sola
+        pasada vectorizada (parejas × días) y se comparan con los límites de
+        gasto de alfa (metodo="obrien_fleming" o "pocock"). El resultado se
+        guarda en self.resultados['secuencial'].
+        """
+        grupos = list(datos_diarios.keys())
+        visitas = np.array([datos_diarios[g]['visitas'] for g in grupos], dtype=float)
+        conv = np.array([datos_diarios[g]['conv'] for g in grupos], dtype=float)
+        if visitas.ndim != 2 or visitas.shape != conv.shape:
+            raise ValueError("Todos los grupos deben tener el mismo número de días de visitas y conversiones")
+        if (conv > visitas).any():
+            raise ValueError("Las conversiones no pueden superar a las visitas")
+        num_dias = visitas.shape[1]
+        dias_previstos = dias_previstos or num_dias
+        if dias_previstos < num_dias:
+            raise ValueError("dias_previstos no puede ser menor que el número de días con datos")
+
+        # Acumulados (grupos × días) y tasas
+        n = np.cumsum(visitas, axis=1)
+        x = np.cumsum(conv, axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            p = np.where(n > 0, x / n, 0.0)
+
+        # Todas las parejas a la vez (parejas × días)
+        parejas = list(combinations(range(len(grupos)), 2))
+        i = np.array([a for a, _ in parejas], dtype=int)
+        j = np.array([b for _, b in parejas], dtype=int)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            se = np.sqrt(p[i] * (1 - p[i]) / n[i] + p[j] * (1 - p[j]) / n[j])
+            z = np.where(se > 0, (p[i] - p[j]) / se, 0.0)
+
+        # Fracción de información común a todas las parejas
+        total = n.sum(axis=0)
+        previsto = total[-1] * dias_previstos / num_dias
+        fraccion = total / previsto if previsto > 0 else np.zeros(num_dias)
+        limites = limites_secuenciales(fraccion, alpha, metodo)
+
+        cruza = np.abs(z) >= limites[None, :]
+        hay_parada = cruza.any(axis=1)
+        primer_cruce = cruza.argmax(axis=1)
+
+        dias = list(dias) if dias is not None else [f"Día {k + 1}" for k in range(num_dias)]
+        comparaciones = {}
+        for indice, (a, b) in enumerate(parejas):
+            g1, g2 = grupos[a], grupos[b]
+            if hay_parada[indice]:
+                k = int(primer_cruce[indice])
+                ganador = g1 if z[indice, k] > 0 else g2
+                dia_parada = dias[k]
+            else:
+                ganador = dia_parada = None
+            comparaciones[f"{g1}_vs_{g2}"] = {
+                'z': z[indice],
+                'dia_parada': dia_parada,
+                'ganador': ganador,
+            }
+
+        self.resultados['secuencial'] = {
+            'metodo': metodo,
+            'alpha': alpha,
+            'dias': dias,
+            'fraccion_informacion': fraccion,
+            'alfa_gastado': alfa_gastado(fraccion, alpha, metodo),
+            'limites': limites,
+            'comparaciones': comparaciones,
+        }
+        return self.resultados['secuencial']
+
+    def estadisticos_suficientes(self):
+        """
+        Visitas y conversiones por grupo del último análisis como
+        EstadisticosSuficientes, para fusionarlos con los de otros shards.
+        """
+        estadisticos = EstadisticosSuficientes("frecuentista")
+        for grupo, datos in self.resultados.get('grupos', {}).items():
+            estadisticos.agregar(grupo, visitas=datos['visitas'], conv=datos['conv'])
+        return estadisticos
+
+    @classmethod
+    def desde_estadisticos(cls, estadisticos):
+        """
+        Crea el análisis a partir de estadísticos suficientes (por ejemplo,
+        la fusión de los recuentos de varios trabajadores).
+        """
+        if estadisticos.modelo != "frecuentista":
+            raise ValueError(f"Se esperaban estadísticos frecuentistas, no de {estadisticos.modelo}")
+        analisis = cls()
+        analisis.analizar_datos(estadisticos.recuentos)
+        return analisis
+
     def obtener_ganador_global(self):
         """
         Copiado del código original:
@@ -0,0 +1,51 @@
+# cuantiles.py
+import numpy as np
+
+# Puntos que se guardan por distribución (resolución de 1/PUNTOS_CDF en probabilidad)
+PUNTOS_CDF = 2048
+
+
+def resumir_cdf(muestras, puntos=PUNTOS_CDF):
+    """
+    Representación compacta de la distribución empírica de unas muestras:
+    `puntos` cuantiles equiespaciados, ordenados de menor a mayor (sin NaN).
+    Si hay menos muestras que puntos se guardan todas, y las consultas
+    son exactas.
+
+    Se calcula una vez por paso del historial; después cualquier consulta
+    de probabilidad o cuantil es una búsqueda binaria (O(log n)).
+    """
+    muestras = np.asarray(muestras, dtype=float).ravel()
+    muestras = np.sort(muestras[~np.isnan(muestras)])
+    if len(muestras) <= puntos:
+        return muestras
+    indices = ((np.arange(puntos) + 0.5) * len(muestras) / puntos).astype(np.int64)
+    return muestras[indices]
+
+
+def prob_mayor(cdf, umbral=0.0):
+    """
+    P(X > umbral) según la CDF compacta. Admite un array de umbrales.
+    """
+    if len(cdf) == 0:
+        return np.full(np.shape(umbral), np.nan)[()]
+    return 1 - np.searchsorted(cdf, umbral, side="right") / len(cdf)
+
+
+def prob_menor(cdf, umbral=0.0):
+    """
+    P(X < umbral) según la CDF compacta. Admite un array de umbrales.
+    """
+    if len(cdf) == 0:
+        return np.full(np.shape(umbral), np.nan)[()]
+    return np.searchsorted(cdf, umbral, side="left") / len(cdf)
+
+
+def cuantil(cdf, q):
+    """
+    Cuantil q (entre 0 y 1) según la CDF compacta. Admite un array de q.
+    """
+    if len(cdf) == 0:
+        return np.full(np.shape(q), np.nan)[()]
+    indices = np.clip((np.asarray(q) * len(cdf)).astype(np.int64), 0, len(cdf) - 1)
+    return cdf[indices]
@@ -0,0 +1,91 @@
+# estadistica_conjugada.py
+from functools import lru_cache
+
+import numpy as np
+from scipy.stats import norm
+
+# Códigos de decisión usados por las rutinas vectorizadas
+GANA_B = 1
+GANA_A = -1
+CONTINUAR = 0
+
+
+def momentos_beta(alpha, beta):
+    """
+    Media y varianza de una Beta(alpha, beta). Acepta escalares o arrays.
+    """
+    alpha = np.asarray(alpha, dtype=float)
+    beta = np.asarray(beta, dtype=float)
+    total = alpha + beta
+    media = alpha / total
+    varianza = alpha * beta / (total ** 2 * (total + 1))
+    return media, varianza
+
+
+def momentos_gamma(alpha, beta):
+    """
+    Media y varianza de una Gamma(alpha, beta) con beta como parámetro de tasa
+    (la misma parametrización que usa CalculadoraClicksBayesiana).
+    """
+    alpha = np.asarray(alpha, dtype=float)
+    beta = np.asarray(beta, dtype=float)
+    return alpha / beta, alpha / beta ** 2
+
+
+def prob_b_mejor_normal(media_a, var_a, media_b, var_b):
+    """
+    Aproximación normal de P(B > A) a partir de los dos primeros momentos
+    de cada posterior. Con los volúmenes habituales de un test A/B el error
+    frente al muestreo es menor que el propio ruido Monte Carlo.
+    """
+    sd = np.sqrt(np.asarray(var_a) + np.asarray(var_b))
+    diff = np.asarray(media_b) - np.asarray(media_a)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(sd > 0, diff / sd, np.sign(diff) * np.inf)
+    return norm.cdf(z)
+
+
+@lru_cache(maxsize=8)
+def _nodos_legendre(nodos):
+    # leggauss cuesta más que la propia cuadratura: los nodos se calculan una vez
+    return np.polynomial.legendre.leggauss(nodos)
+
+
+def prob_b_mejor_cuadratura(dist_a, dist_b, nodos=256):
+    """
+    P(B > A) = E_B[F_A(B)] por cuadratura de Gauss-Legendre sobre el
+    intervalo que contiene casi toda la masa de B (entre sus cuantiles
+    1e-12 y 1 - 1e-12). dist_a y dist_b son distribuciones congeladas de
+    scipy.stats (beta, gamma...). Con las posteriores de un test A/B, que
+    son unimodales, el error está muy por debajo de 1e-6.
+    """
+    inferior, superior = dist_b.ppf(1e-12), dist_b.isf(1e-12)
+    x, pesos = _nodos_legendre(nodos)
+    x = (superior - inferior) / 2 * x + (superior + inferior) / 2
+    return float((superior - inferior) / 2 * np.sum(pesos * dist_b.pdf(x) * dist_a.cdf(x)))
+
+
+def uplift_medio_beta(alpha_a, beta_a, media_b):
+    """
+    E[(B - A) / A] exacto cuando A ~ Beta(alpha_a, beta_a) es independiente de B:
+    E[B] * E[1/A] - 1, con E[1/A] = (alpha + beta - 1) / (alpha - 1).
+    Solo está definido para alpha_a > 1; en otro caso devuelve NaN.
+    """
+    alpha_a = np.asarray(alpha_a, dtype=float)
+    beta_a = np.asarray(beta_a, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv_a = np.where(alpha_a > 1, (alpha_a + beta_a - 1) / (alpha_a - 1), np.nan)
+    return np.asarray(media_b) * inv_a - 1
+
+
+def decidir(prob_b_mejor, mejora_relativa, umbral_probabilidad=0.95, umbral_mejora_minima=0.01):
+    """
+    Regla de decisión de detectar_ganador aplicada elemento a elemento.
+    Devuelve un array de enteros con GANA_B, GANA_A o CONTINUAR y admite
+    broadcasting entre probabilidades, mejoras y umbrales.
+    """
+    prob_b_mejor = np.asarray(prob_b_mejor, dtype=float)
+    mejora_relativa = np.asarray(mejora_relativa, dtype=float)
+    gana_b = (prob_b_mejor >= umbral_probabilidad) & (mejora_relativa >= umbral_mejora_minima)
+    gana_a = ((1 - prob_b_mejor) >= umbral_probabilidad) & (mejora_relativa <= -umbral_mejora_minima)
+    return np.where(gana_b, GANA_B, np.where(gana_a, GANA_A, CONTINUAR)).astype(np.int8)
@@ -0,0 +1,166 @@
+# estadisticos_suficientes.py
+import json
+import numbers
+import re
+from datetime import date, datetime
+from functools import reduce
+
+MODELOS = ("clicks", "conversiones", "ingresos", "frecuentista")
+
+# Campos con importes (se suman como float); el resto son recuentos enteros
+CAMPOS_IMPORTE = ("ingresos_a", "ingresos_b")
+
+# Recuentos que se guardan por clave según el modelo
+CAMPOS = {
+    "clicks": ("exitos_a", "visitas_a", "exitos_b", "visitas_b"),
+    "conversiones": ("exitos_a", "visitas_a", "exitos_b", "visitas_b"),
+    "ingresos": ("exitos_a", "visitas_a", "ingresos_a", "exitos_b", "visitas_b", "ingresos_b"),
+    "frecuentista": ("visitas", "conv"),
+}
+
+
+class EstadisticosSuficientes:
+    """
+    Estadísticos suficientes de un experimento: los recuentos por día
+    (calculadoras bayesianas) o por grupo (ConversionFrecuentistaMultiGrupo)
+    más los priors. Es todo lo que hace falta para reconstruir una
+    calculadora sin volver a leer los datos en bruto.
+
+    fusionar() es asociativa y conmutativa: suma los recuentos de las
+    claves comunes y, en los modelos por día, ordena los días por su
+    etiqueta (clave_dia), de modo que varios trabajadores pueden producir
+    estados parciales (por shard, por día) y combinarlos con un reduce en
+    cualquier agrupación y orden. Reconstruir una calculadora a partir del
+    estado fusionado equivale a la ingestión secuencial.
+
+    Las calculadoras bayesianas se reconstruyen con desde_estadisticos, que
+    repite la inferencia de cada día (con clicks, un muestreo NUTS por día
+    salvo con otro motor): es la parte cara, no la fusión.
+    """
+
+    def __init__(self, modelo, priors=None, recuentos=None):
+        if modelo not in MODELOS:
+            raise ValueError(f"Modelo desconocido: {modelo!r}. Opciones: {', '.join(MODELOS)}")
+        self.modelo = modelo
+        self.priors = dict(priors) if priors else {}
+        # clave (día o grupo) -> {campo: recuento}
+        self.recuentos = {}
+        for clave, valores in (recuentos or {}).items():
+            self.agregar(clave, **valores)
+
+    def agregar(self, clave, **valores):
+        """
+        Suma recuentos a una clave (día o grupo), creándola si no existe.
+        """
+        campos = CAMPOS[self.modelo]
+        desconocidos = set(valores) - set(campos)
+        if desconocidos:
+            raise ValueError(f"Campos no válidos para el modelo {self.modelo}: {', '.join(sorted(desconocidos))}")
+
+        actual = self.recuentos.setdefault(clave, {campo: 0 for campo in campos})
+        for campo, valor in valores.items():
+            actual[campo] += float(valor) if campo in CAMPOS_IMPORTE else int(valor)
+        return self
+
+    def fusionar(self, otro):
+        """
+        Devuelve un nuevo objeto con los recuentos de ambos. Los priors y el
+        modelo tienen que coincidir. Salvo en el modelo frecuentista (una
+        clave por grupo), las claves quedan ordenadas por clave_dia, así que
+        el resultado no depende del orden de los operandos.
+        """
+        if otro.modelo != self.modelo:
+            raise ValueError(f"No se pueden fusionar estadísticos de modelos distintos ({self.modelo} y {otro.modelo})")
+        if otro.priors != self.priors:
+            raise ValueError("No se pueden fusionar estadísticos con priors distintos")
+
+        resultado = EstadisticosSuficientes(self.modelo, self.priors)
+        for fuente in (self, otro):
+            for clave, valores in fuente.recuentos.items():
+                resultado.agregar(clave, **valores)
+        if self.modelo != "frecuentista":
+            resultado.recuentos = dict(sorted(resultado.recuentos.items(), key=lambda item: clave_dia(item[0])))
+        return resultado
+
+    def totales(self):
+        """
+        Suma de los recuentos de todas las claves.
+        """
+        totales = {campo: 0 for campo in CAMPOS[self.modelo]}
+        for valores in self.recuentos.values():
+            for campo, valor in valores.items():
+                totales[campo] += valor
+        return totales
+
+    def a_dict(self):
+        return {
+            "modelo": self.modelo,
+            "priors": dict(self.priors),
+            # Lista de pares para conservar el orden y admitir claves no textuales
+            "recuentos": [[clave, dict(valores)] for clave, valores in self.recuentos.items()],
+        }
+
+    @classmethod
+    def desde_dict(cls, datos):
+        return cls(datos["modelo"], datos.get("priors"), {clave: valores for clave, valores in datos["recuentos"]})
+
+    def a_json(self):
+        return json.dumps(self.a_dict(), ensure_ascii=False)
+
+    @classmethod
+    def desde_json(cls, texto):
+        return cls.desde_dict(json.loads(texto))
+
+    def __eq__(self, otro):
+        if not isinstance(otro, EstadisticosSuficientes):
+            return NotImplemented
+        return self.a_dict() == otro.a_dict()
+
+    def __repr__(self):
+        return f"EstadisticosSuficientes(modelo={self.modelo!r}, claves={len(self.recuentos)})"
+
+
+def clave_dia(dia):
+    """
+    Clave para ordenar cronológicamente las etiquetas de día: primero las
+    numéricas (3, "3", "Día 3") por su número, después las fechas (date,
+    datetime o texto ISO como "2024-05-01") y al final el resto de textos.
+    Los empates (textos sin número ni fecha, o "3" frente a "Día 3") se
+    deshacen por el texto de la etiqueta y su tipo, así que etiquetas
+    distintas nunca comparten clave y el orden no depende de la entrada.
+    """
+    desempate = (str(dia), type(dia).__name__)
+    texto = str(dia).strip()
+    if isinstance(dia, numbers.Real) and not isinstance(dia, bool):
+        return (0, float(dia), "") + desempate
+    if isinstance(dia, (date, datetime)):
+        return (1, 0.0, dia.isoformat()) + desempate
+    numero = re.fullmatch(r"(?:d[ií]a\s*)?(\d+(?:\.\d+)?)", texto, flags=re.IGNORECASE)
+    if numero:
+        return (0, float(numero.group(1)), "") + desempate
+    try:
+        return (1, 0.0, datetime.fromisoformat(texto).isoformat()) + desempate
+    except ValueError:
+        return (2, 0.0, "") + desempate
+
+
+def recuentos_paso(datos):
+    """
+    Recuentos de un paso del historial (paso["datos"]) con los nombres
+    comunes a todos los modelos: clicks_a, conversiones_a y compras_a pasan
+    a ser exitos_a; visitas e ingresos conservan el suyo.
+    """
+    recuentos = {}
+    for clave, valor in datos.items():
+        if clave.startswith(("visitas", "ingresos")):
+            recuentos[clave] = valor
+        else:
+            recuentos[f"exitos_{clave[-1]}"] = valor
+    return recuentos
+
+
+def fusionar_todos(estadisticos):
+    """
+    Fusiona una secuencia de estados parciales (paso reduce de un map-reduce).
+    """
+    return reduce(lambda a, b: a.fusionar(b), estadisticos)
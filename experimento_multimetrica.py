@@ -0,0 +1,229 @@
+# experimento_multimetrica.py
+import numpy as np
+import pandas as pd
+
+from estadistica_conjugada import CONTINUAR, GANA_A, GANA_B, decidir
+
+METRICAS = ("clicks", "conversiones")
+
+# Nombres de columna por defecto: los de la pestaña CSV de app.py más los clicks
+COLUMNAS_POR_DEFECTO = {
+    "dia": "Día",
+    "clicks_a": "Clicks A",
+    "conversiones_a": "Conversiones A",
+    "visitas_a": "Visitas A",
+    "clicks_b": "Clicks B",
+    "conversiones_b": "Conversiones B",
+    "visitas_b": "Visitas B",
+}
+
+_DECISIONES = {GANA_B: "Implementar B", GANA_A: "Mantener A", CONTINUAR: "Continuar prueba"}
+
+
+class ExperimentoMultiMetrica:
+    """
+    Experimento A/B con dos métricas sobre las mismas visitas, actualizadas
+    juntas en una sola pasada por los datos:
+
+    - clicks por visita: Gamma-Poisson, como CalculadoraClicksBayesiana
+      (aquí con la actualización conjugada exacta, sin MCMC)
+    - conversiones 0/1: Beta-Binomial, como CalculadoraConversionesBayesiana
+
+    Las muestras de las cuatro tasas se extraen en bloque cada día y se
+    usan a la vez para las métricas individuales y para las cantidades
+    conjuntas, como P(B mejor en ambas métricas). detectar_ganador combina
+    las dos: B (o A) solo gana si es mejor en ambas.
+    """
+
+    def __init__(self, alpha_clicks=1, beta_clicks=1,
+                       alpha_conversiones=1, beta_conversiones=1,
+                       num_samples=100_000, semilla=None):
+        self.priors = {
+            "clicks": (alpha_clicks, beta_clicks),
+            "conversiones": (alpha_conversiones, beta_conversiones),
+        }
+        # Parámetros acumulados por métrica (mismo prior para A y B)
+        self.parametros = {
+            metrica: {"alpha_a": alpha, "beta_a": beta, "alpha_b": alpha, "beta_b": beta}
+            for metrica, (alpha, beta) in self.priors.items()
+        }
+        self.num_samples = num_samples
+        self._rng = np.random.default_rng(semilla)
+
+        self.historial = [{"dia": "A priori", **{m: dict(p) for m, p in self.parametros.items()}}]
+
+    def actualizar_con_datos(self, clicks_a, conversiones_a, visitas_a,
+                                   clicks_b, conversiones_b, visitas_b, dia=None):
+        """
+        Actualiza las dos métricas con los datos de un día.
+        """
+        if conversiones_a > visitas_a or conversiones_b > visitas_b:
+            raise ValueError("Las conversiones no pueden superar a las visitas")
+        dia = dia or f"Día {len(self.historial)}"
+
+        clicks = self.parametros["clicks"]
+        clicks["alpha_a"] += clicks_a
+        clicks["beta_a"] += visitas_a
+        clicks["alpha_b"] += clicks_b
+        clicks["beta_b"] += visitas_b
+
+        conv = self.parametros["conversiones"]
+        conv["alpha_a"] += conversiones_a
+        conv["beta_a"] += visitas_a - conversiones_a
+        conv["alpha_b"] += conversiones_b
+        conv["beta_b"] += visitas_b - conversiones_b
+
+        # Muestras de las cuatro tasas en una sola pasada
+        n = self.num_samples
+        muestras = {
+            "clicks": (self._rng.gamma(clicks["alpha_a"], 1 / clicks["beta_a"], n),
+                       self._rng.gamma(clicks["alpha_b"], 1 / clicks["beta_b"], n)),
+            "conversiones": (self._rng.beta(conv["alpha_a"], conv["beta_a"], n),
+                             self._rng.beta(conv["alpha_b"], conv["beta_b"], n)),
+        }
+
+        metricas = {}
+        b_mejor = {}
+        for metrica, (muestras_a, muestras_b) in muestras.items():
+            b_mejor[metrica] = muestras_b > muestras_a
+            with np.errstate(divide="ignore", invalid="ignore"):
+                uplift = np.where(muestras_a > 0, muestras_b / muestras_a - 1, np.nan)
+            metricas[metrica] = {
+                "media_a": float(muestras_a.mean()),
+                "media_b": float(muestras_b.mean()),
+                "prob_b_mejor": float(b_mejor[metrica].mean()),
+                "uplift_media": float(np.nanmean(uplift)),
+                "uplift_ci": np.nanpercentile(uplift, [2.5, 97.5]),
+            }
+
+        ambas_b = b_mejor["clicks"] & b_mejor["conversiones"]
+        ambas_a = ~b_mejor["clicks"] & ~b_mejor["conversiones"]
+
+        self.historial.append({
+            "dia": dia,
+            **{m: dict(p) for m, p in self.parametros.items()},
+            "datos": {
+                "clicks_a": clicks_a,
+                "conversiones_a": conversiones_a,
+                "visitas_a": visitas_a,
+                "clicks_b": clicks_b,
+                "conversiones_b": conversiones_b,
+                "visitas_b": visitas_b,
+            },
+            "metricas": metricas,
+            "conjunta": {
+                "prob_b_mejor_ambas": float(ambas_b.mean()),
+                "prob_a_mejor_ambas": float(ambas_a.mean()),
+            },
+        })
+
+    def procesar_dataframe(self, df, columnas=None):
+        """
+        Ingiere un DataFrame con una o varias filas por día (una sola
+        lectura para las dos métricas). Las filas del mismo día (por
+        ejemplo, una por segmento) se suman antes, así que cada día es un
+        único paso del historial, en orden de primera aparición. columnas
+        permite renombrar las de COLUMNAS_POR_DEFECTO.
+        """
+        col = {**COLUMNAS_POR_DEFECTO, **(columnas or {})}
+        faltantes = [nombre for nombre in col.values() if nombre not in df.columns]
+        if faltantes:
+            raise ValueError(f"Faltan las siguientes columnas: {', '.join(faltantes)}")
+
+        recuentos = [nombre for clave, nombre in col.items() if clave != "dia"]
+        diario = df.groupby(col["dia"], sort=False)[recuentos].sum().reset_index()
+        for fila in diario[list(col.values())].itertuples(index=False):
+            valores = dict(zip(col, fila))
+            dia = valores.pop("dia")
+            self.actualizar_con_datos(**{clave: int(v) for clave, v in valores.items()}, dia=f"Día {dia}")
+        return self
+
+    def detectar_ganador(self, umbral_probabilidad=0.95, umbral_mejora_minima=0.01):
+        """
+        Decisión combinada con la misma estructura que las calculadoras:
+        B gana si P(B mejor en ambas métricas) >= umbral_probabilidad y
+        las dos mejoras superan umbral_mejora_minima (A, simétricamente).
+        'por_metrica' recoge además la decisión de cada métrica por separado.
+        """
+        if len(self.historial) < 2:
+            return {
+                "ganador": None,
+                "decision": "Continuar prueba",
+                "razon": "No hay datos suficientes para declarar un ganador",
+                "probabilidad_b_mejor": None,
+                "mejora_relativa": None
+            }
+
+        ultimo = self.historial[-1]
+        metricas = ultimo["metricas"]
+        mejoras = {m: metricas[m]["uplift_media"] for m in METRICAS}
+        por_metrica = {
+            m: _DECISIONES[int(decidir(metricas[m]["prob_b_mejor"], mejoras[m], umbral_probabilidad, umbral_mejora_minima))]
+            for m in METRICAS
+        }
+        prob_b = ultimo["conjunta"]["prob_b_mejor_ambas"]
+        prob_a = ultimo["conjunta"]["prob_a_mejor_ambas"]
+
+        if prob_b >= umbral_probabilidad and min(mejoras.values()) >= umbral_mejora_minima:
+            return {
+                "ganador": "B",
+                "decision": "Implementar B",
+                "razon": f"B es mejor en ambas métricas con {prob_b:.1%} de probabilidad",
+                "probabilidad": prob_b,
+                "mejora_relativa": mejoras,
+                "por_metrica": por_metrica
+            }
+        elif prob_a >= umbral_probabilidad and max(mejoras.values()) <= -umbral_mejora_minima:
+            return {
+                "ganador": "A",
+                "decision": "Mantener A",
+                "razon": f"A es mejor en ambas métricas con {prob_a:.1%} de probabilidad",
+                "probabilidad": prob_a,
+                "mejora_relativa": mejoras,
+                "por_metrica": por_metrica
+            }
+        else:
+            return {
+                "ganador": None,
+                "decision": "Continuar prueba",
+                "razon": "No hay evidencia suficiente de que una versión sea mejor en ambas métricas",
+                "probabilidad_b_mejor": prob_b,
+                "mejora_relativa": mejoras,
+                "por_metrica": por_metrica
+            }
+
+    def resumen_dias(self):
+        """
+        DataFrame con una fila por día: P(B > A) y uplift medio de cada
+        métrica y la probabilidad conjunta.
+        """
+        filas = []
+        for paso in self.historial[1:]:
+            fila = {"Día": paso["dia"]}
+            for metrica in METRICAS:
+                fila[f"P(B > A) {metrica}"] = paso["metricas"][metrica]["prob_b_mejor"]
+                fila[f"Uplift {metrica}"] = paso["metricas"][metrica]["uplift_media"]
+            fila["P(B mejor en ambas)"] = paso["conjunta"]["prob_b_mejor_ambas"]
+            fila["P(A mejor en ambas)"] = paso["conjunta"]["prob_a_mejor_ambas"]
+            filas.append(fila)
+        return pd.DataFrame(filas)
+
+    def mostrar_historial_completo(self):
+        for paso in self.historial:
+            print(f"\n🗓️  {paso['dia']}")
+            for metrica in METRICAS:
+                p = paso[metrica]
+                print(f"Parámetros {metrica}:")
+                print(f"  Grupo A: alpha={p['alpha_a']:.1f}, beta={p['beta_a']:.1f}")
+                print(f"  Grupo B: alpha={p['alpha_b']:.1f}, beta={p['beta_b']:.1f}")
+
+            if "metricas" in paso:
+                for metrica, m in paso["metricas"].items():
+                    print(f"Comparación B vs A ({metrica}):")
+                    print(f"  Media A: {m['media_a']:.4f}, media B: {m['media_b']:.4f}")
+                    print(f"  Uplift medio: {m['uplift_media']:.4f}")
+                    print(f"  IC 95% uplift: [{m['uplift_ci'][0]:.4f}, {m['uplift_ci'][1]:.4f}]")
+                    print(f"  Probabilidad de que B > A: {m['prob_b_mejor']:.2%}")
+                conjunta = paso["conjunta"]
+                print(f"Probabilidad de que B sea mejor en ambas métricas: {conjunta['prob_b_mejor_ambas']:.2%}")
+                print(f"Probabilidad de que A sea mejor en ambas métricas: {conjunta['prob_a_mejor_ambas']:.2%}")
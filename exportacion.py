@@ -0,0 +1,168 @@
+# exportacion.py
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional: solo hace falta para exportar
+    pa = None
+
+from estadistica_conjugada import decidir
+
+
+def _comprobar_pyarrow():
+    if pa is None:
+        raise ImportError("La exportación a Arrow/Parquet necesita pyarrow (pip install pyarrow)")
+
+
+def _muestras_paso(paso):
+    """
+    Muestras de A y B de un paso como arrays 1D sin copiar: las de
+    "posterior" (conversiones, ingresos) o las de "muestras" (clicks).
+    """
+    if "posterior" in paso:
+        return paso["posterior"]["A"]["muestras"], paso["posterior"]["B"]["muestras"]
+    if "muestras" in paso:
+        return paso["muestras"]["tasa_clicks_a"].ravel(), paso["muestras"]["tasa_clicks_b"].ravel()
+    return None
+
+
+def _medias_paso(paso):
+    if "posterior" in paso:
+        return paso["posterior"]["A"]["media"], paso["posterior"]["B"]["media"]
+    muestras_a, muestras_b = _muestras_paso(paso)
+    return float(np.mean(muestras_a)), float(np.mean(muestras_b))
+
+
+def tabla_historial(calculadora, umbral_probabilidad=0.95, umbral_mejora_minima=0.01):
+    """
+    Tabla Arrow con una fila por día: parámetros acumulados, datos del día,
+    medias posteriores, P(B > A), mejora relativa y la decisión que tomaría
+    detectar_ganador con esos umbrales (1 = B, -1 = A, 0 = continuar).
+    Todas las columnas son numéricas salvo la etiqueta del día.
+    """
+    _comprobar_pyarrow()
+    pasos = [paso for paso in calculadora.historial[1:] if "datos" in paso]
+    serie = calculadora.series_decision()
+
+    columnas = {"dia": pa.array([str(paso["dia"]) for paso in pasos], type=pa.string())}
+    for clave in ("alpha_a", "beta_a", "alpha_b", "beta_b"):
+        columnas[clave] = np.array([paso[clave] for paso in pasos], dtype=float)
+    for clave in (pasos[0]["datos"] if pasos else {}):
+        columnas[clave] = np.array([paso["datos"][clave] for paso in pasos])
+
+    medias = np.array([_medias_paso(paso) for paso in pasos], dtype=float).reshape(-1, 2)
+    columnas["media_a"] = medias[:, 0]
+    columnas["media_b"] = medias[:, 1]
+    columnas["prob_b_mejor"] = serie["prob_b_mejor"]
+    columnas["mejora_relativa"] = serie["mejora_relativa"]
+    columnas["decision"] = decidir(serie["prob_b_mejor"], serie["mejora_relativa"],
+                                   umbral_probabilidad, umbral_mejora_minima)
+
+    return pa.table({nombre: pa.array(valores) if isinstance(valores, np.ndarray) else valores
+                     for nombre, valores in columnas.items()})
+
+
+def tabla_muestras(calculadora, max_muestras=None):
+    """
+    Tabla Arrow en formato largo con las muestras posteriores de cada día
+    (columnas dia, muestra_a, muestra_b). Cada día es un record batch que
+    envuelve los arrays de NumPy del historial sin copiarlos; el día va
+    codificado como diccionario para no repetir la etiqueta.
+
+    Con max_muestras se guarda como mucho ese número de muestras por día
+    (una de cada k, como el aclarado de los gráficos): las muestras no se
+    comprimen, así que es lo que acota el tamaño del archivo.
+    """
+    _comprobar_pyarrow()
+    if max_muestras is not None and max_muestras < 1:
+        raise ValueError("El número máximo de muestras por día debe ser positivo")
+    pasos = [paso for paso in calculadora.historial[1:] if _muestras_paso(paso) is not None]
+    etiquetas = pa.array([str(paso["dia"]) for paso in pasos], type=pa.string())
+
+    lotes = []
+    for indice, paso in enumerate(pasos):
+        muestras_a, muestras_b = _muestras_paso(paso)
+        if max_muestras is not None and len(muestras_a) > max_muestras:
+            salto = -(-len(muestras_a) // max_muestras)
+            muestras_a, muestras_b = muestras_a[::salto], muestras_b[::salto]
+        dia = pa.DictionaryArray.from_arrays(np.full(len(muestras_a), indice, dtype=np.int32), etiquetas)
+        lotes.append(pa.record_batch([dia, pa.array(muestras_a), pa.array(muestras_b)],
+                                     names=["dia", "muestra_a", "muestra_b"]))
+    if not lotes:
+        return pa.table({"dia": pa.array([], type=pa.dictionary(pa.int32(), pa.string())),
+                         "muestra_a": pa.array([], type=pa.float32()),
+                         "muestra_b": pa.array([], type=pa.float32())})
+    return pa.Table.from_batches(lotes)
+
+
+def tablas_frecuentista(analisis):
+    """
+    Tablas Arrow de ConversionFrecuentistaMultiGrupo: "grupos",
+    "comparaciones" y, si se ha llamado a analizar_secuencial, "secuencial"
+    (una fila por día y pareja con el z acumulado y el límite).
+    """
+    _comprobar_pyarrow()
+    resultados = analisis.resultados
+    tablas = {}
+
+    grupos = resultados.get("grupos", {})
+    tablas["grupos"] = pa.table({
+        "grupo": pa.array([str(g) for g in grupos], type=pa.string()),
+        "visitas": np.array([d["visitas"] for d in grupos.values()], dtype=np.int64),
+        "conv": np.array([d["conv"] for d in grupos.values()], dtype=np.int64),
+        "tasa_conversion": np.array([d["tasa_conversion"] for d in grupos.values()], dtype=float),
+        "std_error": np.array([d["std_error"] for d in grupos.values()], dtype=float),
+        "ci_inferior": np.array([d["ci"][0] for d in grupos.values()], dtype=float),
+        "ci_superior": np.array([d["ci"][1] for d in grupos.values()], dtype=float),
+    })
+
+    comparaciones = resultados.get("comparaciones", {})
+    tablas["comparaciones"] = pa.table({
+        "comparacion": pa.array(list(comparaciones), type=pa.string()),
+        "diff_mean": np.array([c["diff_mean"] for c in comparaciones.values()], dtype=float),
+        "diff_ci_inferior": np.array([c["diff_ci"][0] for c in comparaciones.values()], dtype=float),
+        "diff_ci_superior": np.array([c["diff_ci"][1] for c in comparaciones.values()], dtype=float),
+        "uplift_mean": np.array([c["uplift_mean"] for c in comparaciones.values()], dtype=float),
+        "prob_g1_mejor": np.array([c["prob_g1_mejor"] for c in comparaciones.values()], dtype=float),
+        "ganador": pa.array([c["ganador"] for c in comparaciones.values()], type=pa.string()),
+    })
+
+    secuencial = resultados.get("secuencial")
+    if secuencial:
+        num_dias = len(secuencial["dias"])
+        etiquetas = pa.array([str(d) for d in secuencial["dias"]], type=pa.string())
+        lotes = []
+        for nombre, comp in secuencial["comparaciones"].items():
+            lotes.append(pa.record_batch([
+                pa.DictionaryArray.from_arrays(np.arange(num_dias, dtype=np.int32), etiquetas),
+                pa.array([nombre] * num_dias, type=pa.string()),
+                pa.array(np.asarray(comp["z"], dtype=float)),
+                pa.array(np.asarray(secuencial["limites"], dtype=float)),
+                pa.array(np.asarray(secuencial["fraccion_informacion"], dtype=float)),
+            ], names=["dia", "comparacion", "z", "limite", "fraccion_informacion"]))
+        if lotes:
+            tablas["secuencial"] = pa.Table.from_batches(lotes)
+
+    return tablas
+
+
+def escribir_parquet(tabla, destino=None, compresion="lz4"):
+    """
+    Escribe la tabla en un archivo Parquet (ruta u objeto tipo archivo).
+    Sin destino devuelve los bytes, por ejemplo para st.download_button.
+
+    Solo las columnas que no son de coma flotante se codifican con
+    diccionario y llevan estadísticas: en las muestras posteriores ninguna
+    de las dos cosas ahorra espacio y ambas cuestan tiempo de escritura.
+    La compresión por defecto (lz4) es de las más rápidas.
+    """
+    _comprobar_pyarrow()
+    no_flotantes = [campo.name for campo in tabla.schema if not pa.types.is_floating(campo.type)]
+    opciones = {"compression": compresion, "use_dictionary": no_flotantes, "write_statistics": no_flotantes}
+    if destino is not None:
+        pq.write_table(tabla, destino, **opciones)
+        return None
+    salida = pa.BufferOutputStream()
+    pq.write_table(tabla, salida, **opciones)
+    return salida.getvalue().to_pybytes()
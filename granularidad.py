@@ -0,0 +1,219 @@
+# granularidad.py
+import numpy as np
+import pandas as pd
+
+from estadistica_conjugada import momentos_beta, momentos_gamma, prob_b_mejor_normal, uplift_medio_beta
+
+MODELOS = ("conversiones", "clicks")
+
+# Duración de cada granularidad en segundos
+GRANULARIDADES = {
+    "15min": 15 * 60,
+    "hora": 3600,
+    "dia": 86400,
+    "semana": 7 * 86400,
+}
+
+# Las semanas empiezan en lunes: el 1970-01-05 (lunes) está 4 días después del origen
+_DESFASE_SEMANA = 4 * 86400
+
+_CAMPOS = ("exitos_a", "visitas_a", "exitos_b", "visitas_b")
+
+
+def _redondear(inicios, granularidad):
+    """
+    Inicio del periodo (en segundos desde 1970) que contiene cada instante.
+    """
+    paso = GRANULARIDADES[granularidad]
+    desfase = _DESFASE_SEMANA if granularidad == "semana" else 0
+    return (inicios - desfase) // paso * paso + desfase
+
+
+class _Acumulado:
+    """
+    Recuentos por periodo en arrays crecientes (capacidad que se duplica),
+    para añadir periodos en O(1) amortizado sin copiar lo anterior.
+    """
+
+    def __init__(self, granularidad=None, capacidad=64):
+        self.granularidad = granularidad  # None: periodos en bruto, sin agrupar
+        self._inicios = np.empty(capacidad, dtype=np.int64)
+        self._sumas = np.empty((capacidad, len(_CAMPOS)), dtype=np.int64)
+        self.n = 0
+
+    @property
+    def inicios(self):
+        return self._inicios[:self.n]
+
+    @property
+    def sumas(self):
+        return self._sumas[:self.n]
+
+    def _reservar(self, n):
+        if n <= len(self._inicios):
+            return
+        capacidad = max(n, 2 * len(self._inicios))
+        inicios = np.empty(capacidad, dtype=np.int64)
+        sumas = np.empty((capacidad, len(_CAMPOS)), dtype=np.int64)
+        inicios[:self.n] = self.inicios
+        sumas[:self.n] = self.sumas
+        self._inicios, self._sumas = inicios, sumas
+
+    def agregar(self, inicios, valores):
+        """
+        inicios: array ordenado de instantes (segundos); valores: (m, 4).
+        Los periodos que caen en el último grupo existente se suman a él.
+        """
+        claves = inicios if self.granularidad is None else _redondear(inicios, self.granularidad)
+        if self.granularidad is None:
+            claves_unicas, sumas = claves, valores
+        else:
+            comienzos = np.concatenate(([0], np.flatnonzero(np.diff(claves)) + 1))
+            claves_unicas, sumas = claves[comienzos], np.add.reduceat(valores, comienzos, axis=0)
+
+        if self.n and self.granularidad is not None and claves_unicas[0] == self._inicios[self.n - 1]:
+            self._sumas[self.n - 1] += sumas[0]
+            claves_unicas, sumas = claves_unicas[1:], sumas[1:]
+
+        self._reservar(self.n + len(claves_unicas))
+        self._inicios[self.n:self.n + len(claves_unicas)] = claves_unicas
+        self._sumas[self.n:self.n + len(claves_unicas)] = sumas
+        self.n += len(claves_unicas)
+
+
+class SeriePeriodos:
+    """
+    Datos de un test A/B a granularidad fina (por ejemplo, por hora o cada
+    15 minutos) sin crear un paso del historial por periodo.
+
+    Los recuentos en bruto se guardan en arrays compactos y los agregados
+    por hora, día y semana se mantienen de forma incremental al llegar
+    cada periodo. Los resúmenes posteriores (conjugados y analíticos, sin
+    muestreo) se calculan solo cuando se consulta una granularidad y se
+    reutilizan hasta que llegan datos nuevos.
+
+    Para los gráficos y la decisión habitual, volcar_en_calculadora pasa
+    los días completos a una calculadora (un paso por día).
+    """
+
+    def __init__(self, modelo="conversiones", alpha_prior_a=1, beta_prior_a=1,
+                       alpha_prior_b=1, beta_prior_b=1, granularidades=("hora", "dia", "semana")):
+        if modelo not in MODELOS:
+            raise ValueError(f"Modelo desconocido: {modelo!r}. Opciones: {', '.join(MODELOS)}")
+        desconocidas = [g for g in granularidades if g not in GRANULARIDADES]
+        if desconocidas:
+            raise ValueError(f"Granularidades desconocidas: {', '.join(desconocidas)}. Opciones: {', '.join(GRANULARIDADES)}")
+
+        self.modelo = modelo
+        self.priors = (alpha_prior_a, beta_prior_a, alpha_prior_b, beta_prior_b)
+        self.bruto = _Acumulado()
+        self.agregados = {g: _Acumulado(g) for g in granularidades}
+        self._resumenes = {}  # granularidad -> (n_bruto, DataFrame)
+        self._dias_volcados = 0
+
+    @staticmethod
+    def _a_segundos(instantes):
+        return pd.to_datetime(np.atleast_1d(instantes)).values.astype("datetime64[s]").astype(np.int64)
+
+    def agregar(self, inicio, exitos_a, visitas_a, exitos_b, visitas_b):
+        """
+        Añade un periodo (inicio: fecha/hora o algo que entienda pd.to_datetime).
+        """
+        self.agregar_lote([inicio], [exitos_a], [visitas_a], [exitos_b], [visitas_b])
+
+    def agregar_lote(self, inicios, exitos_a, visitas_a, exitos_b, visitas_b):
+        """
+        Añade muchos periodos de una vez (por ejemplo, las filas de un CSV
+        horario). Se ordenan por instante; no pueden ser anteriores al
+        último periodo ya añadido.
+        """
+        segundos = self._a_segundos(inicios)
+        valores = np.column_stack([np.asarray(v, dtype=np.int64) for v in (exitos_a, visitas_a, exitos_b, visitas_b)])
+        if len(segundos) != len(valores):
+            raise ValueError("Todas las columnas deben tener la misma longitud")
+        if len(segundos) == 0:
+            return
+        if (valores < 0).any():
+            raise ValueError("Los recuentos no pueden ser negativos")
+        if self.modelo == "conversiones" and ((valores[:, 0] > valores[:, 1]) | (valores[:, 2] > valores[:, 3])).any():
+            raise ValueError("Las conversiones no pueden superar a las visitas")
+
+        orden = np.argsort(segundos, kind="stable")
+        segundos, valores = segundos[orden], valores[orden]
+        if self.bruto.n and segundos[0] < self.bruto.inicios[-1]:
+            raise ValueError("Los periodos deben llegar en orden cronológico")
+
+        self.bruto.agregar(segundos, valores)
+        for agregado in self.agregados.values():
+            agregado.agregar(segundos, valores)
+
+    def recuentos(self, granularidad):
+        """
+        DataFrame con los recuentos de cada periodo de la granularidad pedida.
+        """
+        agregado = self.agregados[granularidad]
+        df = pd.DataFrame(agregado.sumas, columns=list(_CAMPOS))
+        df.insert(0, "inicio", pd.to_datetime(agregado.inicios, unit="s"))
+        return df
+
+    def resumen(self, granularidad="dia"):
+        """
+        Posterior acumulado al final de cada periodo de la granularidad
+        pedida: tasas esperadas, P(B > A) (aproximación normal) y mejora
+        relativa. Vectorizado sobre los periodos y cacheado hasta que se
+        añaden datos.
+        """
+        if granularidad not in self.agregados:
+            raise ValueError(f"Granularidad no disponible: {granularidad!r}. Opciones: {', '.join(self.agregados)}")
+        en_cache = self._resumenes.get(granularidad)
+        if en_cache is not None and en_cache[0] == self.bruto.n:
+            return en_cache[1]
+
+        agregado = self.agregados[granularidad]
+        acumulado = np.cumsum(agregado.sumas, axis=0)
+        exitos_a, visitas_a, exitos_b, visitas_b = acumulado.T
+        alpha0_a, beta0_a, alpha0_b, beta0_b = self.priors
+
+        alpha_a = alpha0_a + exitos_a
+        alpha_b = alpha0_b + exitos_b
+        if self.modelo == "conversiones":
+            beta_a = beta0_a + (visitas_a - exitos_a)
+            beta_b = beta0_b + (visitas_b - exitos_b)
+            media_a, var_a = momentos_beta(alpha_a, beta_a)
+            media_b, var_b = momentos_beta(alpha_b, beta_b)
+            mejora = uplift_medio_beta(alpha_a, beta_a, media_b)
+        else:
+            beta_a = beta0_a + visitas_a
+            beta_b = beta0_b + visitas_b
+            media_a, var_a = momentos_gamma(alpha_a, beta_a)
+            media_b, var_b = momentos_gamma(alpha_b, beta_b)
+            # (E[B] - E[A]) / E[A], la mejora que usa detectar_ganador en clicks
+            mejora = (media_b - media_a) / media_a
+
+        df = self.recuentos(granularidad)
+        df["tasa_a"] = media_a
+        df["tasa_b"] = media_b
+        df["prob_b_mejor"] = prob_b_mejor_normal(media_a, var_a, media_b, var_b)
+        df["mejora_relativa"] = mejora
+        self._resumenes[granularidad] = (self.bruto.n, df)
+        return df
+
+    def volcar_en_calculadora(self, calculadora, incluir_ultimo=False):
+        """
+        Pasa a la calculadora, con actualizar_con_datos, los días todavía
+        no volcados (un paso del historial por día). El último día se
+        considera incompleto y se espera a que llegue el siguiente, salvo
+        con incluir_ultimo=True. Devuelve el número de días volcados.
+        """
+        if "dia" not in self.agregados:
+            raise ValueError("La serie no mantiene el agregado diario")
+        diario = self.agregados["dia"]
+        hasta = diario.n if incluir_ultimo else diario.n - 1
+        volcados = 0
+        for inicio, (exitos_a, visitas_a, exitos_b, visitas_b) in zip(diario.inicios[self._dias_volcados:hasta],
+                                                                      diario.sumas[self._dias_volcados:hasta]):
+            dia = pd.Timestamp(int(inicio), unit="s").strftime("%Y-%m-%d")
+            calculadora.actualizar_con_datos(int(exitos_a), int(visitas_a), int(exitos_b), int(visitas_b), dia=dia)
+            volcados += 1
+        self._dias_volcados = max(self._dias_volcados, hasta)
+        return volcados
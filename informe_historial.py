@@ -0,0 +1,107 @@
+# informe_historial.py
+import math
+
+import numpy as np
+import pandas as pd
+from scipy.stats import gamma
+
+from cuantiles import cuantil, prob_mayor
+from estadisticos_suficientes import recuentos_paso
+
+POR_PAGINA = 25
+
+
+def fila_informe(paso):
+    """
+    Fila del informe de un paso del historial: recuentos del día, medias e
+    IC 95 % de cada grupo, P(B > A), uplift y, si los hay, las vistas de
+    ventana o decaimiento, el diagnóstico MCMC y el motor usado. Solo lee
+    lo que el paso ya tiene calculado (resúmenes, CDF compactas, parámetros
+    conjugados o muestras), sin muestrear.
+
+    Las calculadoras la guardan en paso["informe"] al crear el paso, así
+    que el informe de cualquier página es inmediato.
+    """
+    fila = {"dia": str(paso["dia"])}
+    fila.update(recuentos_paso(paso.get("datos", {})))
+
+    if "posterior" in paso:
+        # Conversiones e ingresos: resúmenes ya calculados en el paso
+        for grupo in ("A", "B"):
+            post = paso["posterior"][grupo]
+            sufijo = grupo.lower()
+            fila[f"media_{sufijo}"] = float(post["media"])
+            fila[f"ic_inf_{sufijo}"], fila[f"ic_sup_{sufijo}"] = (float(x) for x in post["ci"])
+    elif paso.get("conjugado", True) or "muestras" not in paso:
+        # Clicks Gamma–Poisson: posterior Gamma de los parámetros acumulados, IC exacto
+        for sufijo in ("a", "b"):
+            alpha, beta = paso[f"alpha_{sufijo}"], paso[f"beta_{sufijo}"]
+            fila[f"media_{sufijo}"] = alpha / beta
+            fila[f"ic_inf_{sufijo}"], fila[f"ic_sup_{sufijo}"] = (float(x) for x in gamma.ppf([0.025, 0.975], alpha, scale=1 / beta))
+    else:
+        # Clicks no conjugados (prior lognormal o binomial negativa): alpha y
+        # beta solo acumulan recuentos, así que se resumen las muestras guardadas
+        for sufijo in ("a", "b"):
+            muestras = paso["muestras"][f"tasa_clicks_{sufijo}"]
+            fila[f"media_{sufijo}"] = float(np.mean(muestras, dtype=np.float64))
+            fila[f"ic_inf_{sufijo}"], fila[f"ic_sup_{sufijo}"] = (float(x) for x in np.percentile(muestras, [2.5, 97.5]))
+
+    # Ventana deslizante y decaimiento: posteriores alternativos ya resumidos en el paso
+    for nombre, vista in paso.get("vistas", {}).items():
+        fila[f"media_{nombre}_a"] = vista["media_a"]
+        fila[f"media_{nombre}_b"] = vista["media_b"]
+        fila[f"prob_b_mejor_{nombre}"] = vista["prob_b_mejor"]
+
+    if "comparacion" in paso:
+        comp = paso["comparacion"]
+        fila["prob_b_mejor"] = float(comp["prob_b_mejor"])
+        fila["uplift_media"] = float(comp["uplift_media"])
+        fila["uplift_ic_inf"], fila["uplift_ic_sup"] = (float(x) for x in comp["uplift_ci"])
+    elif "cdf" in paso:
+        diferencia = paso["cdf"]["diferencia"]
+        fila["prob_b_mejor"] = float(prob_mayor(diferencia, 0.0))
+        fila["diferencia_media"] = float(np.mean(diferencia))
+        fila["diferencia_ic_inf"], fila["diferencia_ic_sup"] = (float(x) for x in cuantil(diferencia, [0.025, 0.975]))
+        fila["uplift_media"] = float(paso["uplift"]["media"])
+        fila["uplift_ic_inf"], fila["uplift_ic_sup"] = (float(x) for x in paso["uplift"]["ic_95"])
+
+    if "diagnostico" in paso:
+        diag = paso["diagnostico"]
+        fila["ess_min"] = min(diag["ess"].values())
+        fila["rhat_max"] = max(diag["rhat"].values())
+        fila["convergido"] = bool(diag["convergido"])
+    if "motor" in paso:
+        fila["motor"] = paso["motor"]["motor"]
+        fila["tiempo_ms"] = float(paso["motor"]["tiempo_ms"])
+    return fila
+
+
+def _fila(paso):
+    return paso["informe"] if "informe" in paso else fila_informe(paso)
+
+
+def num_paginas(calculadora, por_pagina=POR_PAGINA):
+    return max(1, math.ceil((len(calculadora.historial) - 1) / por_pagina))
+
+
+def pagina_historial(calculadora, pagina=1, por_pagina=POR_PAGINA):
+    """
+    Una página del historial detallado (sin el paso "A priori"), de la
+    más antigua (1) a la más reciente. Devuelve un dict con:
+    - filas: DataFrame con una fila_informe por día de la página
+    - pasos: los pasos de la página, para generar solo sus gráficos
+    - pagina y num_paginas
+    """
+    if por_pagina < 1:
+        raise ValueError("El número de días por página debe ser positivo")
+    total = num_paginas(calculadora, por_pagina)
+    if not 1 <= pagina <= total:
+        raise ValueError(f"La página debe estar entre 1 y {total}")
+    inicio = 1 + (pagina - 1) * por_pagina
+    pasos = calculadora.historial[inicio:inicio + por_pagina]
+    return {
+        "filas": pd.DataFrame([_fila(paso) for paso in pasos]),
+        "pasos": pasos,
+        "pagina": pagina,
+        "num_paginas": total,
+    }
@@ -0,0 +1,214 @@
+# lectura_datos.py
+import gzip
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional: sin él se usa el motor C de pandas
+    pa = None
+
+# Errores de conversión de tipos del lector (texto en columnas numéricas, etc.)
+_ERRORES_LECTURA = (pa.ArrowInvalid,) if pa is not None else ()
+
+# Columnas que exige la pestaña CSV de app.py
+COLUMNAS_REQUERIDAS = ['Día', 'Conversiones A', 'Visitas A', 'Conversiones B', 'Visitas B']
+COLUMNAS_RECUENTO = ['Conversiones A', 'Visitas A', 'Conversiones B', 'Visitas B']
+
+# Pares (éxitos, visitas) que se validan en cada bloque
+PARES_RECUENTO = [('Conversiones A', 'Visitas A'), ('Conversiones B', 'Visitas B')]
+
+TAMANO_BLOQUE = 100_000  # filas por bloque
+
+
+def detectar_formato(nombre):
+    """
+    Devuelve "parquet" o "csv" a partir del nombre del archivo.
+    Los CSV comprimidos (.csv.gz, .gz) se tratan como "csv".
+    """
+    nombre = (nombre or "").lower()
+    if nombre.endswith((".parquet", ".pq")):
+        return "parquet"
+    return "csv"
+
+
+def _es_gzip(fuente, nombre):
+    if (nombre or "").lower().endswith(".gz"):
+        return True
+    if hasattr(fuente, "peek"):
+        return fuente.peek(2)[:2] == b"\x1f\x8b"
+    if hasattr(fuente, "read") and hasattr(fuente, "seek"):
+        posicion = fuente.tell()
+        cabecera = fuente.read(2)
+        fuente.seek(posicion)
+        return cabecera == b"\x1f\x8b"
+    return False
+
+
+def _abrir(fuente, nombre):
+    """
+    Devuelve un objeto binario legible, descomprimiendo gzip al vuelo
+    para no materializar el archivo completo en memoria.
+    """
+    if isinstance(fuente, (str, bytes)) or hasattr(fuente, "__fspath__"):
+        fuente = open(fuente, "rb")
+    if _es_gzip(fuente, nombre):
+        return gzip.GzipFile(fileobj=fuente, mode="rb")
+    return fuente
+
+
+def _tipos(columnas_recuento, columnas=None):
+    return {col: np.int64 for col in columnas_recuento if columnas is None or col in columnas}
+
+
+def _bloques_csv(fuente, columnas_recuento, tamano_bloque):
+    if pa is not None:
+        tipos = {col: pa.int64() for col in columnas_recuento}
+        tipos['Día'] = pa.string()
+        lector = pa_csv.open_csv(
+            fuente,
+            read_options=pa_csv.ReadOptions(block_size=1 << 22),
+            convert_options=pa_csv.ConvertOptions(column_types=tipos),
+        )
+        pendiente = []
+        filas = 0
+        for lote in lector:
+            pendiente.append(lote)
+            filas += lote.num_rows
+            if filas >= tamano_bloque:
+                yield pa.Table.from_batches(pendiente).to_pandas()
+                pendiente, filas = [], 0
+        if pendiente:
+            yield pa.Table.from_batches(pendiente).to_pandas()
+    else:
+        tipos = _tipos(columnas_recuento)
+        tipos['Día'] = str
+        yield from pd.read_csv(fuente, dtype=tipos, chunksize=tamano_bloque)
+
+
+def _bloques_parquet(fuente, columnas_recuento, tamano_bloque):
+    if pa is None:
+        # Sin pyarrow no hay lectura por lotes: se delega en pandas
+        df = pd.read_parquet(fuente)
+        yield df.astype(_tipos(columnas_recuento, df.columns))
+        return
+    archivo = pq.ParquetFile(fuente)
+    for lote in archivo.iter_batches(batch_size=tamano_bloque):
+        df = lote.to_pandas()
+        yield df.astype(_tipos(columnas_recuento, df.columns), copy=False)
+
+
+def validar_bloque(df, fila_inicial=0, columnas_requeridas=COLUMNAS_REQUERIDAS, exitos_acotados=True):
+    """
+    Comprueba el esquema y los rangos de un bloque. Lanza ValueError con
+    la primera fila problemática (numerada desde 1, como en el archivo).
+
+    Con exitos_acotados (conversiones e ingresos) los éxitos no pueden
+    superar a las visitas; con clicks sí, porque un visitante puede hacer
+    varios clicks.
+    """
+    faltantes = [col for col in columnas_requeridas if col not in df.columns]
+    if faltantes:
+        raise ValueError(f"Faltan las siguientes columnas en tu archivo: {', '.join(faltantes)}")
+
+    for col in columnas_requeridas:
+        nulos = df[col].isna().to_numpy()
+        if nulos.any():
+            fila = fila_inicial + int(np.argmax(nulos)) + 1
+            raise ValueError(f"Valor vacío en la columna '{col}' (fila {fila})")
+
+    for exitos, visitas in PARES_RECUENTO:
+        if exitos not in columnas_requeridas:
+            continue
+        e = df[exitos].to_numpy()
+        v = df[visitas].to_numpy()
+        for col, valores in ((exitos, e), (visitas, v)):
+            negativos = valores < 0
+            if negativos.any():
+                fila = fila_inicial + int(np.argmax(negativos)) + 1
+                raise ValueError(f"Valor negativo en la columna '{col}' (fila {fila})")
+        if not exitos_acotados:
+            continue
+        excesos = e > v
+        if excesos.any():
+            fila = fila_inicial + int(np.argmax(excesos)) + 1
+            raise ValueError(f"'{exitos}' supera a '{visitas}' (fila {fila})")
+
+
+def iterar_bloques(fuente, nombre=None, formato=None, tamano_bloque=TAMANO_BLOQUE,
+                   columnas_requeridas=COLUMNAS_REQUERIDAS, exitos_acotados=True):
+    """
+    Lee un archivo de experimento (CSV, CSV comprimido con gzip o Parquet)
+    por bloques de tamano_bloque filas, con tipos enteros explícitos para
+    los recuentos, y valida cada bloque según llega.
+
+    fuente puede ser una ruta o un objeto tipo archivo (por ejemplo el
+    UploadedFile de Streamlit). El nombre se usa para detectar el formato.
+    La memoria usada queda acotada por el tamaño de bloque. exitos_acotados
+    se pasa a validar_bloque (False para clicks).
+    """
+    nombre = nombre or getattr(fuente, "name", None) or (fuente if isinstance(fuente, str) else None)
+    formato = formato or detectar_formato(nombre)
+    columnas_recuento = [col for col in COLUMNAS_RECUENTO if col in columnas_requeridas]
+
+    if formato == "parquet":
+        bloques = _bloques_parquet(fuente, columnas_recuento, tamano_bloque)
+    elif formato == "csv":
+        bloques = _bloques_csv(_abrir(fuente, nombre), columnas_recuento, tamano_bloque)
+    else:
+        raise ValueError(f"Formato no soportado: {formato!r}")
+
+    fila_inicial = 0
+    while True:
+        try:
+            bloque = next(bloques)
+        except StopIteration:
+            break
+        except _ERRORES_LECTURA as e:
+            raise ValueError(f"Datos no válidos: {e}") from e
+        validar_bloque(bloque, fila_inicial, columnas_requeridas, exitos_acotados)
+        fila_inicial += len(bloque)
+        yield bloque
+
+
+def leer_datos_experimento(fuente, nombre=None, formato=None, tamano_bloque=TAMANO_BLOQUE,
+                           columnas_requeridas=COLUMNAS_REQUERIDAS, exitos_acotados=True):
+    """
+    Igual que iterar_bloques pero devuelve un único DataFrame ya validado.
+    Los bloques se concatenan con sus tipos enteros, sin pasar por object.
+    Guarda todas las filas del archivo; para archivos grandes, ver
+    leer_recuentos_agregados.
+    """
+    bloques = list(iterar_bloques(fuente, nombre, formato, tamano_bloque, columnas_requeridas, exitos_acotados))
+    if not bloques:
+        return pd.DataFrame({col: pd.Series(dtype=np.int64) for col in columnas_requeridas})
+    return pd.concat(bloques, ignore_index=True)
+
+
+def leer_recuentos_agregados(fuente, nombre=None, formato=None, tamano_bloque=TAMANO_BLOQUE,
+                             columnas_requeridas=COLUMNAS_REQUERIDAS, columnas_suma=(), exitos_acotados=True):
+    """
+    Lee y valida el archivo por bloques (iterar_bloques) y, bloque a bloque,
+    suma los recuentos de las filas que comparten el resto de columnas: el
+    día y, si las hay, las columnas de segmento. Solo se guarda una fila por
+    combinación distinta, así que la memoria depende del número de días y
+    segmentos, no del de filas del archivo.
+
+    Se suman las columnas de COLUMNAS_RECUENTO y las de columnas_suma (por
+    ejemplo, ingresos o clicks) que estén en el archivo. Las filas quedan en
+    orden de primera aparición y las columnas en el orden del archivo.
+    """
+    acumulado = None
+    for bloque in iterar_bloques(fuente, nombre, formato, tamano_bloque, columnas_requeridas, exitos_acotados):
+        sumas = [col for col in (*COLUMNAS_RECUENTO, *columnas_suma) if col in bloque.columns]
+        claves = [col for col in bloque.columns if col not in sumas]
+        parcial = bloque.groupby(claves, sort=False, dropna=False)[sumas].sum()
+        if acumulado is not None:
+            parcial = pd.concat([acumulado, parcial]).groupby(level=claves, sort=False, dropna=False).sum()
+        acumulado, columnas = parcial, list(bloque.columns)
+    if acumulado is None:
+        return pd.DataFrame({col: pd.Series(dtype=np.int64) for col in columnas_requeridas})
+    return acumulado.reset_index()[columnas]
@@ -0,0 +1,135 @@
+# priors_empiricos.py
+import numpy as np
+from scipy.optimize import minimize
+from scipy.special import betaln, digamma, gammaln
+
+MODELOS = ("conversiones", "clicks")
+
+# Columnas por defecto: una fila por experimento pasado con sus totales
+COLUMNAS_POR_DEFECTO = {
+    "exitos_a": "Conversiones A",
+    "visitas_a": "Visitas A",
+    "exitos_b": "Conversiones B",
+    "visitas_b": "Visitas B",
+}
+
+# Límites de log(alpha) y log(beta) para que el optimizador no se escape
+# cuando no hay sobredispersión (el máximo está en alpha, beta -> infinito)
+_LIMITES_LOG = (-10.0, 20.0)
+
+
+def _log_verosimilitud_beta_binomial(log_parametros, exitos, visitas):
+    """
+    Log-verosimilitud marginal Beta-Binomial (sin el término combinatorio,
+    que no depende de los parámetros) y su gradiente respecto de
+    log(alpha) y log(beta). Vectorizada sobre todos los experimentos.
+    """
+    alpha, beta = np.exp(log_parametros)
+    fracasos = visitas - exitos
+    valor = np.sum(betaln(exitos + alpha, fracasos + beta)) - len(exitos) * betaln(alpha, beta)
+    comun = digamma(visitas + alpha + beta)
+    d_alpha = np.sum(digamma(exitos + alpha) - comun) + len(exitos) * (digamma(alpha + beta) - digamma(alpha))
+    d_beta = np.sum(digamma(fracasos + beta) - comun) + len(exitos) * (digamma(alpha + beta) - digamma(beta))
+    return valor, np.array([d_alpha * alpha, d_beta * beta])
+
+
+def _log_verosimilitud_binomial_negativa(log_parametros, exitos, visitas):
+    """
+    Log-verosimilitud marginal Gamma-Poisson (binomial negativa) con tasa
+    por visita: clicks ~ Poisson(tasa * visitas), tasa ~ Gamma(alpha, beta).
+    Sin los términos constantes. Devuelve también el gradiente respecto de
+    log(alpha) y log(beta).
+    """
+    alpha, beta = np.exp(log_parametros)
+    valor = np.sum(gammaln(exitos + alpha) - (alpha + exitos) * np.log(beta + visitas)) \
+        + len(exitos) * (alpha * np.log(beta) - gammaln(alpha))
+    d_alpha = np.sum(digamma(exitos + alpha) - np.log(beta + visitas)) \
+        + len(exitos) * (np.log(beta) - digamma(alpha))
+    d_beta = len(exitos) * alpha / beta - np.sum((alpha + exitos) / (beta + visitas))
+    return valor, np.array([d_alpha * alpha, d_beta * beta])
+
+
+def _inicio_momentos(exitos, visitas, modelo):
+    """
+    Punto de partida por método de momentos sobre las tasas observadas.
+    """
+    tasas = exitos / visitas
+    media = max(float(np.average(tasas, weights=visitas)), 1e-6)
+    # Varianza entre experimentos descontando el ruido de muestreo
+    varianza_muestreo = np.mean(media * (1 - media) / visitas) if modelo == "conversiones" else np.mean(media / visitas)
+    varianza = max(float(np.var(tasas)) - varianza_muestreo, media * 1e-3)
+    if modelo == "conversiones":
+        total = max(media * (1 - media) / varianza - 1, 1e-3)
+        return np.log([media * total, (1 - media) * total])
+    return np.log([media ** 2 / varianza, media / varianza])
+
+
+def ajustar_prior(exitos, visitas, modelo="conversiones"):
+    """
+    Ajusta por máxima verosimilitud marginal (empirical Bayes) el prior
+    común a un conjunto de experimentos pasados:
+    - modelo="conversiones": Beta(alpha, beta) con verosimilitud Beta-Binomial
+    - modelo="clicks": Gamma(alpha, beta) (beta como tasa, por visita) con
+      verosimilitud binomial negativa
+
+    exitos y visitas son arrays con un elemento por experimento (o brazo).
+    Devuelve un dict con alpha, beta, la media del prior, la
+    log-verosimilitud alcanzada y el número de experimentos.
+    """
+    if modelo not in MODELOS:
+        raise ValueError(f"Modelo desconocido: {modelo!r}. Opciones: {', '.join(MODELOS)}")
+    exitos = np.asarray(exitos, dtype=float)
+    visitas = np.asarray(visitas, dtype=float)
+    validos = visitas > 0
+    exitos, visitas = exitos[validos], visitas[validos]
+    if len(exitos) < 2:
+        raise ValueError("Hacen falta al menos dos experimentos con visitas para ajustar un prior")
+    if (exitos < 0).any() or (modelo == "conversiones" and (exitos > visitas).any()):
+        raise ValueError("Recuentos no válidos: éxitos negativos o mayores que las visitas")
+
+    funcion = _log_verosimilitud_beta_binomial if modelo == "conversiones" else _log_verosimilitud_binomial_negativa
+
+    def objetivo(log_parametros):
+        valor, gradiente = funcion(log_parametros, exitos, visitas)
+        return -valor, -gradiente
+
+    inicio = np.clip(_inicio_momentos(exitos, visitas, modelo), *_LIMITES_LOG)
+    resultado = minimize(objetivo, inicio, jac=True, method="L-BFGS-B", bounds=[_LIMITES_LOG] * 2)
+    alpha, beta = np.exp(resultado.x)
+
+    media = alpha / (alpha + beta) if modelo == "conversiones" else alpha / beta
+    return {
+        "alpha": float(alpha),
+        "beta": float(beta),
+        "media": float(media),
+        "log_verosimilitud": float(-resultado.fun),
+        "n_experimentos": int(len(exitos)),
+        "convergido": bool(resultado.success),
+    }
+
+
+def priors_desde_historico(df, modelo="conversiones", columnas=None, escala=1.0):
+    """
+    Ajusta el prior a partir de una tabla de experimentos pasados (una fila
+    por experimento con los totales de cada brazo, ambos brazos cuentan
+    como observaciones) y lo devuelve listo para los constructores:
+
+        CalculadoraConversionesBayesiana(**priors_desde_historico(df))
+
+    escala < 1 debilita el prior (multiplica alpha y beta manteniendo la
+    media), útil si el histórico es muy homogéneo y el prior resultante
+    pesaría más que los datos del test.
+    """
+    col = {**COLUMNAS_POR_DEFECTO, **(columnas or {})}
+    faltantes = [nombre for nombre in col.values() if nombre not in df.columns]
+    if faltantes:
+        raise ValueError(f"Faltan las siguientes columnas: {', '.join(faltantes)}")
+    if escala <= 0:
+        raise ValueError("La escala del prior debe ser positiva")
+
+    exitos = np.concatenate([df[col["exitos_a"]].to_numpy(), df[col["exitos_b"]].to_numpy()])
+    visitas = np.concatenate([df[col["visitas_a"]].to_numpy(), df[col["visitas_b"]].to_numpy()])
+    ajuste = ajustar_prior(exitos, visitas, modelo)
+
+    alpha, beta = ajuste["alpha"] * escala, ajuste["beta"] * escala
+    return {"alpha_prior_a": alpha, "beta_prior_a": beta, "alpha_prior_b": alpha, "beta_prior_b": beta}
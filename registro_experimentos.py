@@ -0,0 +1,247 @@
+# registro_experimentos.py
+import json
+import sqlite3
+import threading
+
+import pandas as pd
+
+from estadistica_conjugada import decidir
+from estadisticos_suficientes import EstadisticosSuficientes, recuentos_paso
+
+RUTA_POR_DEFECTO = "experimentos.db"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS experimentos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL UNIQUE,
+    modelo TEXT NOT NULL,
+    priors TEXT NOT NULL,
+    opciones TEXT NOT NULL DEFAULT '{}',
+    umbral_probabilidad REAL NOT NULL,
+    umbral_mejora_minima REAL NOT NULL,
+    creado TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    actualizado TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS dias (
+    experimento_id INTEGER NOT NULL REFERENCES experimentos(id) ON DELETE CASCADE,
+    posicion INTEGER NOT NULL,
+    dia TEXT NOT NULL,
+    exitos_a INTEGER NOT NULL,
+    visitas_a INTEGER NOT NULL,
+    ingresos_a REAL,
+    exitos_b INTEGER NOT NULL,
+    visitas_b INTEGER NOT NULL,
+    ingresos_b REAL,
+    alpha_a REAL NOT NULL,
+    beta_a REAL NOT NULL,
+    alpha_b REAL NOT NULL,
+    beta_b REAL NOT NULL,
+    prob_b_mejor REAL,
+    mejora_relativa REAL,
+    decision INTEGER,
+    PRIMARY KEY (experimento_id, posicion)
+);
+CREATE INDEX IF NOT EXISTS idx_dias_experimento_dia ON dias (experimento_id, dia);
+"""
+
+_COLUMNAS_DIA = ("dia", "exitos_a", "visitas_a", "ingresos_a", "exitos_b", "visitas_b", "ingresos_b",
+                 "alpha_a", "beta_a", "alpha_b", "beta_b", "prob_b_mejor", "mejora_relativa", "decision")
+
+
+def _escalar(valor):
+    # Escalares de NumPy (por ejemplo, valores de widgets) como tipos de Python para JSON
+    if hasattr(valor, "item"):
+        return valor.item()
+    raise TypeError(f"Valor no serializable: {valor!r}")
+
+
+class RegistroExperimentos:
+    """
+    Registro persistente de experimentos sobre SQLite: recuentos diarios,
+    resumen posterior y decisión de cada día, indexados por experimento
+    y día.
+
+    Una sola conexión por proceso (compartida entre las sesiones de
+    Streamlit con st.cache_resource) protegida por un lock, con el diario
+    en modo WAL para que las lecturas no esperen a las escrituras.
+    guardar() solo escribe los días nuevos o modificados, así que se puede
+    llamar cada vez que llega un día.
+    """
+
+    def __init__(self, ruta=RUTA_POR_DEFECTO):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        with self._lock, self._conexion:
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute("PRAGMA synchronous=NORMAL")
+            self._conexion.execute("PRAGMA foreign_keys=ON")
+            self._conexion.executescript(_ESQUEMA)
+            # Registros creados antes de guardar las opciones de la calculadora
+            columnas = {fila["name"] for fila in self._conexion.execute("PRAGMA table_info(experimentos)")}
+            if "opciones" not in columnas:
+                self._conexion.execute("ALTER TABLE experimentos ADD COLUMN opciones TEXT NOT NULL DEFAULT '{}'")
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
+
+    def _id(self, nombre):
+        fila = self._conexion.execute("SELECT id FROM experimentos WHERE nombre = ?", (nombre,)).fetchone()
+        if fila is None:
+            raise ValueError(f"No existe el experimento {nombre!r}")
+        return fila["id"]
+
+    def guardar(self, nombre, calculadora, umbral_probabilidad=0.95, umbral_mejora_minima=0.01):
+        """
+        Guarda (o actualiza) el experimento `nombre` con el historial de la
+        calculadora. Se conservan los días ya guardados que coinciden y se
+        reescriben desde el primer día distinto (por ejemplo, tras
+        corregir_dia). Se guardan también las opciones del constructor
+        (calculadora.opciones()), para reconstruir el mismo modelo.
+        Devuelve el número de días escritos.
+        """
+        estadisticos = calculadora.estadisticos_suficientes()
+        pasos = [paso for paso in calculadora.historial[1:] if "datos" in paso]
+        serie = calculadora.series_decision()
+        decisiones = decidir(serie["prob_b_mejor"], serie["mejora_relativa"], umbral_probabilidad, umbral_mejora_minima)
+
+        filas = []
+        for posicion, paso in enumerate(pasos):
+            recuentos = recuentos_paso(paso["datos"])
+            filas.append((
+                posicion, str(paso["dia"]), *(recuentos.get(c) for c in _COLUMNAS_DIA[1:7]),
+                float(paso["alpha_a"]), float(paso["beta_a"]), float(paso["alpha_b"]), float(paso["beta_b"]),
+                float(serie["prob_b_mejor"][posicion]), float(serie["mejora_relativa"][posicion]),
+                int(decisiones[posicion]),
+            ))
+
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                """INSERT INTO experimentos (nombre, modelo, priors, opciones, umbral_probabilidad, umbral_mejora_minima)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (nombre) DO UPDATE SET
+                       modelo = excluded.modelo, priors = excluded.priors, opciones = excluded.opciones,
+                       umbral_probabilidad = excluded.umbral_probabilidad,
+                       umbral_mejora_minima = excluded.umbral_mejora_minima,
+                       actualizado = CURRENT_TIMESTAMP""",
+                (nombre, estadisticos.modelo, json.dumps(estadisticos.priors, sort_keys=True),
+                 json.dumps(calculadora.opciones(), sort_keys=True, default=_escalar),
+                 umbral_probabilidad, umbral_mejora_minima),
+            )
+            experimento_id = self._id(nombre)
+
+            # Primer día que difiere de lo guardado (datos o decisión)
+            guardadas = self._conexion.execute(
+                f"SELECT posicion, {', '.join(_COLUMNAS_DIA)} FROM dias WHERE experimento_id = ? ORDER BY posicion",
+                (experimento_id,),
+            ).fetchall()
+            primera = 0
+            for guardada, fila in zip(guardadas, filas):
+                if tuple(guardada) != fila:
+                    break
+                primera += 1
+
+            self._conexion.execute("DELETE FROM dias WHERE experimento_id = ? AND posicion >= ?",
+                                   (experimento_id, primera))
+            self._conexion.executemany(
+                f"INSERT INTO dias (experimento_id, posicion, {', '.join(_COLUMNAS_DIA)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(_COLUMNAS_DIA))})",
+                [(experimento_id, *fila) for fila in filas[primera:]],
+            )
+        return len(filas) - primera
+
+    def eliminar(self, nombre):
+        with self._lock, self._conexion:
+            self._conexion.execute("DELETE FROM experimentos WHERE nombre = ?", (nombre,))
+
+    def listar(self):
+        """
+        DataFrame con un experimento por fila: modelo, número de días y el
+        estado del último día.
+        """
+        with self._lock:
+            filas = self._conexion.execute(
+                """SELECT e.nombre, e.modelo, e.actualizado,
+                          (SELECT COUNT(*) FROM dias d WHERE d.experimento_id = e.id) AS dias,
+                          u.dia AS ultimo_dia, u.prob_b_mejor, u.mejora_relativa, u.decision
+                   FROM experimentos e
+                   LEFT JOIN dias u ON u.experimento_id = e.id
+                        AND u.posicion = (SELECT MAX(posicion) FROM dias d WHERE d.experimento_id = e.id)
+                   ORDER BY e.actualizado DESC"""
+            ).fetchall()
+        return pd.DataFrame([dict(fila) for fila in filas],
+                            columns=["nombre", "modelo", "actualizado", "dias", "ultimo_dia",
+                                     "prob_b_mejor", "mejora_relativa", "decision"])
+
+    def experimento(self, nombre):
+        """
+        Datos de un experimento sin sus días: modelo, priors, opciones de
+        la calculadora y umbrales con los que se guardaron las decisiones.
+        """
+        with self._lock:
+            fila = self._conexion.execute(
+                """SELECT modelo, priors, opciones, umbral_probabilidad, umbral_mejora_minima, creado, actualizado
+                   FROM experimentos WHERE nombre = ?""",
+                (nombre,),
+            ).fetchone()
+        if fila is None:
+            raise ValueError(f"No existe el experimento {nombre!r}")
+        datos = dict(fila)
+        datos["priors"] = json.loads(datos["priors"])
+        datos["opciones"] = json.loads(datos["opciones"])
+        return datos
+
+    def ultimo_estado(self, nombre):
+        """
+        Resumen del último día guardado (una consulta por índice), o None
+        si el experimento aún no tiene días.
+        """
+        with self._lock:
+            fila = self._conexion.execute(
+                f"""SELECT e.modelo, {', '.join('d.' + c for c in _COLUMNAS_DIA)}
+                    FROM experimentos e JOIN dias d ON d.experimento_id = e.id
+                    WHERE e.nombre = ? ORDER BY d.posicion DESC LIMIT 1""",
+                (nombre,),
+            ).fetchone()
+        return dict(fila) if fila else None
+
+    def resumen_dias(self, nombre):
+        """
+        DataFrame con una fila por día del experimento: recuentos,
+        parámetros posteriores, P(B > A), mejora relativa y decisión tal
+        como se guardaron, sin repetir la inferencia.
+        """
+        with self._lock:
+            experimento_id = self._id(nombre)
+            filas = self._conexion.execute(
+                f"SELECT {', '.join(_COLUMNAS_DIA)} FROM dias WHERE experimento_id = ? ORDER BY posicion",
+                (experimento_id,),
+            ).fetchall()
+        return pd.DataFrame([dict(fila) for fila in filas], columns=list(_COLUMNAS_DIA))
+
+    def estadisticos(self, nombre):
+        """
+        Recuentos diarios y priors como EstadisticosSuficientes, para
+        reconstruir la calculadora con desde_estadisticos() y las opciones
+        de experimento(). La reconstrucción repite la inferencia de cada día;
+        para consultar los resultados basta con resumen_dias().
+        """
+        with self._lock:
+            experimento = self._conexion.execute(
+                "SELECT id, modelo, priors FROM experimentos WHERE nombre = ?", (nombre,)
+            ).fetchone()
+            if experimento is None:
+                raise ValueError(f"No existe el experimento {nombre!r}")
+            filas = self._conexion.execute(
+                "SELECT dia, exitos_a, visitas_a, ingresos_a, exitos_b, visitas_b, ingresos_b "
+                "FROM dias WHERE experimento_id = ? ORDER BY posicion",
+                (experimento["id"],),
+            ).fetchall()
+
+        estadisticos = EstadisticosSuficientes(experimento["modelo"], json.loads(experimento["priors"]))
+        for fila in filas:
+            valores = {clave: fila[clave] for clave in fila.keys() if clave != "dia" and fila[clave] is not None}
+            estadisticos.agregar(fila["dia"], **valores)
+        return estadisticos
@@ -0,0 +1,250 @@
+# seleccion_motor.py
+import math
+import threading
+import time
+
+import numpy as np
+from scipy import stats
+from scipy.stats import qmc
+
+from cuantiles import resumir_cdf
+from estadistica_conjugada import prob_b_mejor_cuadratura, prob_b_mejor_normal
+
+# Motores entre los que elige el modo "auto", de más a menos preciso a igual número de muestras
+MOTORES = ("analitico", "qmc", "montecarlo", "mcmc")
+
+Z_95 = 1.959964
+
+# Muestras que se extraen siempre (también con el motor analítico) para la
+# CDF compacta y los gráficos: dos por punto de la CDF
+MUESTRAS_MINIMAS = 4096
+MUESTRAS_MAXIMAS = 4_000_000
+
+# Muestras de Monte Carlo que equivalen a una de QMC (Sobol aleatorizado)
+# al estimar P(B > A). Medido sobre posteriores típicos: el error es de 8 a
+# 10 veces menor con el mismo n (ganancia de 60-100 en muestras); se usa
+# un valor conservador.
+GANANCIA_QMC = 16
+
+# Estimación inicial de una actualización con NUTS (segundos) hasta tener
+# una medida real en esta máquina
+TIEMPO_MCMC_INICIAL = 10.0
+
+
+def _distribuciones(modelo, alpha_a, beta_a, alpha_b, beta_b):
+    """
+    Posteriores conjugados congelados de scipy (Gamma con beta como tasa).
+    """
+    if modelo == "conversiones":
+        return stats.beta(alpha_a, beta_a), stats.beta(alpha_b, beta_b)
+    return stats.gamma(alpha_a, scale=1 / beta_a), stats.gamma(alpha_b, scale=1 / beta_b)
+
+
+def prob_estimada(modelo, alpha_a, beta_a, alpha_b, beta_b):
+    """
+    P(B > A) aproximada (normal) para dimensionar el número de muestras.
+    """
+    dist_a, dist_b = _distribuciones(modelo, alpha_a, beta_a, alpha_b, beta_b)
+    return float(prob_b_mejor_normal(dist_a.mean(), dist_a.var(), dist_b.mean(), dist_b.var()))
+
+
+def muestras_para_precision(prob, precision, motor="montecarlo"):
+    """
+    Muestras necesarias para que el intervalo del 95 % de P(B > A) tenga
+    semiancho `precision`: z² p (1 - p) / precision² en Monte Carlo (y
+    MCMC, contando muestras efectivas), dividido por GANANCIA_QMC en QMC.
+    p se acota lejos de 0 y 1 para no quedarse corto en las colas.
+    """
+    varianza = max(prob * (1 - prob), 0.01)
+    n = Z_95 ** 2 * varianza / precision ** 2
+    if motor == "qmc":
+        n /= GANANCIA_QMC
+    return int(math.ceil(n))
+
+
+def error_estimado(prob, n, motor):
+    """
+    Semiancho del intervalo del 95 % de P(B > A) con n muestras (efectivas en MCMC).
+    """
+    if motor == "analitico":
+        return 0.0
+    n_equivalente = n * GANANCIA_QMC if motor == "qmc" else n
+    return float(Z_95 * math.sqrt(max(prob * (1 - prob), 0.01) / max(n_equivalente, 1)))
+
+
+class CronometroMotores:
+    """
+    Tiempos medidos en esta máquina para cada (modelo, motor), como un
+    modelo lineal segundos = fijo + por_muestra * n. calibrar() mide los
+    motores de muestreo directo con dos tamaños pequeños para tener una
+    estimación desde el primer día; después las calculadoras registran lo
+    que tarda cada actualización y el modelo se corrige con una media
+    exponencial del cociente entre tiempo real y estimado.
+    """
+
+    SUAVIZADO = 0.3
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiempos = {}  # (modelo, motor) -> [fijo, por_muestra]
+
+    def registrar(self, modelo, motor, n, segundos):
+        with self._lock:
+            actual = self._tiempos.get((modelo, motor))
+            if actual is None:
+                # Sin calibrar: todo el tiempo se atribuye a las muestras
+                self._tiempos[(modelo, motor)] = [0.0, segundos / max(n, 1)]
+                return
+            fijo, por_muestra = actual
+            estimado = fijo + por_muestra * n
+            if estimado <= 0:
+                return
+            factor = (1 - self.SUAVIZADO) + self.SUAVIZADO * segundos / estimado
+            actual[0], actual[1] = fijo * factor, por_muestra * factor
+
+    def estimar(self, modelo, motor, n):
+        """
+        Segundos estimados para n muestras, o None si nunca se ha medido.
+        """
+        with self._lock:
+            actual = self._tiempos.get((modelo, motor))
+        if actual is None:
+            return None
+        fijo, por_muestra = actual
+        return fijo + por_muestra * n
+
+    def calibrar(self, modelo, motores=("analitico", "qmc", "montecarlo"), parametros=(101, 1901, 101, 1901)):
+        """
+        Mide los motores de muestreo directo indicados (analitico, qmc,
+        montecarlo) con dos tamaños, solo la primera vez: después manda lo
+        registrado. MCMC no se calibra; se aprende de las actualizaciones.
+        """
+        with self._lock:
+            pendientes = [m for m in motores if m != "mcmc" and (modelo, m) not in self._tiempos]
+        rng = np.random.default_rng(0)
+        for motor in pendientes:
+            medidas = []
+            for n in (MUESTRAS_MINIMAS, 4 * MUESTRAS_MINIMAS):
+                inicio = time.perf_counter()
+                muestras_a, muestras_b = muestrear(modelo, motor, *parametros, n, rng)
+                if motor == "analitico":
+                    resumen_analitico(modelo, *parametros)
+                # Más lo que cuesta resumir las muestras en cada paso (percentiles y CDF)
+                np.percentile(muestras_a, [2.5, 97.5])
+                np.percentile(muestras_b, [2.5, 97.5])
+                resumir_cdf(muestras_b - muestras_a)
+                resumir_cdf(muestras_b / muestras_a - 1)
+                medidas.append((n, time.perf_counter() - inicio))
+            (n1, t1), (n2, t2) = medidas
+            por_muestra = max(t2 - t1, 0.0) / (n2 - n1)
+            with self._lock:
+                self._tiempos[(modelo, motor)] = [max(t1 - por_muestra * n1, 0.0), por_muestra]
+
+
+# Una sola instancia por proceso: los tiempos son de la máquina, no de la sesión
+CRONOMETRO = CronometroMotores()
+
+
+def muestrear(modelo, motor, alpha_a, beta_a, alpha_b, beta_b, n, rng):
+    """
+    Muestras de las tasas de A y B del posterior conjugado:
+    - montecarlo: muestreo directo con el generador
+    - qmc / analitico: Sobol aleatorizado transformado con la inversa de
+      la CDF (n se redondea a potencia de dos)
+    """
+    dist_a, dist_b = _distribuciones(modelo, alpha_a, beta_a, alpha_b, beta_b)
+    if motor == "montecarlo":
+        return dist_a.rvs(n, random_state=rng), dist_b.rvs(n, random_state=rng)
+    m = max(int(math.ceil(math.log2(max(n, 2)))), 1)
+    u = qmc.Sobol(d=2, scramble=True, seed=rng).random_base2(m)
+    return dist_a.ppf(u[:, 0]), dist_b.ppf(u[:, 1])
+
+
+def resumen_analitico(modelo, alpha_a, beta_a, alpha_b, beta_b):
+    """
+    P(B > A) por cuadratura y medias e intervalos del 95 % exactos de
+    cada posterior.
+    """
+    dist_a, dist_b = _distribuciones(modelo, alpha_a, beta_a, alpha_b, beta_b)
+    return {
+        "prob_b_mejor": prob_b_mejor_cuadratura(dist_a, dist_b),
+        "media_a": float(dist_a.mean()),
+        "media_b": float(dist_b.mean()),
+        "ci_a": dist_a.ppf([0.025, 0.975]),
+        "ci_b": dist_b.ppf([0.025, 0.975]),
+    }
+
+
+def elegir_motor(modelo, prob, disponibles=MOTORES, presupuesto_ms=None, precision=None,
+                 num_muestras=100_000, muestras_mcmc=None, cronometro=CRONOMETRO):
+    """
+    Elige motor y número de muestras para la próxima actualización.
+
+    - presupuesto_ms: tiempo máximo de la actualización
+    - precision: semiancho máximo del intervalo del 95 % de P(B > A)
+    - prob: P(B > A) aproximada (prob_estimada) para dimensionar n
+    - num_muestras: n por defecto si no se pide precisión
+    - muestras_mcmc: muestras efectivas de MCMC con la configuración
+      actual (si se pide precisión se ajustan a lo necesario)
+
+    Con precisión se elige el motor más rápido que la cumple dentro del
+    presupuesto; si ninguno llega, el más preciso que cabe. Solo con
+    presupuesto, el más preciso que cabe con num_muestras (o con las que
+    quepan). Devuelve un dict con la elección, que las calculadoras
+    guardan en el paso junto al tiempo real.
+    """
+    if presupuesto_ms is not None and presupuesto_ms <= 0:
+        raise ValueError("El presupuesto de tiempo debe ser positivo")
+    if precision is not None and not 0 < precision < 0.5:
+        raise ValueError("La precisión debe estar entre 0 y 0.5")
+    desconocidos = [m for m in disponibles if m not in MOTORES]
+    if desconocidos:
+        raise ValueError(f"Motores desconocidos: {', '.join(desconocidos)}. Opciones: {', '.join(MOTORES)}")
+    cronometro.calibrar(modelo, disponibles)
+    limite = presupuesto_ms / 1000 if presupuesto_ms is not None else math.inf
+
+    candidatos = []
+    for motor in disponibles:
+        if motor == "analitico":
+            n = MUESTRAS_MINIMAS
+        elif precision is not None:
+            n = muestras_para_precision(prob, precision, motor)
+        elif motor == "mcmc":
+            n = muestras_mcmc or num_muestras
+        else:
+            n = num_muestras
+        n = min(max(n, MUESTRAS_MINIMAS if motor != "mcmc" else 1), MUESTRAS_MAXIMAS)
+
+        tiempo = cronometro.estimar(modelo, motor, n)
+        if tiempo is None:
+            tiempo = TIEMPO_MCMC_INICIAL if motor == "mcmc" else 0.0
+        # Si no cabe, se recortan las muestras hasta lo que permite el presupuesto
+        if tiempo > limite and motor in ("qmc", "montecarlo"):
+            fijo = cronometro.estimar(modelo, motor, 0) or 0.0
+            por_muestra = (tiempo - fijo) / n
+            n_cabe = int((limite - fijo) / por_muestra) if por_muestra > 0 else n
+            if n_cabe >= MUESTRAS_MINIMAS:
+                n, tiempo = n_cabe, fijo + por_muestra * n_cabe
+        candidatos.append({
+            "motor": motor,
+            "num_muestras": int(n),
+            "tiempo_estimado_ms": 1000 * tiempo,
+            "error_estimado": error_estimado(prob, n, motor),
+        })
+
+    caben = [c for c in candidatos if c["tiempo_estimado_ms"] <= 1000 * limite]
+    cumplen = [c for c in caben if precision is None or c["error_estimado"] <= precision]
+    if cumplen and precision is not None:
+        eleccion = min(cumplen, key=lambda c: c["tiempo_estimado_ms"])
+    elif caben:
+        eleccion = min(caben, key=lambda c: (c["error_estimado"], c["tiempo_estimado_ms"]))
+    else:
+        eleccion = min(candidatos, key=lambda c: c["tiempo_estimado_ms"])
+
+    return {
+        **eleccion,
+        "presupuesto_ms": presupuesto_ms,
+        "precision": precision,
+        "cumple_presupuesto": eleccion in caben,
+        "cumple_precision": precision is None or eleccion["error_estimado"] <= precision,
+    }
@@ -0,0 +1,155 @@
+# simulacion.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from estadistica_conjugada import (
+    CONTINUAR, GANA_A, GANA_B,
+    decidir, momentos_beta, momentos_gamma, prob_b_mejor_normal, uplift_medio_beta,
+)
+
+MODELOS = ("conversiones", "clicks")
+
+
+def _simular_bloque(args):
+    """
+    Simula un bloque de experimentos completos. Devuelve, para cada uno,
+    el día (1..dias_max) en que se declara ganador (0 si nunca) y el
+    código de decisión (GANA_B, GANA_A o CONTINUAR).
+    """
+    (semilla, n, modelo, tasa_a, tasa_b, visitas_a, visitas_b,
+     priors, umbral_probabilidad, umbral_mejora_minima) = args
+    rng = np.random.default_rng(semilla)
+    alpha0_a, beta0_a, alpha0_b, beta0_b = priors
+    dias_max = len(visitas_a)
+
+    # Recuentos diarios simulados: (n experimentos, dias)
+    if modelo == "conversiones":
+        exitos_a = rng.binomial(visitas_a, tasa_a, size=(n, dias_max))
+        exitos_b = rng.binomial(visitas_b, tasa_b, size=(n, dias_max))
+    else:
+        exitos_a = rng.poisson(visitas_a * tasa_a, size=(n, dias_max))
+        exitos_b = rng.poisson(visitas_b * tasa_b, size=(n, dias_max))
+
+    # Actualización conjugada acumulada día a día (sin muestreo)
+    acum_exitos_a = np.cumsum(exitos_a, axis=1)
+    acum_exitos_b = np.cumsum(exitos_b, axis=1)
+    acum_visitas_a = np.cumsum(visitas_a)
+    acum_visitas_b = np.cumsum(visitas_b)
+
+    alpha_a = alpha0_a + acum_exitos_a
+    alpha_b = alpha0_b + acum_exitos_b
+    if modelo == "conversiones":
+        beta_a = beta0_a + (acum_visitas_a - acum_exitos_a)
+        beta_b = beta0_b + (acum_visitas_b - acum_exitos_b)
+        media_a, var_a = momentos_beta(alpha_a, beta_a)
+        media_b, var_b = momentos_beta(alpha_b, beta_b)
+        mejora = uplift_medio_beta(alpha_a, beta_a, media_b)
+    else:
+        beta_a = beta0_a + acum_visitas_a
+        beta_b = beta0_b + acum_visitas_b
+        media_a, var_a = momentos_gamma(alpha_a, beta_a)
+        media_b, var_b = momentos_gamma(alpha_b, beta_b)
+        mejora = (media_b - media_a) / media_a
+
+    prob_b_mejor = prob_b_mejor_normal(media_a, var_a, media_b, var_b)
+    codigos = decidir(prob_b_mejor, mejora, umbral_probabilidad, umbral_mejora_minima)
+
+    # Se para en el primer día con decisión, como haría el equipo
+    hay_decision = codigos != CONTINUAR
+    primero = np.argmax(hay_decision, axis=1)
+    decidido = hay_decision[np.arange(n), primero]
+    dia_decision = np.where(decidido, primero + 1, 0)
+    decision = np.where(decidido, codigos[np.arange(n), primero], CONTINUAR)
+    return dia_decision.astype(np.int32), decision.astype(np.int8)
+
+
+def simular_experimentos(tasa_a, uplift, visitas_diarias, dias_max=30,
+                         num_simulaciones=10_000, modelo="conversiones",
+                         umbral_probabilidad=0.95, umbral_mejora_minima=0.01,
+                         alpha_prior_a=1, beta_prior_a=1, alpha_prior_b=1, beta_prior_b=1,
+                         procesos=None, tamano_bloque=10_000, semilla=None):
+    """
+    Simula num_simulaciones experimentos sintéticos y aplica cada día la
+    regla de detectar_ganador sobre el posterior conjugado acumulado.
+
+    - tasa_a: tasa base del grupo A (conversión o clicks por visita)
+    - uplift: mejora relativa real de B, tasa_b = tasa_a * (1 + uplift)
+    - visitas_diarias: visitas por brazo y día (escalar o array de dias_max)
+
+    P(B > A) se calcula con la aproximación normal sobre los momentos del
+    posterior, de forma que todo queda vectorizado sobre simulaciones × días.
+    Los bloques de simulaciones se reparten entre procesos (procesos=None
+    usa todos los núcleos; procesos=1 ejecuta en el proceso actual).
+
+    Devuelve un dict con los días de decisión, las decisiones y un resumen
+    con la distribución del tiempo hasta decidir y las tasas de error.
+    """
+    if modelo not in MODELOS:
+        raise ValueError(f"Modelo desconocido: {modelo!r}. Opciones: {', '.join(MODELOS)}")
+
+    tasa_b = tasa_a * (1 + uplift)
+    if modelo == "conversiones" and not 0 <= tasa_b <= 1:
+        raise ValueError("La tasa de B resultante debe estar entre 0 y 1")
+
+    visitas = np.broadcast_to(np.asarray(visitas_diarias, dtype=np.int64), (dias_max,))
+    priors = (alpha_prior_a, beta_prior_a, alpha_prior_b, beta_prior_b)
+
+    tamanos = [min(tamano_bloque, num_simulaciones - i) for i in range(0, num_simulaciones, tamano_bloque)]
+    semillas = np.random.SeedSequence(semilla).spawn(len(tamanos))
+    tareas = [
+        (s, n, modelo, tasa_a, tasa_b, visitas, visitas, priors, umbral_probabilidad, umbral_mejora_minima)
+        for s, n in zip(semillas, tamanos)
+    ]
+
+    procesos = procesos or os.cpu_count() or 1
+    if procesos == 1 or len(tareas) == 1:
+        partes = [_simular_bloque(t) for t in tareas]
+    else:
+        with ProcessPoolExecutor(max_workers=min(procesos, len(tareas))) as ejecutor:
+            partes = list(ejecutor.map(_simular_bloque, tareas))
+
+    dia_decision = np.concatenate([p[0] for p in partes])
+    decision = np.concatenate([p[1] for p in partes])
+
+    return {
+        "dia_decision": dia_decision,
+        "decision": decision,
+        "resumen": resumir_simulacion(dia_decision, decision, uplift, dias_max),
+    }
+
+
+def resumir_simulacion(dia_decision, decision, uplift, dias_max):
+    """
+    Resume el resultado de simular_experimentos:
+    - prob_decision_por_dia: fracción de experimentos decididos hasta cada día
+    - mediana_dias / percentil_90_dias: sobre los experimentos decididos
+    - tasa_error: se declara el brazo equivocado (o cualquiera si uplift == 0)
+    - potencia: se declara el brazo realmente mejor
+    """
+    n = len(dia_decision)
+    decididos = dia_decision > 0
+    dias = dia_decision[decididos]
+
+    gana_b = np.mean(decision == GANA_B)
+    gana_a = np.mean(decision == GANA_A)
+    if uplift > 0:
+        potencia, tasa_error = gana_b, gana_a
+    elif uplift < 0:
+        potencia, tasa_error = gana_a, gana_b
+    else:
+        potencia, tasa_error = 0.0, gana_a + gana_b
+
+    conteo = np.bincount(dia_decision, minlength=dias_max + 1)[1:]
+    return {
+        "num_simulaciones": n,
+        "prob_decision_por_dia": np.cumsum(conteo) / n,
+        "prob_decision": float(np.mean(decididos)),
+        "mediana_dias": float(np.median(dias)) if dias.size else None,
+        "percentil_90_dias": float(np.percentile(dias, 90)) if dias.size else None,
+        "prob_gana_b": float(gana_b),
+        "prob_gana_a": float(gana_a),
+        "potencia": float(potencia),
+        "tasa_error": float(tasa_error),
+    }
@@ -0,0 +1,37 @@
+# tests/test_agregacion_logs.py
+import io
+
+import pandas as pd
+
+from agregacion_logs import agregar_logs
+
+LOGS_CSV = (
+    "user_id,variant,event,timestamp\n"
+    "u1,A,visit,2024-05-01 10:00:00\n"
+    "u1,A,conversion,2024-05-01 10:05:00\n"
+    "u2,A,visit,2024-05-01 11:00:00\n"
+    "u3,B,visit,2024-05-01 12:00:00\n"
+    "u3,B,visit,2024-05-02 09:00:00\n"
+    "u3,B,conversion,2024-05-02 09:10:00\n"
+)
+
+
+def test_bytesio_se_lee_como_archivo():
+    # BytesIO (y el UploadedFile de Streamlit) tienen __next__ pero no son bloques
+    resultado = agregar_logs(io.BytesIO(LOGS_CSV.encode()), nombre="logs.csv")
+    assert list(resultado["Visitas A"]) == [2, 0]
+    assert list(resultado["Conversiones A"]) == [1, 0]
+    assert list(resultado["Visitas B"]) == [1, 1]
+    assert list(resultado["Conversiones B"]) == [0, 1]
+
+
+def test_bytesio_igual_que_dataframe():
+    por_archivo = agregar_logs(io.BytesIO(LOGS_CSV.encode()), nombre="logs.csv")
+    por_dataframe = agregar_logs(pd.read_csv(io.StringIO(LOGS_CSV)))
+    pd.testing.assert_frame_equal(por_archivo, por_dataframe)
+
+
+def test_iterador_de_bloques():
+    df = pd.read_csv(io.StringIO(LOGS_CSV))
+    por_bloques = agregar_logs(iter([df.iloc[:3], df.iloc[3:]]))
+    pd.testing.assert_frame_equal(por_bloques, agregar_logs(df))
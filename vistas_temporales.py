@@ -0,0 +1,74 @@
+# vistas_temporales.py
+from estadistica_conjugada import (
+    momentos_beta, momentos_gamma, prob_b_mejor_normal, uplift_medio_beta,
+)
+
+PARAMETROS = ("alpha_a", "beta_a", "alpha_b", "beta_b")
+
+
+def validar_vistas(ventana=None, decaimiento=None):
+    if ventana is not None and (int(ventana) != ventana or ventana < 1):
+        raise ValueError("La ventana debe ser un número entero de días mayor o igual que 1")
+    if decaimiento is not None and not 0 < decaimiento < 1:
+        raise ValueError("El factor de decaimiento debe estar entre 0 y 1 (sin incluirlos)")
+
+
+def resumir_parametros(modelo, parametros):
+    """
+    Media de cada grupo, P(B > A) (aproximación normal) y mejora relativa
+    de unos parámetros conjugados, sin muestrear:
+    - modelo="conversiones": Beta, mejora = E[(B - A) / A] exacta
+    - modelo="clicks": Gamma, mejora = (E[B] - E[A]) / E[A], como detectar_ganador
+    """
+    p = {clave: float(parametros[clave]) for clave in PARAMETROS}
+    if modelo == "conversiones":
+        media_a, var_a = momentos_beta(p["alpha_a"], p["beta_a"])
+        media_b, var_b = momentos_beta(p["alpha_b"], p["beta_b"])
+        mejora = uplift_medio_beta(p["alpha_a"], p["beta_a"], media_b)
+    else:
+        media_a, var_a = momentos_gamma(p["alpha_a"], p["beta_a"])
+        media_b, var_b = momentos_gamma(p["alpha_b"], p["beta_b"])
+        mejora = (media_b - media_a) / media_a
+    return {
+        **p,
+        "media_a": float(media_a),
+        "media_b": float(media_b),
+        "prob_b_mejor": float(prob_b_mejor_normal(media_a, var_a, media_b, var_b)),
+        "mejora_relativa": float(mejora),
+    }
+
+
+def calcular_vistas(modelo, historial, parametros, ventana=None, decaimiento=None):
+    """
+    Posteriores alternativos al acumulado para el paso que se va a añadir
+    al historial, con coste O(1) por día:
+
+    - "ventana": solo los últimos `ventana` días. Los parámetros de cada
+      paso son el prior más la suma acumulada de recuentos (sumas de
+      prefijos), así que la ventana es prior + (actual - paso de hace
+      `ventana` días).
+    - "decaimiento": recuentos ponderados exponencialmente,
+      D_t = decaimiento * D_{t-1} + x_t, a partir de la vista del paso anterior.
+
+    historial es el historial actual (sin el paso nuevo) y parametros los
+    parámetros acumulados del paso nuevo. Devuelve un dict con un resumen
+    (resumir_parametros) por vista activa.
+    """
+    inicial = historial[0]
+    anterior = historial[-1]
+    vistas = {}
+
+    if ventana is not None:
+        base = historial[max(len(historial) - ventana, 0)]
+        vistas["ventana"] = resumir_parametros(modelo, {
+            clave: inicial[clave] + parametros[clave] - base[clave] for clave in PARAMETROS
+        })
+
+    if decaimiento is not None:
+        previa = anterior.get("vistas", {}).get("decaimiento", inicial)
+        vistas["decaimiento"] = resumir_parametros(modelo, {
+            clave: inicial[clave] + decaimiento * (previa[clave] - inicial[clave]) + (parametros[clave] - anterior[clave])
+            for clave in PARAMETROS
+        })
+
+    return vistas